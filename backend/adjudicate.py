@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+여러 주석자의 라벨링을 병합하여 gold 문서를 생성하는 스크립트
+
+    # 두 명 이상이 라벨링한 모든 data_id 를 과반수 투표로 병합 (8개 프로세스)
+    python adjudicate.py --strategy majority --workers 8
+
+    # 특정 사용자들의 주석만 사용하여 한 data_id 를 합집합으로 병합
+    python adjudicate.py --data-id doc-001 --users alice bob carol --strategy union
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Django 설정
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pii_labeler.settings')
+import django
+django.setup()
+
+from main.adjudication import STRATEGIES, adjudicate_corpus, get_gold_user
+from main.models import Document
+
+
+def main():
+    parser = argparse.ArgumentParser(description='여러 주석자의 라벨링을 투표로 병합하여 gold 문서를 생성합니다.')
+    parser.add_argument('--strategy', choices=STRATEGIES, default='majority', help='판정 방식 (기본: majority)')
+    parser.add_argument('--data-id', nargs='+', help='대상 data_id (생략하면 코퍼스 전체)')
+    parser.add_argument('--users', nargs='+', help='병합에 사용할 주석자 사용자명')
+    parser.add_argument('--min-annotators', type=int, default=2, help='병합할 최소 주석자 수 (기본: 2)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='투표 프로세스 수 (기본: CPU 수)')
+    parser.add_argument('--batch-size', type=int, default=200, help='작업 단위 data_id 수 (기본: 200)')
+    args = parser.parse_args()
+
+    documents = Document.objects.all()
+    if args.data_id:
+        documents = documents.filter(data_id__in=args.data_id)
+    if args.users:
+        documents = documents.filter(created_by__username__in=args.users)
+
+    gold_user = get_gold_user()
+    print(f"'{args.strategy}' 방식으로 병합하여 '{gold_user.username}' 사용자의 gold 문서를 생성합니다...")
+    started = time.perf_counter()
+    summary = adjudicate_corpus(
+        documents,
+        strategy=args.strategy,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        min_annotators=args.min_annotators,
+        gold_user=gold_user,
+    )
+    elapsed = time.perf_counter() - started
+    print(
+        f"완료: data_id {summary['documents']}개 (신규 {summary['created']}개, 갱신 {summary['updated']}개), "
+        f"태그 {summary['tags']}개, 본문 불일치로 제외된 주석 {summary['skipped_text_mismatch']}개 "
+        f"(주석자가 부족해 판정하지 않은 data_id {summary['skipped_documents']}개) "
+        f"({elapsed:.1f}초)"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+"""
+성능 회귀 벤치마크
+
+시드 고정된 합성 JSONL 코퍼스(requests.jsonl 형식, 한국어 텍스트)를 생성하고
+업로드 시간, 내보내기 처리량, document_detail 쿼리 수/지연, 태그 API 초당 요청 수를
+측정하여 JSON 으로 기록합니다. 쿼리 수가 QUERY_LIMITS 를 넘으면 종료 코드 1 로 끝납니다.
+
+    python benchmark.py generate --docs 1000 --output corpus.jsonl
+    python benchmark.py run --docs 1000 --output bench_results.json
+
+측정은 현재 DATABASES 설정(로컬 PostgreSQL 또는 DB_ENGINE=django.db.backends.sqlite3)의
+테스트 데이터베이스에서 이루어지며 실제 데이터는 건드리지 않습니다.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+
+# Django 설정
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pii_labeler.settings')
+import django
+django.setup()
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+# 뷰별 쿼리 수 상한 (태그/문서 수와 무관해야 함)
+QUERY_LIMITS = {
+    'document_detail': 10,
+    'document_list': 6,
+    'download_jsonl': 6,
+    # Entity get_or_create (SELECT, SAVEPOINT, INSERT, RELEASE) 포함
+    'add_pii_tag': 13,
+}
+
+SURNAMES = ['김', '이', '박', '최', '정', '강', '조', '윤', '장', '임', '한', '오', '서', '신', '권']
+GIVEN_NAMES = ['민준', '서연', '도윤', '하은', '지호', '수아', '예준', '지우', '시우', '서윤', '주원', '하린']
+LOCATIONS = ['서울특별시 강남구', '부산광역시 해운대구', '대구광역시 수성구', '인천광역시 연수구',
+             '광주광역시 서구', '대전광역시 유성구', '경기도 성남시 분당구', '제주특별자치도 제주시']
+ORGANIZATIONS = ['한국대학교', '미래병원', '서울중앙지방법원', '대한상사', '국민건강보험공단', '한빛초등학교']
+DEMOGRAPHICS = ['32세', '회사원', '대학원생', '고혈압 진단', '간호사', '70대 남성']
+FILLERS = [
+    '는 지난 주에 방문하여 상담을 받았다.', ' 관련 서류가 접수되었습니다.', '에 대한 확인 절차를 진행하였다.',
+    '의 요청에 따라 기록을 정정하였습니다.', ' 측은 추가 자료를 제출하기로 하였다.',
+    ' 담당자와 통화 후 일정을 조율하였다.', '에서 발생한 사안에 대해 검토 중이다.',
+]
+CATEGORY_GENERATORS = [
+    ('PERSON', 'DIRECT', lambda rng: rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES)),
+    ('LOC', 'QUASI', lambda rng: rng.choice(LOCATIONS)),
+    ('ORG', 'QUASI', lambda rng: rng.choice(ORGANIZATIONS)),
+    ('DEM', 'QUASI', lambda rng: rng.choice(DEMOGRAPHICS)),
+    ('CODE', 'DIRECT', lambda rng: f'010-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}'),
+    ('CODE', 'DIRECT', lambda rng: f'{rng.randint(600101, 991231)}-{rng.randint(1000000, 2999999)}'),
+    ('DATETIME', 'QUASI', lambda rng: f'{rng.randint(2015, 2024)}년 {rng.randint(1, 12)}월 {rng.randint(1, 28)}일'),
+    ('QUANTITY', 'QUASI', lambda rng: f'{rng.randint(1, 999)}만 원'),
+]
+
+
+def generate_document(rng, index, max_entities):
+    """합성 문서 1건 (requests.jsonl 형식의 dict) 생성"""
+    entity_count = rng.randint(0, max_entities)
+    parts = []
+    entities = []
+    offset = 0
+    seen_values = {}
+    for span_number in range(1, entity_count + 1):
+        category, identifier_type, make_value = rng.choice(CATEGORY_GENERATORS)
+        value = make_value(rng)
+        filler = rng.choice(FILLERS) + ' '
+        # 같은 값이 다시 나오면 같은 entity_id 로 묶는다
+        entity_id = seen_values.setdefault((category, value), str(span_number))
+        entities.append({
+            'span_text': value,
+            'entity_type': category,
+            'start_offset': offset,
+            'end_offset': offset + len(value),
+            'span_id': str(span_number),
+            'entity_id': entity_id,
+            'annotator': 'benchmark',
+            'identifier_type': identifier_type,
+        })
+        parts.append(value)
+        parts.append(filler)
+        offset += len(value) + len(filler)
+    if not parts:
+        parts.append('개인정보가 포함되지 않은 일반 문서입니다.')
+
+    return {
+        'metadata': {
+            'data_id': f'bench-{index:07d}',
+            'number_of_subjects': rng.randint(1, 3),
+            'provenance': {'source': 'benchmark', 'seed_index': index},
+        },
+        'text': ''.join(parts),
+        'entities': entities,
+    }
+
+
+def write_corpus(fp, docs, max_entities, seed):
+    """합성 코퍼스를 JSONL 로 기록하고 (문서 수, 엔티티 수) 반환"""
+    rng = random.Random(seed)
+    entity_total = 0
+    for index in range(docs):
+        document = generate_document(rng, index, max_entities)
+        entity_total += len(document['entities'])
+        fp.write(json.dumps(document, ensure_ascii=False) + '\n')
+    return docs, entity_total
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def _percentile(samples, percent):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _latency_summary(samples):
+    return {
+        'mean_ms': round(statistics.mean(samples) * 1000, 3),
+        'p50_ms': round(_percentile(samples, 50) * 1000, 3),
+        'p99_ms': round(_percentile(samples, 99) * 1000, 3),
+    }
+
+
+def run_benchmarks(args):
+    """테스트 DB 에서 전체 벤치마크를 실행하고 결과 dict 반환"""
+    from django.contrib.auth.models import User
+    from main.models import Document
+    from load_pii_categories import load_pii_categories
+
+    user = User.objects.create_user('benchmark', password='benchmark')
+    load_pii_categories(path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tag.json'))
+    client = Client()
+    client.force_login(user)
+    results = {}
+
+    # 1) 업로드
+    with tempfile.TemporaryFile(mode='w+b') as raw:
+        with open(raw.fileno(), 'w', encoding='utf-8', closefd=False) as text_fp:
+            doc_count, entity_count = write_corpus(text_fp, args.docs, args.max_entities, args.seed)
+        raw.seek(0)
+        payload = raw.read()
+    upload = SimpleUploadedFile('corpus.jsonl', payload, content_type='application/jsonl')
+    started = time.perf_counter()
+    response = client.post(reverse('document_create'), {'jsonl_file': upload})
+    elapsed = time.perf_counter() - started
+    imported = Document.objects.filter(created_by=user).count()
+    if imported != doc_count:
+        raise RuntimeError(f'업로드 실패: {imported}/{doc_count} 문서 (status={response.status_code})')
+    results['import'] = {
+        'documents': doc_count,
+        'entities': entity_count,
+        'bytes': len(payload),
+        'seconds': round(elapsed, 3),
+        'documents_per_second': round(doc_count / elapsed, 1),
+        'entities_per_second': round(entity_count / elapsed, 1),
+    }
+
+    # 2) 내보내기
+    document_ids = list(Document.objects.filter(created_by=user).values_list('id', flat=True))
+    with CaptureQueriesContext(connection) as captured:
+        started = time.perf_counter()
+        response = client.post(reverse('download_jsonl'), {'document_ids': document_ids})
+        body = response.content
+        elapsed = time.perf_counter() - started
+    results['download_jsonl'] = {
+        'documents': len(document_ids),
+        'bytes': len(body),
+        'seconds': round(elapsed, 3),
+        'documents_per_second': round(len(document_ids) / elapsed, 1),
+        'megabytes_per_second': round(len(body) / elapsed / 1024 / 1024, 2),
+        'queries': len(captured),
+    }
+
+    # 3) 문서 목록
+    with CaptureQueriesContext(connection) as captured:
+        started = time.perf_counter()
+        client.get(reverse('document_list'))
+        elapsed = time.perf_counter() - started
+    results['document_list'] = {
+        'documents': len(document_ids),
+        'seconds': round(elapsed, 3),
+        'queries': len(captured),
+    }
+
+    # 4) 문서 상세 (태그가 가장 많은 문서)
+    from django.db.models import Count
+    target = (Document.objects.filter(created_by=user)
+              .annotate(tag_total=Count('pii_tags')).order_by('-tag_total').first())
+    detail_url = reverse('document_detail', args=[target.pk])
+    samples = []
+    query_counts = []
+    for _ in range(args.detail_requests):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            client.get(detail_url)
+            samples.append(time.perf_counter() - started)
+        query_counts.append(len(captured))
+    results['document_detail'] = {
+        'tags': target.tag_total,
+        'requests': args.detail_requests,
+        'queries': max(query_counts),
+        **_latency_summary(samples),
+    }
+
+    # 5) 태그 API
+    tag_target = Document.objects.create(
+        data_id='bench-tag-api', number_of_subjects='1', provenance={},
+        text='가' * (args.tag_requests * 2 + 2), created_by=user,
+    )
+    samples = []
+    query_counts = []
+    for index in range(args.tag_requests):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.post(reverse('add_pii_tag'), {
+                'document_id': tag_target.pk,
+                'pii_category_value': 'PERSON',
+                'span_text': '가',
+                'start_offset': index * 2,
+                'end_offset': index * 2 + 1,
+            })
+            samples.append(time.perf_counter() - started)
+        query_counts.append(len(captured))
+        if not response.json().get('success'):
+            raise RuntimeError(f'태그 추가 실패: {response.content!r}')
+    results['add_pii_tag'] = {
+        'requests': args.tag_requests,
+        'requests_per_second': round(len(samples) / sum(samples), 1),
+        'queries': max(query_counts),
+        **_latency_summary(samples),
+    }
+    return results
+
+
+def check_limits(results, limits=QUERY_LIMITS):
+    """쿼리 수 상한 위반 목록 반환"""
+    violations = []
+    for name, limit in limits.items():
+        queries = results.get(name, {}).get('queries')
+        if queries is not None and queries > limit:
+            violations.append({'benchmark': name, 'queries': queries, 'limit': limit})
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PII Labeler 성능 회귀 벤치마크')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='합성 JSONL 코퍼스 생성')
+    run_parser = subparsers.add_parser('run', help='테스트 DB 에서 벤치마크 실행')
+    for sub in (generate_parser, run_parser):
+        sub.add_argument('--docs', type=int, default=1000, help='문서 수 (기본: 1000)')
+        sub.add_argument('--max-entities', type=int, default=200, help='문서당 최대 엔티티 수 (기본: 200)')
+        sub.add_argument('--seed', type=int, default=42, help='난수 시드 (기본: 42)')
+    generate_parser.add_argument('--output', default='corpus.jsonl', help='출력 JSONL 경로')
+    run_parser.add_argument('--output', default='bench_results.json', help='결과 JSON 경로')
+    run_parser.add_argument('--detail-requests', type=int, default=20, help='document_detail 반복 횟수')
+    run_parser.add_argument('--tag-requests', type=int, default=200, help='add_pii_tag 요청 수')
+    run_parser.add_argument('--keepdb', action='store_true', help='테스트 DB 를 재사용')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        with open(args.output, 'w', encoding='utf-8') as fp:
+            docs, entities = write_corpus(fp, args.docs, args.max_entities, args.seed)
+        print(f'{docs}개 문서, {entities}개 엔티티를 {args.output}에 기록했습니다.')
+        return 0
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=args.keepdb)
+    try:
+        results = run_benchmarks(args)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+
+    violations = check_limits(results)
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now(dt_timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'docs': args.docs,
+            'max_entities': args.max_entities,
+            'seed': args.seed,
+        },
+        'results': results,
+        'query_limits': QUERY_LIMITS,
+        'violations': violations,
+    }
+    with open(args.output, 'w', encoding='utf-8') as fp:
+        json.dump(report, fp, ensure_ascii=False, indent=2)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f'결과를 {args.output}에 기록했습니다.')
+    for violation in violations:
+        print(f"쿼리 수 상한 초과: {violation['benchmark']} {violation['queries']} > {violation['limit']}")
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
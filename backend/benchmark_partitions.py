@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""
+태그 테이블 파티션 벤치마크 (PostgreSQL 전용)
+
+main_piitag 와 같은 컬럼/인덱스를 가진 일반 테이블과 document_id 해시 파티션 테이블을
+별도 스키마(bench_partitions)에 같은 합성 행으로 채우고 다음을 비교하여 JSON 으로 기록합니다.
+
+- 적재 시간, 테이블+인덱스 크기
+- 문서 하나의 태그 조회(document_detail), id+document_id 태그 조회(태그 수정/삭제 API), id 만으로 조회
+- 작성자별 태그 수(created_by 스캔)
+- 문서 묶음 삭제(롤백) 와 삭제 후 VACUUM 시간
+- 문서 조회 실행 계획에서 읽은 파티션 수 (partition pruning 확인)
+
+    # 5천만 행, 문서당 평균 100 태그, 16 파티션
+    python benchmark_partitions.py --rows 50000000 --partitions 16 --output partition_bench.json
+
+실제 데이터(main_piitag)는 건드리지 않습니다. 끝나면 스키마를 지웁니다(--keep 이면 남김).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime, timezone as dt_timezone
+
+# Django 설정
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pii_labeler.settings')
+import django
+django.setup()
+
+from django.conf import settings
+from django.db import connection, transaction
+
+SCHEMA = 'bench_partitions'
+COLUMNS = """
+    id bigint NOT NULL,
+    document_id bigint NOT NULL,
+    pii_category_id bigint NOT NULL,
+    span_text varchar(500) NOT NULL,
+    start_offset integer NOT NULL,
+    end_offset integer NOT NULL,
+    entity_id varchar(100) NOT NULL,
+    created_at timestamptz NOT NULL,
+    created_by_id integer NOT NULL
+"""
+# main_piitag 의 Django 인덱스와 같은 구성 (외래키 인덱스 + Meta.indexes)
+INDEXES = [
+    ('document_start', '(document_id, start_offset)'),
+    ('category_span', '(pii_category_id, span_text)'),
+    ('created_by', '(created_by_id)'),
+]
+LOAD_BATCH = 5_000_000
+
+
+def _execute(cursor, sql, params=None):
+    started = time.perf_counter()
+    cursor.execute(sql, params)
+    return time.perf_counter() - started
+
+
+def create_tables(cursor, partitions):
+    cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+    cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+    cursor.execute(f'CREATE TABLE {SCHEMA}.plain ({COLUMNS}, PRIMARY KEY (id))')
+    cursor.execute(f'CREATE TABLE {SCHEMA}.hashed ({COLUMNS}, PRIMARY KEY (id, document_id)) PARTITION BY HASH (document_id)')
+    for remainder in range(partitions):
+        cursor.execute(
+            f'CREATE TABLE {SCHEMA}.hashed_p{remainder:02d} PARTITION OF {SCHEMA}.hashed '
+            f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        )
+
+
+def load_rows(cursor, table, rows, documents, users):
+    """합성 태그 rows 개를 LOAD_BATCH 개씩 적재하고 인덱스를 만든 뒤 (적재 초, 인덱스 초) 반환"""
+    load_seconds = 0.0
+    for start in range(0, rows, LOAD_BATCH):
+        end = min(start + LOAD_BATCH, rows)
+        load_seconds += _execute(cursor, f"""
+            INSERT INTO {SCHEMA}.{table}
+            SELECT n, n %% %s + 1, n %% 8 + 1, 'span-' || (n %% 100000), (n / %s) * 20, (n / %s) * 20 + 5,
+                   (n %% 50)::text, now(), n %% %s + 1
+            FROM generate_series(%s, %s) AS n
+        """, [documents, documents, documents, users, start + 1, end])
+        print(f'  {table}: {end:,}행 적재 ({load_seconds:.1f}초)')
+    index_seconds = 0.0
+    for name, columns in INDEXES:
+        index_seconds += _execute(cursor, f'CREATE INDEX {table}_{name} ON {SCHEMA}.{table} {columns}')
+    cursor.execute(f'ANALYZE {SCHEMA}.{table}')
+    return load_seconds, index_seconds
+
+
+def table_size(cursor, table):
+    cursor.execute(
+        'SELECT COALESCE(SUM(pg_total_relation_size(relid)), 0) FROM pg_partition_tree(%s::regclass)',
+        [f'{SCHEMA}.{table}'],
+    )
+    return int(cursor.fetchone()[0])
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        'p50_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def _timed_queries(cursor, sql, params_list):
+    samples = []
+    for params in params_list:
+        samples.append(_execute(cursor, sql, params))
+        cursor.fetchall()
+    return _summary(samples)
+
+
+def scanned_partitions(cursor, sql, params):
+    """EXPLAIN (FORMAT JSON) 계획에서 읽는 테이블 수 (pruning 되면 1)"""
+    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    relations = set()
+    stack = [plan[0]['Plan']]
+    while stack:
+        node = stack.pop()
+        if 'Relation Name' in node:
+            relations.add(node['Relation Name'])
+        stack.extend(node.get('Plans', []))
+    return len(relations)
+
+
+def measure(cursor, table, rng, documents, users, samples, delete_documents):
+    document_ids = [rng.randint(1, documents) for _ in range(samples)]
+    cursor.execute(f'SELECT id, document_id FROM {SCHEMA}.{table} WHERE document_id = ANY(%s)', [document_ids[:50]])
+    tag_keys = cursor.fetchall()
+    tag_keys = [rng.choice(tag_keys) for _ in range(samples)]
+    document_sql = f'SELECT * FROM {SCHEMA}.{table} WHERE document_id = %s ORDER BY start_offset'
+
+    result = {
+        'document_tags': _timed_queries(cursor, document_sql, [[document_id] for document_id in document_ids]),
+        'tag_by_id_and_document': _timed_queries(
+            cursor, f'SELECT * FROM {SCHEMA}.{table} WHERE id = %s AND document_id = %s', tag_keys,
+        ),
+        'tag_by_id_only': _timed_queries(
+            cursor, f'SELECT * FROM {SCHEMA}.{table} WHERE id = %s', [[tag_id] for tag_id, _ in tag_keys],
+        ),
+        'created_by_count': _timed_queries(
+            cursor, f'SELECT COUNT(*) FROM {SCHEMA}.{table} WHERE created_by_id = %s',
+            [[rng.randint(1, users)] for _ in range(min(samples, 20))],
+        ),
+        'scanned_relations_for_document': scanned_partitions(cursor, document_sql, [document_ids[0]]),
+    }
+
+    # 문서 묶음 삭제 (롤백하여 다음 측정에 영향 없음)
+    batch = rng.sample(range(1, documents + 1), min(delete_documents, documents))
+    with transaction.atomic():
+        result['delete_documents_seconds'] = round(
+            _execute(cursor, f'DELETE FROM {SCHEMA}.{table} WHERE document_id = ANY(%s)', [batch]), 3
+        )
+        transaction.set_rollback(True)
+
+    # 1% 문서의 태그를 지운 뒤 VACUUM (파티션 테이블은 파티션별로 나뉘어 처리된다)
+    victims = rng.sample(range(1, documents + 1), max(1, documents // 100))
+    cursor.execute(f'DELETE FROM {SCHEMA}.{table} WHERE document_id = ANY(%s)', [victims])
+    result['vacuum_seconds'] = round(_execute(cursor, f'VACUUM (ANALYZE) {SCHEMA}.{table}'), 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='일반 태그 테이블과 document_id 해시 파티션 테이블을 비교합니다.')
+    parser.add_argument('--rows', type=int, default=50_000_000, help='테이블마다 적재할 태그 수 (기본: 50,000,000)')
+    parser.add_argument('--tags-per-document', type=int, default=100, help='문서당 평균 태그 수 (기본: 100)')
+    parser.add_argument('--users', type=int, default=50, help='작성자 수 (기본: 50)')
+    parser.add_argument('--partitions', type=int, default=settings.PIITAG_PARTITIONS or 16,
+                        help='해시 파티션 수 (기본: PIITAG_PARTITIONS)')
+    parser.add_argument('--samples', type=int, default=200, help='조회 측정 반복 횟수 (기본: 200)')
+    parser.add_argument('--delete-documents', type=int, default=500, help='삭제 측정 문서 수 (기본: 500)')
+    parser.add_argument('--seed', type=int, default=42, help='난수 시드 (기본: 42)')
+    parser.add_argument('--output', default='partition_bench.json', help='결과 JSON 경로')
+    parser.add_argument('--keep', action='store_true', help='측정 후 bench_partitions 스키마를 남김')
+    args = parser.parse_args()
+
+    if connection.vendor != 'postgresql':
+        parser.error('PostgreSQL 에서만 실행할 수 있습니다.')
+    documents = max(1, args.rows // args.tags_per_document)
+
+    results = {
+        'timestamp': datetime.now(dt_timezone.utc).isoformat(),
+        'rows': args.rows,
+        'documents': documents,
+        'partitions': args.partitions,
+        'tables': {},
+    }
+    with connection.cursor() as cursor:
+        cursor.execute('SHOW server_version')
+        results['server_version'] = cursor.fetchone()[0]
+        create_tables(cursor, args.partitions)
+        try:
+            for table in ('plain', 'hashed'):
+                print(f'{table} 테이블 적재 중...')
+                load_seconds, index_seconds = load_rows(cursor, table, args.rows, documents, args.users)
+                results['tables'][table] = {
+                    'load_seconds': round(load_seconds, 1),
+                    'index_seconds': round(index_seconds, 1),
+                    'total_bytes': table_size(cursor, table),
+                }
+            for table in ('plain', 'hashed'):
+                print(f'{table} 테이블 측정 중...')
+                results['tables'][table].update(measure(
+                    cursor, table, random.Random(args.seed), documents, args.users, args.samples, args.delete_documents,
+                ))
+        finally:
+            if not args.keep:
+                cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print(f"\n{'항목':<32}{'일반':>16}{'해시 파티션':>16}")
+    plain, hashed = results['tables']['plain'], results['tables']['hashed']
+    for key in ('document_tags', 'tag_by_id_and_document', 'tag_by_id_only', 'created_by_count'):
+        print(f"{key + ' p50(ms)':<32}{plain[key]['p50_ms']:>16}{hashed[key]['p50_ms']:>16}")
+    for key in ('delete_documents_seconds', 'vacuum_seconds', 'load_seconds', 'index_seconds',
+                'total_bytes', 'scanned_relations_for_document'):
+        print(f'{key:<32}{plain[key]:>16}{hashed[key]:>16}')
+    print(f'\n결과를 {args.output}에 기록했습니다.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+코퍼스 전체 라벨 일관성 검사 스크립트
+
+    # 지난 실행 뒤 새로 생겼거나 바뀐 문서만 검사하고 검토 큐 상위 20개 출력
+    python check_consistency.py --top 20
+
+    # 규칙 파일로 처음부터 다시 검사 (무시한 항목도 초기화)
+    python check_consistency.py --rules consistency_rules.json --full
+
+규칙 파일은 main/consistency.py 의 DEFAULT_RULES 중 바꿀 키만 담은 JSON 입니다.
+    {"min_support": 5, "person_suffixes": ["씨", "님", "선생님"], "weights": {"overlap": 1.0}}
+규칙이 바뀌면 모든 문서를 다시 검사합니다. gold 문서(ADJUDICATION_USERNAME)는 제외합니다.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+# Django 설정
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pii_labeler.settings')
+import django
+django.setup()
+
+from django.conf import settings
+
+from main.consistency import check_consistency, load_rules
+from main.models import ReviewItem
+
+
+def main():
+    parser = argparse.ArgumentParser(description='같은 텍스트/entity 의 라벨 불일치와 가이드라인 위반을 찾아 검토 큐를 갱신합니다.')
+    parser.add_argument('--rules', help='규칙 JSON 경로 (기본: CONSISTENCY_RULES_PATH 또는 기본 규칙)')
+    parser.add_argument('--full', action='store_true', help='이전 결과를 지우고 모든 문서를 다시 검사')
+    parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE,
+                        help=f'한 번에 읽는 문서 수 (기본: {settings.EXPORT_CHUNK_SIZE})')
+    parser.add_argument('--top', type=int, default=20, help='출력할 검토 큐 항목 수 (기본: 20)')
+    args = parser.parse_args()
+
+    try:
+        rules = load_rules(args.rules)
+    except (OSError, json.JSONDecodeError, ValueError) as e:
+        parser.error(f'규칙을 읽을 수 없습니다: {e}')
+
+    started = time.perf_counter()
+    summary = check_consistency(rules=rules, full=args.full, chunk_size=args.chunk_size)
+    print(
+        f"검사 완료: 문서 {summary['documents']}개 검사, {summary['removed']}개 제거, 텍스트 {summary['keys']}개의 "
+        f"이상치 {summary['outliers']}개 ({time.perf_counter() - started:.1f}초)"
+    )
+    print(f"검토 큐: {summary['queue']}개")
+    for item in ReviewItem.objects.filter(dismissed=False).select_related('document')[:args.top]:
+        print(
+            f'  {item.score:6.3f}  {item.document.data_id}  [{item.start_offset}:{item.end_offset}] '
+            f'{item.span_text} ({item.category}/{item.identifier_type or "-"})  {item.get_kind_display()}: {item.message}'
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+변경되지 않는 데이터셋 릴리스를 만드는 스크립트
+
+    # alice 의 문서 전체를 gzip 샤드(문서 10000개씩) + manifest.json 으로
+    python create_release.py --username alice --name corpus-2024.06 --shard-size 10000
+
+    # 특정 data_id 만, zstd 압축 (zstandard 패키지 필요)
+    python create_release.py --username alice --name sample-v1 --data-id doc1 doc2 --compression zstd
+
+릴리스는 RELEASE_ROOT/<name>/ 에 기록되며 웹의 릴리스 목록에서 내려받을 수 있습니다.
+문서는 primary 의 한 트랜잭션 스냅샷에서 읽습니다 (복제본을 쓰지 않음).
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Django 설정
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pii_labeler.settings')
+import django
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from main.export import COMPRESSIONS, GZIP
+from main.models import Document
+from main.releases import build_release, release_directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description='문서를 변경되지 않는 데이터셋 릴리스(압축 JSONL 샤드 + manifest)로 기록합니다.')
+    parser.add_argument('--username', required=True, help='문서 소유 사용자명 (릴리스 작성자)')
+    parser.add_argument('--name', required=True, help='릴리스 이름 (영문, 숫자, ".", "-", "_")')
+    parser.add_argument('--data-id', nargs='+', help='릴리스할 data_id (기본: 사용자의 문서 전체)')
+    parser.add_argument('--compression', choices=(*COMPRESSIONS, 'none'), default=GZIP, help='샤드 압축 (기본: gzip)')
+    parser.add_argument('--shard-size', type=int, default=settings.RELEASE_SHARD_SIZE,
+                        help=f'샤드 하나의 문서 수 (기본: {settings.RELEASE_SHARD_SIZE})')
+    args = parser.parse_args()
+
+    try:
+        user = User.objects.get(username=args.username)
+    except User.DoesNotExist:
+        parser.error(f"'{args.username}' 사용자가 없습니다.")
+
+    documents = Document.objects.filter(created_by=user)
+    filters = {'username': user.username}
+    if args.data_id:
+        documents = documents.filter(data_id__in=args.data_id)
+        filters['data_ids'] = sorted(args.data_id)
+    if not documents.exists():
+        parser.error('릴리스할 문서가 없습니다.')
+
+    started = time.perf_counter()
+    try:
+        release = build_release(
+            args.name, user, documents, filters=filters,
+            compression=None if args.compression == 'none' else args.compression, shard_size=args.shard_size,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(
+        f'완료: 문서 {release.document_count}개, 태그 {release.tag_count}개를 샤드 {len(release.files) - 1}개로 '
+        f'{release_directory(release.name)}에 기록했습니다. ({time.perf_counter() - started:.1f}초)'
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+비식별화된 JSONL 을 내보내는 스크립트
+
+    # alice 의 문서 전체를 8개 프로세스로 비식별화 (DIRECT 는 가명, QUASI/그 외는 카테고리)
+    python deidentify_documents.py --username alice --output deidentified.jsonl.gz --workers 8
+
+    # 특정 문서만, DIRECT 는 *** 로 가리고 QUASI 는 원문 유지
+    python deidentify_documents.py --username alice --data-id doc-001 doc-002 --direct redact --quasi keep \\
+        --output sample.jsonl
+
+출력 경로가 .gz 로 끝나면 gzip 으로 압축합니다. 각 줄의 entities 오프셋은 비식별 본문 기준입니다.
+"""
+
+import os
+import sys
+import gzip
+import time
+import argparse
+from contextlib import nullcontext
+
+# Django 설정
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pii_labeler.settings')
+import django
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from main.deidentify import DEFAULT_RULES, DIRECT, OTHER, QUASI, RULES, iter_deidentified
+from main.db_router import read_replica
+from main.models import Document
+from main.offsets import CODEPOINT, OFFSET_UNITS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='문서 본문을 태그로 마스킹/가명 처리하여 JSONL 로 내보냅니다.')
+    parser.add_argument('--username', required=True, help='문서 소유 사용자명')
+    parser.add_argument('--data-id', nargs='+', help='내보낼 data_id (기본: 사용자의 문서 전체)')
+    parser.add_argument('--output', required=True, help='출력 JSONL 경로 (.gz 로 끝나면 압축)')
+    parser.add_argument('--direct', choices=RULES, default=DEFAULT_RULES[DIRECT],
+                        help=f'DIRECT 식별자 규칙 (기본: {DEFAULT_RULES[DIRECT]})')
+    parser.add_argument('--quasi', choices=RULES, default=DEFAULT_RULES[QUASI],
+                        help=f'QUASI 식별자 규칙 (기본: {DEFAULT_RULES[QUASI]})')
+    parser.add_argument('--other', choices=RULES, default=DEFAULT_RULES[OTHER],
+                        help=f'그 외 식별자 유형 규칙 (기본: {DEFAULT_RULES[OTHER]})')
+    parser.add_argument('--offset-unit', choices=OFFSET_UNITS, default=CODEPOINT,
+                        help='치환 위치 오프셋 단위: codepoint(문자), utf16, utf8(바이트) (기본: codepoint)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='비식별화 프로세스 수 (기본: CPU 수)')
+    parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE,
+                        help=f'한 번에 읽는 문서 수 (기본: {settings.EXPORT_CHUNK_SIZE})')
+    parser.add_argument('--primary', action='store_true',
+                        help='읽기 전용 복제본이 설정되어 있어도 primary 에서 읽기 (방금 가져온 문서를 바로 내보낼 때)')
+    args = parser.parse_args()
+
+    try:
+        user = User.objects.get(username=args.username)
+    except User.DoesNotExist:
+        parser.error(f"'{args.username}' 사용자가 없습니다.")
+
+    documents = Document.objects.filter(created_by=user)
+    if args.data_id:
+        documents = documents.filter(data_id__in=args.data_id)
+    rules = {DIRECT: args.direct, QUASI: args.quasi, OTHER: args.other}
+
+    started = time.perf_counter()
+    opener = gzip.open if args.output.endswith('.gz') else open
+    count = 0
+    with nullcontext() if args.primary else read_replica(), opener(args.output, 'wt', encoding='utf-8') as f:
+        for line in iter_deidentified(
+            documents, rules, workers=args.workers, chunk_size=args.chunk_size, offset_unit=args.offset_unit,
+        ):
+            f.write(line)
+            count += 1
+            if count % 10000 == 0:
+                print(f'  {count}개 ({time.perf_counter() - started:.1f}초)')
+    print(f'완료: 문서 {count}개를 비식별화하여 {args.output}에 기록했습니다. ({time.perf_counter() - started:.1f}초)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+사용자 문서를 묶음 단위로 삭제하는 스크립트
+
+    # alice 의 특정 data_id 문서 삭제
+    python delete_documents.py --username alice --data-id doc-001 doc-002
+
+    # alice 의 문서 전체를 1000개씩 삭제
+    python delete_documents.py --username alice --all --chunk-size 1000
+
+묶음마다 커밋하므로 중간에 멈춰도 이미 지운 묶음은 되돌아가지 않으며, 다시 실행하면 남은 문서만 지웁니다.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Django 설정
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pii_labeler.settings')
+import django
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from main.models import Document
+
+
+def main():
+    parser = argparse.ArgumentParser(description='사용자 문서와 태그를 묶음 단위로 삭제합니다.')
+    parser.add_argument('--username', required=True, help='문서 소유 사용자명')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--data-id', nargs='+', help='삭제할 data_id')
+    target.add_argument('--all', action='store_true', help='사용자의 문서 전체 삭제')
+    parser.add_argument('--chunk-size', type=int, default=settings.BULK_DELETE_CHUNK_SIZE,
+                        help=f'한 트랜잭션에서 지울 문서 수 (기본: {settings.BULK_DELETE_CHUNK_SIZE})')
+    args = parser.parse_args()
+
+    try:
+        user = User.objects.get(username=args.username)
+    except User.DoesNotExist:
+        parser.error(f"'{args.username}' 사용자가 없습니다.")
+
+    documents = Document.objects.filter(created_by=user)
+    if args.data_id:
+        documents = documents.filter(data_id__in=args.data_id)
+
+    started = time.perf_counter()
+    deleted = 0
+    for _, deleted, total in documents.delete_in_chunks(args.chunk_size):
+        print(f'  {deleted}/{total} 삭제 ({time.perf_counter() - started:.1f}초)')
+    print(f"완료: '{user.username}' 사용자의 문서 {deleted}개를 삭제했습니다.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -21,6 +21,7 @@ python create_superuser.py
 echo "PII 카테고리 로드 중..."
 python load_pii_categories.py
 
-# Django 개발 서버 시작
+# Django 서버 시작 (ASGI: HTTP + 실시간 태그 동기화 WebSocket)
+# 실시간 이벤트는 프로세스 메모리로 전달되므로 워커는 1개로 실행
 echo "Django 서버 시작 중..."
-python manage.py runserver 0.0.0.0:8008
+exec uvicorn pii_labeler.asgi:application --host 0.0.0.0 --port 8008 --reload --proxy-headers
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+토큰 단위 BIO 학습 데이터를 샤드 파일로 내보내는 스크립트
+
+    # alice 의 문서 전체를 한국어 토크나이저로, 문서 10000개씩 압축 샤드로 (8개 프로세스)
+    python export_conll.py --username alice --output-dir bio/ --tokenizer korean --shard-size 10000 --gzip --workers 8
+
+    # 사용자 정규식 토크나이저, JSONL({"data_id", "tokens", "labels"}) 형식
+    python export_conll.py --username alice --output-dir bio/ --tokenizer regex --pattern '\\w+|[^\\w\\s]' --format jsonl
+
+샤드는 output-dir/part-00000.conll(.gz) 처럼 문서 id 순서로 만들어집니다.
+"""
+
+import os
+import sys
+import time
+import argparse
+from contextlib import nullcontext
+
+# Django 설정
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pii_labeler.settings')
+import django
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from main.conll import CONLL, FORMATS, TOKENIZER_NAMES, get_tokenizer, iter_conll
+from main.db_router import read_replica
+from main.export import GZIP, ShardWriter
+from main.models import Document
+
+
+def main():
+    parser = argparse.ArgumentParser(description='태그를 토큰 단위 BIO 라벨로 바꾸어 CoNLL/JSONL 샤드로 내보냅니다.')
+    parser.add_argument('--username', required=True, help='문서 소유 사용자명')
+    parser.add_argument('--data-id', nargs='+', help='내보낼 data_id (기본: 사용자의 문서 전체)')
+    parser.add_argument('--output-dir', required=True, help='샤드를 기록할 디렉터리')
+    parser.add_argument('--tokenizer', choices=TOKENIZER_NAMES, default='whitespace', help='토크나이저 (기본: whitespace)')
+    parser.add_argument('--pattern', help='regex 토크나이저의 토큰 정규식')
+    parser.add_argument('--format', choices=FORMATS, default=CONLL, help='출력 형식 (기본: conll)')
+    parser.add_argument('--shard-size', type=int, default=10000, help='샤드 하나의 문서 수 (기본: 10000)')
+    parser.add_argument('--gzip', action='store_true', help='샤드를 gzip 으로 압축')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='변환 프로세스 수 (기본: CPU 수)')
+    parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE,
+                        help=f'한 번에 읽는 문서 수 (기본: {settings.EXPORT_CHUNK_SIZE})')
+    parser.add_argument('--primary', action='store_true',
+                        help='읽기 전용 복제본이 설정되어 있어도 primary 에서 읽기 (방금 가져온 문서를 바로 내보낼 때)')
+    args = parser.parse_args()
+
+    try:
+        get_tokenizer(args.tokenizer, args.pattern)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        user = User.objects.get(username=args.username)
+    except User.DoesNotExist:
+        parser.error(f"'{args.username}' 사용자가 없습니다.")
+
+    documents = Document.objects.filter(created_by=user)
+    if args.data_id:
+        documents = documents.filter(data_id__in=args.data_id)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    writer = ShardWriter(args.output_dir, args.format, args.shard_size, GZIP if args.gzip else None)
+    count = 0
+    with nullcontext() if args.primary else read_replica():
+        try:
+            for block in iter_conll(
+                documents, args.tokenizer, pattern=args.pattern, output_format=args.format,
+                workers=args.workers, chunk_size=args.chunk_size,
+            ):
+                writer.write(block)
+                count += 1
+                if count % 10000 == 0:
+                    print(f'  {count}개 ({time.perf_counter() - started:.1f}초)')
+        finally:
+            writer.close()
+    print(
+        f'완료: 문서 {count}개를 샤드 {len(writer.paths)}개로 {args.output_dir}에 기록했습니다. '
+        f'({time.perf_counter() - started:.1f}초)'
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+여러 JSONL 파일/아카이브를 한 번에 가져오는 스크립트
+
+    # .jsonl, .jsonl.gz, .zip, .tar(.gz) 를 섞어서 지정 가능 (샤드 파싱은 8개 프로세스)
+    python import_documents.py --username alice corpus-01.jsonl.gz corpus-02.jsonl.gz shards.zip --workers 8
+
+    # 기존 문서는 교체하고 거부된 줄은 CSV 로 저장
+    python import_documents.py --username alice fixed.jsonl --on-duplicate overwrite --report rejections.csv
+
+    # 수정한 JSONL 을 다시 올려 기존 문서의 달라진 태그만 반영 (태그 id 유지)
+    python import_documents.py --username alice corrected.jsonl --on-duplicate upsert
+
+    # UTF-8 바이트 오프셋으로 기록된 외부 도구 출력 가져오기
+    python import_documents.py --username alice tool-output.jsonl --offset-unit utf8
+
+기본(--on-duplicate fail)에서는 중복 data_id(업로드 안 또는 사용자의 기존 문서)나 파싱 오류가 있으면
+아무것도 저장하지 않고 샤드별 보고서를 출력한 뒤 1 을 반환합니다.
+"""
+
+import os
+import sys
+import time
+import argparse
+from contextlib import ExitStack
+
+# Django 설정
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pii_labeler.settings')
+import django
+django.setup()
+
+from django.contrib.auth.models import User
+
+from main.importer import FAIL, POLICIES, ImportRejected, import_documents, is_supported, write_rejection_report
+from main.offsets import CODEPOINT, OFFSET_UNITS
+
+
+def print_report(report):
+    for shard in report['shards']:
+        print(
+            f"  {shard['shard']}: {shard['rows']}행, 문서 {shard['documents']}개 생성, {shard['overwritten']}개 덮어씀, "
+            f"태그 {shard['tags']}개 추가/{shard['tags_updated']}개 수정/{shard['tags_deleted']}개 삭제, 거부 {shard['rejected']}개"
+        )
+        if shard['duplicates']:
+            print(f"    중복 data_id: {', '.join(shard['duplicates'])}")
+        for line, error in shard['errors']:
+            print(f'    {line}번째 줄: {error}')
+
+
+def save_report(path, report):
+    if path and report['rejections']:
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            write_rejection_report(report['rejections'], f)
+        print(f"거부된 {len(report['rejections'])}줄을 {path}에 기록했습니다.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='여러 JSONL 파일/아카이브를 병렬로 파싱하여 문서로 가져옵니다.')
+    parser.add_argument('paths', nargs='+', help='.jsonl, .jsonl.gz, .zip, .tar(.gz) 파일 경로')
+    parser.add_argument('--username', required=True, help='문서를 소유할 사용자명')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='샤드 파싱 프로세스 수 (기본: CPU 수)')
+    parser.add_argument('--batch-size', type=int, default=500, help='한 번에 저장할 문서 수 (기본: 500)')
+    parser.add_argument('--on-duplicate', choices=POLICIES, default=FAIL,
+                        help='중복 data_id 처리: fail(전체 취소), skip(건너뛰기), overwrite(기존 문서 교체), '
+                             'upsert(기존 문서의 달라진 태그만 반영) (기본: fail)')
+    parser.add_argument('--report', help='거부된 줄을 기록할 CSV 경로')
+    parser.add_argument('--offset-unit', choices=OFFSET_UNITS, default=CODEPOINT,
+                        help='엔티티 start/end_offset 의 단위: codepoint(문자), utf16, utf8(바이트) (기본: codepoint)')
+    args = parser.parse_args()
+
+    unsupported = [path for path in args.paths if not is_supported(path)]
+    if unsupported:
+        parser.error(f"지원하지 않는 파일 형식입니다: {', '.join(unsupported)}")
+    try:
+        user = User.objects.get(username=args.username)
+    except User.DoesNotExist:
+        parser.error(f"'{args.username}' 사용자가 없습니다.")
+
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        files = [(os.path.basename(path), stack.enter_context(open(path, 'rb'))) for path in args.paths]
+        try:
+            report = import_documents(
+                files, user, workers=args.workers, batch_size=args.batch_size, policy=args.on_duplicate,
+                offset_unit=args.offset_unit,
+            )
+        except ImportRejected as e:
+            print('중복 data_id 또는 파싱 오류가 있어 아무것도 저장하지 않았습니다.')
+            print_report(e.report)
+            save_report(args.report, e.report)
+            return 1
+    elapsed = time.perf_counter() - started
+
+    print_report(report)
+    save_report(args.report, report)
+    print(
+        f"완료: 샤드 {len(report['shards'])}개에서 문서 {report['documents']}개 생성, "
+        f"{report['overwritten']}개 덮어씀, 태그 {report['tags']}개 추가/{report['tags_updated']}개 수정/"
+        f"{report['tags_deleted']}개 삭제, 거부 {len(report['rejections'])}줄 ({elapsed:.1f}초)"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
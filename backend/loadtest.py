@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+"""
+태그 API 동시 부하 테스트
+
+주석자 N명이 동시에 자기 문서에 태그를 추가/수정/삭제하는 흐름을 실행 중인 서버에 보내고
+엔드포인트별 p50/p99 지연과 초당 요청 수를 측정합니다. 여러 서버를 --target 으로 지정하면
+같은 작업을 차례로 실행하여 나란히 비교합니다.
+
+    # 같은 코드를 ASGI(uvicorn, async 실행)와 WSGI(gunicorn 스레드, sync 실행)로 띄워 비교
+    python loadtest.py --target async=http://127.0.0.1:8008 --target sync=http://127.0.0.1:8009 \\
+        --annotators 32 --requests 50 --output loadtest_results.json
+
+WSGI 에서는 Django 가 async 뷰를 요청 스레드에서 끝까지 실행하므로(async_to_sync) 쿼리마다 스레드가
+막힌다. 두 서버가 같은 커밋, 같은 스키마를 쓰므로 차이는 sync/async 실행 방식에서만 나온다.
+
+테스트용 사용자(loadtest-*)/문서/세션은 서버와 같은 DB 에 직접 만들고 끝나면 삭제하므로
+이 스크립트는 서버와 같은 DATABASES 설정으로 실행해야 합니다.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlencode, urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Django 설정
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pii_labeler.settings')
+import django
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client
+
+from benchmark import _git_commit, _latency_summary
+from main.models import Document, PIICategory
+
+USERNAME_PREFIX = 'loadtest-'
+ENDPOINTS = ('add_pii_tag', 'update_pii_tag', 'delete_pii_tag')
+SPAN_TEXT = '홍길동'
+
+
+class Annotator:
+    """keep-alive 연결 하나로 태그 API 를 호출하는 가상 주석자"""
+
+    def __init__(self, base_url, session_key, document_id, category):
+        parsed = urlparse(base_url)
+        self.connection_class = http.client.HTTPSConnection if parsed.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = parsed.netloc
+        self.prefix = parsed.path.rstrip('/')
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={session_key}'
+        self.document_id = document_id
+        self.category = category
+        self.connection = None
+
+    def post(self, path, data):
+        body = urlencode(data)
+        headers = {'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': self.cookie}
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = self.connection_class(self.netloc, timeout=30)
+            try:
+                started = time.perf_counter()
+                self.connection.request('POST', self.prefix + path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                payload = response.read()
+                return time.perf_counter() - started, response.status, payload
+            except (http.client.HTTPException, ConnectionError):
+                # 서버가 keep-alive 연결을 닫은 경우 한 번 다시 연결
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+
+    def run(self, requests, samples, errors, lock):
+        for index in range(requests):
+            start = index * (len(SPAN_TEXT) + 1)
+            elapsed, status, payload = self.post('/api/add-pii-tag/', {
+                'document_id': self.document_id, 'pii_category_value': self.category,
+                'span_text': SPAN_TEXT, 'start_offset': start, 'end_offset': start + len(SPAN_TEXT),
+            })
+            tag = self._record('add_pii_tag', elapsed, status, payload, samples, errors, lock)
+            if tag is None:
+                continue
+            tag_id = tag['tag']['id']
+            elapsed, status, payload = self.post('/api/update-pii-tag/', {
+                'tag_id': tag_id, 'pii_category_value': self.category, 'identifier_type': 'DIRECT', 'entity_id': '',
+            })
+            self._record('update_pii_tag', elapsed, status, payload, samples, errors, lock)
+            elapsed, status, payload = self.post('/api/delete-pii-tag/', {'tag_id': tag_id})
+            self._record('delete_pii_tag', elapsed, status, payload, samples, errors, lock)
+        if self.connection is not None:
+            self.connection.close()
+
+    @staticmethod
+    def _record(endpoint, elapsed, status, payload, samples, errors, lock):
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            data = {'success': False}
+        with lock:
+            if status == 200 and data.get('success'):
+                samples[endpoint].append(elapsed)
+                return data
+            errors[endpoint] += 1
+        return None
+
+
+def create_fixtures(annotators, requests):
+    """부하 테스트용 사용자/문서/세션 생성"""
+    category = PIICategory.objects.order_by('id').first()
+    if category is None:
+        raise SystemExit('PII 카테고리가 없습니다. load_pii_categories.py 를 먼저 실행하세요.')
+    text = ' '.join([SPAN_TEXT] * requests)
+    fixtures = []
+    for index in range(annotators):
+        user, _ = User.objects.get_or_create(username=f'{USERNAME_PREFIX}{index}')
+        Document.objects.filter(created_by=user).delete()
+        document = Document.objects.create(
+            data_id=f'{USERNAME_PREFIX}{index}', number_of_subjects='1', provenance={}, text=text, created_by=user,
+        )
+        client = Client()
+        client.force_login(user)
+        fixtures.append((client.cookies[settings.SESSION_COOKIE_NAME].value, document.id, category.value))
+    return fixtures
+
+
+def cleanup_fixtures():
+    User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+
+def run_target(base_url, fixtures, requests):
+    samples = {endpoint: [] for endpoint in ENDPOINTS}
+    errors = {endpoint: 0 for endpoint in ENDPOINTS}
+    lock = threading.Lock()
+    annotators = [Annotator(base_url, *fixture) for fixture in fixtures]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(annotators)) as executor:
+        futures = [executor.submit(annotator.run, requests, samples, errors, lock) for annotator in annotators]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    result = {'url': base_url, 'seconds': round(elapsed, 3)}
+    for endpoint in ENDPOINTS:
+        result[endpoint] = {
+            'requests': len(samples[endpoint]),
+            'errors': errors[endpoint],
+            'requests_per_second': round(len(samples[endpoint]) / elapsed, 1) if elapsed else 0.0,
+            **(_latency_summary(samples[endpoint]) if samples[endpoint] else {}),
+        }
+    return result
+
+
+def print_comparison(results):
+    names = list(results)
+    print(f"{'endpoint':<16}" + ''.join(f'{name:>28}' for name in names))
+    for endpoint in ENDPOINTS:
+        cells = []
+        for name in names:
+            stats = results[name][endpoint]
+            if 'p50_ms' in stats:
+                cells.append(f"{stats['p50_ms']:>8.1f}/{stats['p99_ms']:>8.1f}ms {stats['requests_per_second']:>6.0f}/s")
+            else:
+                cells.append('-')
+        print(f'{endpoint:<16}' + ''.join(f'{cell:>28}' for cell in cells))
+    print('(p50/p99 지연, 초당 요청 수)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='태그 API 동시 부하 테스트 (p50/p99 지연 비교)')
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                        help='측정할 서버 (여러 번 지정하면 비교, 예: async=http://127.0.0.1:8008)')
+    parser.add_argument('--annotators', type=int, default=16, help='동시 주석자 수 (기본: 16)')
+    parser.add_argument('--requests', type=int, default=50, help='주석자별 추가/수정/삭제 반복 횟수 (기본: 50)')
+    parser.add_argument('--output', help='결과 JSON 경로')
+    args = parser.parse_args()
+
+    targets = {}
+    for target in args.target:
+        name, _, url = target.partition('=')
+        if not url:
+            parser.error('--target 은 NAME=URL 형식이어야 합니다.')
+        targets[name] = url
+
+    results = {}
+    try:
+        for name, url in targets.items():
+            # 서버마다 같은 초기 상태에서 측정
+            fixtures = create_fixtures(args.annotators, args.requests)
+            print(f'{name}: {url} 에 주석자 {args.annotators}명 x {args.requests}회 요청 중...')
+            results[name] = run_target(url, fixtures, args.requests)
+    finally:
+        cleanup_fixtures()
+
+    print_comparison(results)
+    if args.output:
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'annotators': args.annotators,
+                'requests': args.requests,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'결과를 {args.output}에 기록했습니다.')
+
+    failed = sum(results[name][endpoint]['errors'] for name in results for endpoint in ENDPOINTS)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+판정(adjudication) 병합: 여러 주석자의 라벨링으로 gold 문서 생성
+
+같은 data_id 의 N개 주석을 (start, end, category) 로 정렬해 투표하고,
+채택된 스팬 사이의 entity 연결도 같은 기준으로 투표하여 gold Document 와 PIITag 를 만듭니다.
+
+- majority: 과반수 주석자가 단 스팬만 채택
+- union: 한 명이라도 단 스팬을 채택 (겹치면 득표가 많고 긴 스팬 우선)
+- intersection: 모든 주석자가 단 스팬만 채택
+
+gold 문서는 settings.ADJUDICATION_USERNAME 사용자 소유로 저장되며, 다시 판정하면 태그를 교체합니다.
+"""
+
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import combinations
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .agreement import shared_data_ids
+from .models import Document, DocumentBody, PIITag
+from .spans import SpanIndex
+
+STRATEGIES = ('majority', 'union', 'intersection')
+DEFAULT_GOLD_USERNAME = 'gold'
+
+
+class MergedSpan(NamedTuple):
+    """판정 결과 스팬 (span_id/entity_id 는 문서 내 위치 순으로 부여)"""
+    start: int
+    end: int
+    category_id: int
+    span_id: str
+    entity_id: str
+    identifier_type: str
+    votes: int
+
+
+def vote_threshold(strategy, annotator_count):
+    if strategy == 'union':
+        return 1
+    if strategy == 'intersection':
+        return annotator_count
+    if strategy == 'majority':
+        return annotator_count // 2 + 1
+    raise ValueError(f'알 수 없는 판정 방식입니다: {strategy}')
+
+
+def merge_annotations(annotations, strategy='majority'):
+    """주석자별 스팬 목록을 투표로 병합
+
+    annotations 는 주석자마다 [(start, end, category_id, entity_id, identifier_type), ...] 목록이다.
+    """
+    threshold = vote_threshold(strategy, len(annotations))
+
+    voters = defaultdict(set)
+    identifier_types = defaultdict(Counter)
+    for annotator, spans in enumerate(annotations):
+        for start, end, category_id, _, identifier_type in spans:
+            key = (start, end, category_id)
+            voters[key].add(annotator)
+            if identifier_type:
+                identifier_types[key][identifier_type] += 1
+
+    # 겹치는 후보 중 득표가 많고 긴 스팬을 우선 채택
+    candidates = sorted(
+        (key for key, annotators in voters.items() if len(annotators) >= threshold),
+        key=lambda key: (-len(voters[key]), key[0] - key[1], key[0]),
+    )
+    taken = SpanIndex()
+    accepted = []
+    for key in candidates:
+        if not taken.overlaps(key[0], key[1]):
+            taken.add(key[0], key[1])
+            accepted.append(key)
+    accepted.sort()
+    position = {key: index for index, key in enumerate(accepted)}
+
+    # 채택된 스팬 쌍이 같은 entity 로 묶인 횟수를 세어 같은 기준으로 연결
+    link_votes = Counter()
+    for spans in annotations:
+        clusters = defaultdict(set)
+        for start, end, category_id, entity_id, _ in spans:
+            key = (start, end, category_id)
+            if entity_id and key in position:
+                clusters[entity_id].add(position[key])
+        for members in clusters.values():
+            link_votes.update(combinations(sorted(members), 2))
+
+    parent = list(range(len(accepted)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for (first, second), votes in link_votes.items():
+        if votes >= threshold:
+            root_first, root_second = find(first), find(second)
+            # 대표는 위치가 가장 앞선 스팬 (entity_id = 대표 span_id)
+            parent[max(root_first, root_second)] = min(root_first, root_second)
+
+    merged = []
+    for index, key in enumerate(accepted):
+        common = identifier_types[key].most_common(1)
+        merged.append(MergedSpan(
+            start=key[0],
+            end=key[1],
+            category_id=key[2],
+            span_id=str(index + 1),
+            entity_id=str(find(index) + 1),
+            identifier_type=common[0][0] if common else '',
+            votes=len(voters[key]),
+        ))
+    return merged
+
+
+def get_gold_user():
+    """gold 문서 소유 사용자 (없으면 로그인할 수 없는 계정으로 생성)"""
+    username = getattr(settings, 'ADJUDICATION_USERNAME', DEFAULT_GOLD_USERNAME)
+    user, created = User.objects.get_or_create(username=username)
+    if created:
+        user.set_unusable_password()
+        user.save(update_fields=['password'])
+    return user
+
+
+# --- 프로세스 풀 작업자 ---
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _merge_batch(batch, strategy):
+    return [
+        (data_id, source, text, len(annotations), merge_annotations(annotations, strategy))
+        for data_id, source, text, annotations in batch
+    ]
+
+
+def _load_batch(documents, data_ids, min_annotators, summary):
+    """data_id 별 (data_id, 원본 메타데이터, 본문, 주석자별 스팬 목록)
+
+    본문이 다른 주석은 가장 많은 주석자가 가진 본문 기준으로 제외하고,
+    제외한 뒤 남은 주석자가 min_annotators 명 미만이면 그 data_id 는 판정하지 않는다.
+    같은 본문은 DocumentBody 한 행을 공유하므로 본문 비교는 body_id 로 한다.
+    """
+    rows = list(
+        documents.filter(data_id__in=data_ids)
+        .order_by('data_id', 'created_by__username')
+        .values_list('id', 'data_id', 'body_id', 'number_of_subjects', 'provenance')
+    )
+    spans = defaultdict(list)
+    for document_id, start, end, category_id, entity_id, identifier_type in (
+        PIITag.objects.filter(document_id__in=[row[0] for row in rows])
+        .order_by('document_id', 'start_offset')
+        .values_list('document_id', 'start_offset', 'end_offset', 'pii_category_id', 'entity_id', 'identifier_type')
+    ):
+        spans[document_id].append((start, end, category_id, entity_id, identifier_type))
+
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row[1]].append(row)
+
+    chosen = {}
+    for data_id in data_ids:
+        group = grouped.get(data_id, [])
+        if group:
+            chosen[data_id] = Counter(row[2] for row in group).most_common(1)[0][0]
+    texts = dict(DocumentBody.objects.filter(id__in=set(chosen.values())).values_list('id', 'text'))
+
+    batch = []
+    for data_id, body_id in chosen.items():
+        group = grouped[data_id]
+        matching = [row for row in group if row[2] == body_id]
+        if len(matching) < min_annotators:
+            summary['skipped_text_mismatch'] += len(group)
+            summary['skipped_documents'] += 1
+            continue
+        summary['skipped_text_mismatch'] += len(group) - len(matching)
+        source = {'body_id': body_id, 'number_of_subjects': matching[0][3], 'provenance': matching[0][4]}
+        batch.append((data_id, source, texts[body_id], [spans.get(row[0], []) for row in matching]))
+    return batch
+
+
+def _iter_batches(documents, batch_size, min_annotators, summary):
+    chunk = []
+    for data_id in shared_data_ids(documents, min_annotators).iterator(chunk_size=batch_size):
+        chunk.append(data_id)
+        if len(chunk) >= batch_size:
+            yield _load_batch(documents, chunk, min_annotators, summary)
+            chunk = []
+    if chunk:
+        yield _load_batch(documents, chunk, min_annotators, summary)
+
+
+def _iter_merged(documents, strategy, workers, batch_size, min_annotators, summary):
+    if workers <= 1:
+        for batch in _iter_batches(documents, batch_size, min_annotators, summary):
+            yield _merge_batch(batch, strategy)
+        return
+
+    # fork 된 작업자가 부모의 DB 연결을 물려받지 않도록 연결을 닫고,
+    # 배치를 읽는 쿼리가 연결을 다시 열기 전에 작업자 프로세스를 미리 띄운다
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        executor.submit(len, ()).result()
+        pending = set()
+        for batch in _iter_batches(documents, batch_size, min_annotators, summary):
+            pending.add(executor.submit(_merge_batch, batch, strategy))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+def _write_gold(results, gold_user, summary):
+    """병합 결과를 gold 문서/태그로 저장 (기존 gold 문서는 본문과 태그를 교체)"""
+    now = timezone.now()
+    existing = {
+        document.data_id: document
+        for document in Document.objects.filter(
+            created_by=gold_user, data_id__in=[result[0] for result in results]
+        )
+    }
+    new_documents = []
+    documents = {}
+    for data_id, source, _, _, merged in results:
+        document = existing.get(data_id)
+        if document is None:
+            document = Document(data_id=data_id, created_by=gold_user)
+            new_documents.append(document)
+        # gold 문서는 주석자 문서와 같은 본문 행을 참조한다
+        document.body_id = source['body_id']
+        document.number_of_subjects = source['number_of_subjects']
+        document.provenance = source['provenance']
+        document.tag_count = len(merged)
+        document.updated_at = now
+        documents[data_id] = document
+
+    with transaction.atomic():
+        if existing:
+            PIITag.objects.filter(document__in=list(existing.values())).delete()
+            Document.objects.bulk_update(
+                list(existing.values()), ['body', 'number_of_subjects', 'provenance', 'tag_count', 'updated_at'], batch_size=500
+            )
+        Document.objects.bulk_create(new_documents, batch_size=500)
+
+        tags = []
+        for data_id, _, text, annotator_count, merged in results:
+            document = documents[data_id]
+            for span in merged:
+                tags.append(PIITag(
+                    document=document,
+                    pii_category_id=span.category_id,
+                    span_text=text[span.start:span.end],
+                    start_offset=span.start,
+                    end_offset=span.end,
+                    span_id=span.span_id,
+                    entity_id=span.entity_id,
+                    annotator=gold_user.username,
+                    identifier_type=span.identifier_type,
+                    confidence=round(span.votes / annotator_count, 4),
+                    created_by=gold_user,
+                ))
+        PIITag.objects.bulk_create(tags, batch_size=1000)
+        Document.objects.filter(id__in=[document.id for document in documents.values()]).sync_entities()
+
+    summary['documents'] += len(results)
+    summary['created'] += len(new_documents)
+    summary['updated'] += len(existing)
+    summary['tags'] += len(tags)
+
+
+def adjudicate_corpus(documents, strategy='majority', workers=1, batch_size=200, min_annotators=2, gold_user=None):
+    """documents 범위에서 min_annotators 명 이상이 라벨링한 data_id 마다 gold 문서 생성
+
+    투표는 작업자 프로세스에서, DB 저장은 배치 단위 트랜잭션으로 부모 프로세스에서 수행한다.
+    본문이 같은 주석자가 min_annotators 명 미만인 data_id 는 summary['skipped_documents'] 로 센다.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'알 수 없는 판정 방식입니다: {strategy}')
+    gold_user = gold_user or get_gold_user()
+    documents = documents.exclude(created_by=gold_user)
+
+    summary = {
+        'strategy': strategy, 'documents': 0, 'created': 0, 'updated': 0, 'tags': 0,
+        'skipped_text_mismatch': 0, 'skipped_documents': 0,
+    }
+    for results in _iter_merged(documents, strategy, workers, batch_size, min_annotators, summary):
+        if results:
+            _write_gold(results, gold_user, summary)
+    return summary
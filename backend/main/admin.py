@@ -1,8 +1,126 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+from .db_router import use_read_replica
 from .models import Document, PIITag, PIICategory
+from .search import filter_documents_by_text, filter_tags_by_span
 
 # Register your models here.
 
+# 수백만 행 테이블(Document, PIITag) 관리자 화면 설정
+# - 필터가 없는 목록은 PostgreSQL 통계의 추정 행 수로 페이지를 나눈다 (전체 COUNT(*) 생략)
+# - 목록의 외래키는 list_select_related 로 한 번에 읽고, 편집 화면은 raw id/autocomplete 위젯을 쓴다
+# - DISTINCT 가 필요한 필터 선택지는 캐시한다
+# - 목록 조회(GET)는 읽기 전용 복제본이 있으면 복제본에서 읽는다
+
+
+# 파티션 부모 테이블(relkind 'p')은 autovacuum 이 ANALYZE 하지 않아 reltuples 가 갱신되지 않으므로
+# 파티션(pg_inherits)의 추정치를 더한다 (main_piitag, 0011 마이그레이션)
+ESTIMATED_COUNT_SQL = '''
+    SELECT CASE WHEN parent.relkind = 'p' THEN (
+        SELECT COALESCE(SUM(GREATEST(child.reltuples, 0)), 0)
+        FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = parent.oid
+    ) ELSE parent.reltuples END::bigint
+    FROM pg_class parent WHERE parent.oid = %s::regclass
+'''
+
+
+class EstimatedCountPaginator(Paginator):
+    """필터/검색이 없는 전체 목록은 pg_class.reltuples 추정치를 행 수로 쓰는 paginator"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(ESTIMATED_COUNT_SQL, [queryset.model._meta.db_table])
+                    row = cursor.fetchone()
+                # 통계가 없거나(-1) 작은 테이블은 정확히 센다
+                if row and row[0] >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                    return row[0]
+        return super().count
+
+
+class CachedChoicesFilter(admin.SimpleListFilter):
+    """선택지를 ADMIN_FILTER_CACHE_TIMEOUT 초 동안 캐시하는 필터 (하위 클래스가 load_choices 와 lookup 지정)"""
+
+    lookup = None
+
+    def load_choices(self):
+        raise NotImplementedError
+
+    def lookups(self, request, model_admin):
+        key = f'admin-filter:{model_admin.model._meta.label_lower}:{self.parameter_name}'
+        choices = cache.get(key)
+        if choices is None:
+            choices = [(str(value), label) for value, label in self.load_choices()]
+            cache.set(key, choices, settings.ADMIN_FILTER_CACHE_TIMEOUT)
+        return choices
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(**{self.lookup: self.value()})
+
+
+class CreatedByFilter(CachedChoicesFilter):
+    title = '작성자'
+    parameter_name = 'created_by'
+    lookup = 'created_by_id'
+
+    def load_choices(self):
+        # 태그 테이블의 DISTINCT 대신 (작은) 사용자 테이블에서 선택지를 만든다
+        return User.objects.order_by('username').values_list('id', 'username')
+
+
+class AnnotatorFilter(CachedChoicesFilter):
+    title = '주석자'
+    parameter_name = 'annotator'
+    lookup = 'annotator'
+
+    def load_choices(self):
+        annotators = PIITag.objects.order_by().values_list('annotator', flat=True).distinct()
+        return [(annotator, annotator or '(없음)') for annotator in sorted(annotators)]
+
+
+class ConfidenceFilter(admin.SimpleListFilter):
+    """신뢰도 구간 필터 (실수 값 전체를 DISTINCT 로 나열하지 않음)"""
+    title = '신뢰도'
+    parameter_name = 'confidence'
+    ranges = {
+        'none': ('0 (사람)', Q(confidence=0)),
+        'low': ('0 ~ 0.5', Q(confidence__gt=0, confidence__lt=0.5)),
+        'high': ('0.5 ~ 1', Q(confidence__gte=0.5, confidence__lt=1)),
+        'full': ('1', Q(confidence__gte=1)),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(key, label) for key, (label, _) in self.ranges.items()]
+
+    def queryset(self, request, queryset):
+        if self.value() in self.ranges:
+            return queryset.filter(self.ranges[self.value()][1])
+        return queryset
+
+
+class ReplicaChangelistMixin:
+    """목록 조회(GET)를 복제본에서 읽음 (일괄 작업 POST 는 primary)"""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method == 'GET':
+            return use_read_replica(super().changelist_view)(request, extra_context)
+        return super().changelist_view(request, extra_context)
+
+
 @admin.register(PIICategory)
 class PIICategoryAdmin(admin.ModelAdmin):
     list_display = ['value', 'background_color', 'description', 'created_at']
@@ -11,24 +129,44 @@ class PIICategoryAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
 
 @admin.register(Document)
-class DocumentAdmin(admin.ModelAdmin):
-    list_display = ['data_id', 'number_of_subjects', 'created_by', 'created_at', 'updated_at']
-    list_filter = ['created_at', 'updated_at', 'created_by']
-    search_fields = ['data_id', 'text']
-    readonly_fields = ['created_at', 'updated_at']
+class DocumentAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ['data_id', 'number_of_subjects', 'tag_count', 'created_by', 'created_at', 'updated_at']
+    list_filter = ['created_at', 'updated_at', CreatedByFilter]
+    list_select_related = ['created_by']
+    search_fields = ['data_id', 'body__text']
+    search_help_text = 'data_id 완전 일치 또는 본문 부분 문자열 (검색 인덱스 사용)'
+    readonly_fields = ['tag_count', 'created_at', 'updated_at']
+    raw_id_fields = ['body', 'created_by']
+    # 기본 정렬(-created_at)은 인덱스가 없어 전체 정렬이 필요하므로 PK 역순
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(data_id=search_term) | filter_documents_by_text(queryset, search_term), False
 
 @admin.register(PIITag)
-class PIITagAdmin(admin.ModelAdmin):
+class PIITagAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ['document', 'pii_category', 'span_text', 'start_offset', 'end_offset', 'confidence', 'created_by', 'created_at']
-    list_filter = ['pii_category', 'confidence', 'created_at', 'created_by', 'annotator']
+    list_filter = ['pii_category', ConfidenceFilter, 'created_at', CreatedByFilter, AnnotatorFilter]
+    list_select_related = ['document', 'pii_category', 'created_by']
     search_fields = ['span_text', 'document__data_id', 'span_id', 'entity_id']
-    readonly_fields = ['created_at']
+    search_help_text = 'span_text 부분 문자열 (검색 인덱스 사용) 또는 data_id/span_id/entity_id 완전 일치'
+    raw_id_fields = ['document', 'created_by']
+    autocomplete_fields = ['pii_category']
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # entity_ref 는 entity_id 로부터 저장 시 다시 연결된다
+    readonly_fields = ['entity_ref', 'created_at']
     fieldsets = (
         ('기본 정보', {
             'fields': ('document', 'pii_category', 'span_text', 'start_offset', 'end_offset')
         }),
         ('메타데이터', {
-            'fields': ('span_id', 'entity_id', 'annotator', 'identifier_type'),
+            'fields': ('span_id', 'entity_id', 'entity_ref', 'annotator', 'identifier_type'),
             'classes': ('collapse',)
         }),
         ('시스템 정보', {
@@ -36,3 +174,29 @@ class PIITagAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        exact = Q(document__data_id=search_term) | Q(span_id=search_term) | Q(entity_id=search_term)
+        return filter_tags_by_span(queryset, search_term) | queryset.filter(exact), False
+
+    # 관리자 화면에서 태그를 바꾸면 문서의 비정규화 태그 수를 다시 센다
+    def save_model(self, request, obj, form, change):
+        previous_document_id = form.initial.get('document') if change else None
+        super().save_model(request, obj, form, change)
+        documents = Document.objects.filter(id__in={obj.document_id, previous_document_id} - {None})
+        documents.recount_tags()
+        documents.sync_entities()
+
+    def delete_model(self, request, obj):
+        document_id = obj.document_id
+        super().delete_model(request, obj)
+        Document.objects.filter(id=document_id).recount_tags()
+        Document.objects.filter(id=document_id).sync_entities()
+
+    def delete_queryset(self, request, queryset):
+        document_ids = set(queryset.values_list('document_id', flat=True))
+        super().delete_queryset(request, queryset)
+        Document.objects.filter(id__in=document_ids).recount_tags()
+        Document.objects.filter(id__in=document_ids).sync_entities()
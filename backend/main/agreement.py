@@ -0,0 +1,281 @@
+"""
+주석자 간 일치도(inter-annotator agreement) 계산
+
+같은 data_id 를 여러 사용자가 각자 Document 로 라벨링하므로, data_id 로 문서를 묶어
+주석자 쌍마다 태그 집합을 offset 기준 sort-merge 로 정렬(align)하고 다음을 계산합니다.
+
+- exact F1: (start, end, category) 가 모두 같은 태그를 일치로 본다
+- partial F1: 같은 카테고리이면서 범위가 겹치는 태그를 1:1 로 일치시킨다
+- Cohen's kappa: 카테고리별로 문자 단위 (해당 카테고리 / 아님) 이진 라벨의 일치도
+
+코퍼스 전체는 data_id 묶음 단위로 스트리밍 처리하며 결과는 Django 캐시에 저장됩니다.
+"""
+
+import hashlib
+from collections import defaultdict
+from itertools import combinations
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.db.models.functions import Length
+
+from .models import PIITag
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def align_exact(spans_a, spans_b):
+    """(start, end, category) 로 정렬된 두 목록에서 완전히 같은 스팬 쌍"""
+    matches = []
+    i = j = 0
+    while i < len(spans_a) and j < len(spans_b):
+        if spans_a[i] == spans_b[j]:
+            matches.append((spans_a[i], spans_b[j]))
+            i += 1
+            j += 1
+        elif spans_a[i] < spans_b[j]:
+            i += 1
+        else:
+            j += 1
+    return matches
+
+
+def _sweep_partial(spans_a, spans_b):
+    """정렬된 두 목록에서 겹치는 스팬을 1:1 로 짝짓는 sweep (먼저 끝나는 쪽을 전진)"""
+    matches = []
+    i = j = 0
+    while i < len(spans_a) and j < len(spans_b):
+        a_start, a_end = spans_a[i][:2]
+        b_start, b_end = spans_b[j][:2]
+        if a_start < b_end and b_start < a_end:
+            matches.append((spans_a[i], spans_b[j]))
+            i += 1
+            j += 1
+        elif a_end <= b_end:
+            i += 1
+        else:
+            j += 1
+    return matches
+
+
+def align_partial(spans_a, spans_b):
+    """겹치고 카테고리가 같은 스팬 쌍
+
+    다른 카테고리 스팬이 sweep 진행을 가로막지 않도록 카테고리별로 따로 sweep 한다.
+    """
+    by_category_a = defaultdict(list)
+    by_category_b = defaultdict(list)
+    for span in spans_a:
+        by_category_a[span[2]].append(span)
+    for span in spans_b:
+        by_category_b[span[2]].append(span)
+    matches = []
+    for category, category_spans in by_category_a.items():
+        if category in by_category_b:
+            matches.extend(_sweep_partial(category_spans, by_category_b[category]))
+    return sorted(matches)
+
+
+def _coverage(spans):
+    """겹치는 구간을 병합한 정렬 구간 목록"""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _intersection_length(coverage_a, coverage_b):
+    total = 0
+    i = j = 0
+    while i < len(coverage_a) and j < len(coverage_b):
+        start = max(coverage_a[i][0], coverage_b[j][0])
+        end = min(coverage_a[i][1], coverage_b[j][1])
+        if start < end:
+            total += end - start
+        if coverage_a[i][1] <= coverage_b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+def _f1(tp, fp, fn):
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': round(precision, 4), 'recall': round(recall, 4), 'f1': round(f1, 4)}
+
+
+def _kappa(both, only_a, only_b, total):
+    if not total:
+        return None
+    neither = total - both - only_a - only_b
+    observed = (both + neither) / total
+    a_yes = (both + only_a) / total
+    b_yes = (both + only_b) / total
+    expected = a_yes * b_yes + (1 - a_yes) * (1 - b_yes)
+    if expected == 1:
+        return 1.0 if observed == 1 else 0.0
+    return round((observed - expected) / (1 - expected), 4)
+
+
+class AgreementAccumulator:
+    """주석자 쌍 비교 결과를 누적하여 카테고리별 지표를 계산"""
+
+    def __init__(self):
+        self.documents = set()
+        self.pairs = 0
+        # 카테고리별 kappa 의 분모는 카테고리 등장 여부와 무관하게 모든 문서쌍의 문자 수
+        self.total_characters = 0
+        # category -> [tp, fp, fn]
+        self.exact = defaultdict(lambda: [0, 0, 0])
+        self.partial = defaultdict(lambda: [0, 0, 0])
+        # category -> [both, only_a, only_b]
+        self.characters = defaultdict(lambda: [0, 0, 0])
+        # (annotator_a, annotator_b) -> [exact_tp, partial_tp, count_a, count_b]
+        self.annotator_pairs = defaultdict(lambda: [0, 0, 0, 0])
+
+    def add_pair(self, data_id, annotator_a, spans_a, annotator_b, spans_b, text_length):
+        self.documents.add(data_id)
+        self.pairs += 1
+        categories = {span[2] for span in spans_a} | {span[2] for span in spans_b}
+
+        exact = align_exact(spans_a, spans_b)
+        partial = align_partial(spans_a, spans_b)
+        for matches, counters in ((exact, self.exact), (partial, self.partial)):
+            matched = defaultdict(int)
+            for span, _ in matches:
+                matched[span[2]] += 1
+            for category in categories:
+                count_a = sum(1 for span in spans_a if span[2] == category)
+                count_b = sum(1 for span in spans_b if span[2] == category)
+                counters[category][0] += matched[category]
+                counters[category][1] += count_a - matched[category]
+                counters[category][2] += count_b - matched[category]
+
+        for category in categories:
+            coverage_a = _coverage((s, e) for s, e, c in spans_a if c == category)
+            coverage_b = _coverage((s, e) for s, e, c in spans_b if c == category)
+            length_a = sum(e - s for s, e in coverage_a)
+            length_b = sum(e - s for s, e in coverage_b)
+            both = _intersection_length(coverage_a, coverage_b)
+            counters = self.characters[category]
+            counters[0] += both
+            counters[1] += length_a - both
+            counters[2] += length_b - both
+        self.total_characters += text_length
+
+        key = tuple(sorted((annotator_a, annotator_b)))
+        stats = self.annotator_pairs[key]
+        stats[0] += len(exact)
+        stats[1] += len(partial)
+        stats[2] += len(spans_a)
+        stats[3] += len(spans_b)
+
+    def result(self):
+        categories = {}
+        for category in sorted(set(self.exact) | set(self.characters)):
+            exact_tp, exact_fp, exact_fn = self.exact[category]
+            partial_tp, partial_fp, partial_fn = self.partial[category]
+            both, only_a, only_b = self.characters[category]
+            categories[category] = {
+                'support': exact_tp * 2 + exact_fp + exact_fn,
+                'exact': _f1(exact_tp, exact_fp, exact_fn),
+                'partial': _f1(partial_tp, partial_fp, partial_fn),
+                'kappa': _kappa(both, only_a, only_b, self.total_characters),
+            }
+
+        def overall(counters):
+            tp = sum(values[0] for values in counters.values())
+            fp = sum(values[1] for values in counters.values())
+            fn = sum(values[2] for values in counters.values())
+            return _f1(tp, fp, fn)
+
+        annotators = []
+        for (annotator_a, annotator_b), (exact_tp, partial_tp, count_a, count_b) in sorted(self.annotator_pairs.items()):
+            annotators.append({
+                'annotators': [annotator_a, annotator_b],
+                'exact_f1': round(2 * exact_tp / (count_a + count_b), 4) if count_a + count_b else 0.0,
+                'partial_f1': round(2 * partial_tp / (count_a + count_b), 4) if count_a + count_b else 0.0,
+            })
+
+        return {
+            'documents': len(self.documents),
+            'pairs': self.pairs,
+            'overall': {'exact': overall(self.exact), 'partial': overall(self.partial)},
+            'categories': categories,
+            'annotator_pairs': annotators,
+        }
+
+
+def shared_data_ids(documents, min_annotators=2):
+    """min_annotators 명 이상의 사용자가 라벨링한 data_id (정렬됨)"""
+    return (
+        documents.values('data_id')
+        .annotate(annotator_count=Count('created_by', distinct=True))
+        .filter(annotator_count__gte=min_annotators)
+        .order_by('data_id')
+        .values_list('data_id', flat=True)
+    )
+
+
+def iter_annotation_groups(documents, chunk_size=500):
+    """data_id 별 [(document_id, username, text_length, spans), ...] 를 묶음 단위로 생성"""
+    chunk = []
+    for data_id in shared_data_ids(documents).iterator(chunk_size=chunk_size):
+        chunk.append(data_id)
+        if len(chunk) >= chunk_size:
+            yield from _load_groups(documents, chunk)
+            chunk = []
+    if chunk:
+        yield from _load_groups(documents, chunk)
+
+
+def _load_groups(documents, data_ids):
+    rows = (
+        documents.filter(data_id__in=data_ids)
+        .annotate(text_length=Length('body__text'))
+        .order_by('data_id', 'created_by__username')
+        .values_list('id', 'data_id', 'created_by__username', 'text_length')
+    )
+    spans = defaultdict(list)
+    for document_id, start, end, category in (
+        PIITag.objects.filter(document__in=[row[0] for row in rows])
+        .order_by('document_id', 'start_offset', 'end_offset', 'pii_category__value')
+        .values_list('document_id', 'start_offset', 'end_offset', 'pii_category__value')
+    ):
+        spans[document_id].append((start, end, category))
+
+    groups = defaultdict(list)
+    for document_id, data_id, username, text_length in rows:
+        groups[data_id].append((document_id, username, text_length or 0, spans.get(document_id, [])))
+    for data_id in data_ids:
+        if len(groups[data_id]) >= 2:
+            yield data_id, groups[data_id]
+
+
+def compute_agreement(documents, chunk_size=500):
+    """documents 범위에서 data_id 를 공유하는 모든 주석자 쌍의 일치도"""
+    accumulator = AgreementAccumulator()
+    for data_id, annotations in iter_annotation_groups(documents, chunk_size):
+        for first, second in combinations(annotations, 2):
+            _, annotator_a, length_a, spans_a = first
+            _, annotator_b, length_b, spans_b = second
+            accumulator.add_pair(data_id, annotator_a, spans_a, annotator_b, spans_b, max(length_a, length_b))
+    return accumulator.result()
+
+
+def cached_agreement(documents, cache_key_parts=(), refresh=False):
+    """문서 범위의 수정 시각/개수를 키에 포함하여 캐시된 일치도 반환"""
+    fingerprint = documents.aggregate(total=Count('id'), last_updated=Max('updated_at'))
+    raw_key = repr((cache_key_parts, fingerprint['total'], str(fingerprint['last_updated'])))
+    key = 'agreement:' + hashlib.sha1(raw_key.encode('utf-8')).hexdigest()
+    result = None if refresh else cache.get(key)
+    if result is None:
+        result = compute_agreement(documents)
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
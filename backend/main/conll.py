@@ -0,0 +1,170 @@
+"""
+토큰 단위 BIO/CoNLL 학습 데이터 내보내기
+
+문서 본문을 토크나이저로 (start, end) 토큰 목록으로 나누고, 정렬된 토큰과 태그 span 을 함께
+한 번 훑어(linear sweep) 각 토큰에 B-/I-/O 라벨을 붙입니다. 토큰이 span 과 한 글자라도
+겹치면 그 span 의 라벨을 받으며, span 의 첫 토큰이 B-, 나머지가 I- 입니다.
+
+토크나이저는 TOKENIZERS 에 이름으로 등록하며 모두 Python 표준 라이브러리만 씁니다.
+
+- whitespace: 공백 기준
+- char: 공백이 아닌 글자 하나씩
+- korean: 문자 종류(한글/영문/숫자/기호)별로 나누고 어절 끝의 조사를 떼어 냄 (형태소 분석 근사)
+- regex: 사용자 정규식의 매치 하나가 토큰 (빈 매치는 버리고, 공백이 든 매치는 공백에서 나눔)
+
+출력 형식은 conll(한 줄에 "토큰\\t라벨", 본문의 줄바꿈과 문서 사이는 빈 줄, 문서 시작은 -DOCSTART-)과
+jsonl({"data_id", "tokens", "labels"}) 입니다.
+"""
+
+import json
+import re
+
+from .export import map_chunks
+
+CONLL = 'conll'
+JSONL = 'jsonl'
+FORMATS = (CONLL, JSONL)
+
+OUTSIDE = 'O'
+DOCSTART = '-DOCSTART-'
+
+_SPACE = re.compile(r'\s')
+_WHITESPACE_TOKEN = re.compile(r'\S+')
+_CHAR_TOKEN = re.compile(r'\S')
+# 한글 / 영문 / 숫자 / 그 외 기호를 서로 다른 토큰으로
+_KOREAN_TOKEN = re.compile(r'[가-힣ㄱ-ㆎ]+|[A-Za-z]+|[0-9]+|[^\s가-힣ㄱ-ㆎA-Za-z0-9]')
+# 어절 끝에서 떼어 낼 조사 (긴 것부터 검사)
+JOSA = sorted((
+    '이', '가', '은', '는', '을', '를', '의', '에', '와', '과', '도', '로', '만', '께',
+    '으로', '에서', '에게', '한테', '께서', '부터', '까지', '처럼', '보다', '이나', '이랑', '랑',
+    '에서는', '으로는', '에게서', '이라고', '라고',
+), key=len, reverse=True)
+
+
+def _regex_tokens(pattern):
+    """pattern 의 매치 하나를 토큰 하나로 (빈 매치는 버리고, 공백이 든 매치는 공백에서 나눔)
+
+    CoNLL 한 줄은 "토큰\t라벨" 이므로 토큰에 탭/줄바꿈/공백이 들어가거나 빈 토큰이 나오면 안 된다.
+    """
+    def tokenize(text):
+        tokens = []
+        for match in pattern.finditer(text):
+            start, end = match.span()
+            if start == end:
+                continue
+            if _SPACE.search(text, start, end):
+                tokens.extend(piece.span() for piece in _WHITESPACE_TOKEN.finditer(text, start, end))
+            else:
+                tokens.append((start, end))
+        return tokens
+    return tokenize
+
+
+def _korean_tokens(text):
+    tokens = []
+    for match in _KOREAN_TOKEN.finditer(text):
+        start, end = match.span()
+        word = match.group()
+        if end - start > 1 and '가' <= word[0] <= '힣':
+            for josa in JOSA:
+                if len(word) > len(josa) and word.endswith(josa):
+                    tokens.append((start, end - len(josa)))
+                    start = end - len(josa)
+                    break
+        tokens.append((start, end))
+    return tokens
+
+
+TOKENIZERS = {
+    'whitespace': _regex_tokens(_WHITESPACE_TOKEN),
+    'char': _regex_tokens(_CHAR_TOKEN),
+    'korean': _korean_tokens,
+}
+REGEX = 'regex'
+TOKENIZER_NAMES = (*TOKENIZERS, REGEX)
+
+
+def get_tokenizer(name, pattern=None):
+    """이름으로 토크나이저 생성 (regex 는 pattern 필요, 잘못된 값은 ValueError)"""
+    if name == REGEX:
+        if not pattern:
+            raise ValueError('regex 토크나이저에는 정규식이 필요합니다.')
+        try:
+            return _regex_tokens(re.compile(pattern))
+        except re.error as e:
+            raise ValueError(f'잘못된 정규식입니다: {e}')
+    if name not in TOKENIZERS:
+        raise ValueError(f"알 수 없는 토크나이저입니다: {name} ({', '.join(TOKENIZER_NAMES)} 중 하나)")
+    return TOKENIZERS[name]
+
+
+def align_labels(tokens, spans):
+    """정렬된 토큰 [(start, end)] 에 BIO 라벨 목록을 붙임 (토큰/span 을 한 번씩만 훑음)
+
+    spans 는 (start, end, category, ...) 목록이다. 시작이 같으면 긴 span 을 먼저 쓰고,
+    앞선 span 과 겹치는 span 은 건너뛴다.
+    """
+    ordered = []
+    position = 0
+    for span in sorted(spans, key=lambda span: (span[0], -span[1])):
+        if span[0] >= position and span[1] > span[0]:
+            ordered.append(span)
+            position = span[1]
+
+    labels = []
+    index = 0
+    previous = None
+    for start, end in tokens:
+        while index < len(ordered) and ordered[index][1] <= start:
+            index += 1
+        if index < len(ordered) and ordered[index][0] < end:
+            span = ordered[index]
+            labels.append(f"{'I' if previous is span else 'B'}-{span[2]}")
+            previous = span
+        else:
+            labels.append(OUTSIDE)
+            previous = None
+    return labels
+
+
+def _conll_block(text, tokens, labels):
+    """문서 하나의 CoNLL 블록 (본문 줄바꿈마다 빈 줄로 문장을 나눔)"""
+    lines = [f'{DOCSTART}\t{OUTSIDE}', '']
+    newline = text.find('\n')
+    for (start, end), label in zip(tokens, labels):
+        if newline != -1 and start > newline:
+            if lines[-1]:
+                lines.append('')
+            newline = text.find('\n', start)
+        lines.append(f'{text[start:end]}\t{label}')
+    if lines[-1]:
+        lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+def conll_chunk(rows, tokenizer_name, pattern=None, output_format=CONLL):
+    """(metadata, text, spans) 묶음을 문서별 출력 문자열 목록으로 변환 (작업자 프로세스에서 실행)"""
+    tokenize = get_tokenizer(tokenizer_name, pattern)
+    blocks = []
+    for metadata, text, spans in rows:
+        tokens = tokenize(text)
+        labels = align_labels(tokens, spans)
+        if output_format == JSONL:
+            blocks.append(json.dumps({
+                'data_id': metadata['data_id'],
+                'tokens': [text[start:end] for start, end in tokens],
+                'labels': labels,
+            }, ensure_ascii=False) + '\n')
+        else:
+            blocks.append(_conll_block(text, tokens, labels))
+    return blocks
+
+
+def iter_conll(documents, tokenizer_name='whitespace', pattern=None, output_format=CONLL, workers=1, chunk_size=500):
+    """문서 QuerySet 을 문서별 BIO 블록으로 스트리밍 (id 순, workers 가 2 이상이면 프로세스 풀)"""
+    get_tokenizer(tokenizer_name, pattern)
+    if output_format not in FORMATS:
+        raise ValueError(f'알 수 없는 출력 형식입니다: {output_format}')
+    return map_chunks(
+        documents, conll_chunk, (tokenizer_name, pattern, output_format), workers=workers, chunk_size=chunk_size,
+    )
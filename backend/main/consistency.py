@@ -0,0 +1,423 @@
+"""
+코퍼스 전체 라벨 일관성 검사
+
+문서를 id 순 묶음으로 읽어 태그의 정규화 텍스트(NFKC, casefold, 공백 축약)마다 (카테고리, 식별자 유형)별
+태그 수를 해시 인덱스(dict)로 모으고 LabelCount 에 누적합니다. 그리고 다음을 검토 큐(ReviewItem)에 올립니다.
+
+- category_outlier: 같은 텍스트가 다른 문서에서 대부분 다른 카테고리로 태깅됨
+- identifier_outlier: 같은 텍스트/카테고리가 대부분 다른 식별자 유형(DIRECT/QUASI)으로 태깅됨
+- entity_mixed: 한 문서의 같은 entity_id 에 서로 다른 카테고리가 섞임
+- PII_LABELING_GUIDELINES.md 규칙: 카테고리별 식별자 유형, 범위 앞뒤 공백/구두점, PERSON 끝의 호칭, 태그 겹침
+
+규칙과 기준값은 DEFAULT_RULES 이며 CONSISTENCY_RULES_PATH(JSON)로 바꿀 수 있습니다.
+검사는 증분입니다. 문서별로 검사한 updated_at 과 규칙 digest 를 남겨, 다시 실행하면 새로 생겼거나
+바뀐 문서만 읽어 이전 기여분을 빼고 새 기여분을 더한 뒤 건드린 텍스트의 이상치만 다시 계산합니다.
+"""
+
+import hashlib
+import json
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import ConsistencyDocument, Document, LabelCount, LabelOccurrence, PIITag, ReviewItem
+from .propagation import normalize_text
+
+DIRECT = 'DIRECT'
+QUASI = 'QUASI'
+
+DEFAULT_RULES = {
+    # "PII 태그 종류 및 설명": 직접 식별자 / 간접 식별자 (목록에 없는 카테고리는 검사하지 않음)
+    'identifier_types': {
+        'PERSON': DIRECT, 'CODE': DIRECT,
+        'DATETIME': QUASI, 'DEM': QUASI, 'LOC': QUASI, 'MISC': QUASI, 'ORG': QUASI, 'QUANTITY': QUASI,
+    },
+    # "정확한 범위 선택": 범위 앞뒤에 오면 안 되는 공백/구두점
+    'boundary_characters': ' \t\r\n.,;:!?…',
+    # "문맥 고려": PERSON 범위 끝에 붙으면 안 되는 호칭 ("김철수씨" → "김철수")
+    'person_suffixes': ['씨', '님'],
+    # "겹침 방지": 태그 범위가 겹치면 검토
+    'forbid_overlap': True,
+    # 같은 텍스트에서 태그 수가 min_support 이상이고 비율이 max_outlier_share 이하인 라벨을 이상치로 봄
+    'min_support': 3,
+    'max_outlier_share': 0.25,
+    # 검토 큐 순위 가중치
+    'weights': {
+        ReviewItem.CATEGORY_OUTLIER: 1.0,
+        ReviewItem.IDENTIFIER_OUTLIER: 0.8,
+        ReviewItem.ENTITY_MIXED: 0.9,
+        ReviewItem.IDENTIFIER_RULE: 0.6,
+        ReviewItem.OVERLAP: 0.7,
+        ReviewItem.SPAN_BOUNDARY: 0.5,
+        ReviewItem.PERSON_SUFFIX: 0.5,
+    },
+}
+
+KEY_LENGTH = LabelOccurrence._meta.get_field('key').max_length
+# 한 트랜잭션에서 이상치를 다시 계산하는 텍스트 수
+OUTLIER_BATCH_SIZE = 500
+
+
+def validate_rules(rules):
+    """규칙을 기본값과 합쳐 반환 (알 수 없는 키나 잘못된 값은 ValueError)"""
+    merged = json.loads(json.dumps(DEFAULT_RULES))
+    for name, value in rules.items():
+        if name not in DEFAULT_RULES:
+            raise ValueError(f'알 수 없는 일관성 규칙입니다: {name}')
+        if name in ('identifier_types', 'weights'):
+            if not isinstance(value, dict):
+                raise ValueError(f'{name} 은(는) 객체여야 합니다.')
+            if name == 'weights':
+                unknown = set(value) - set(DEFAULT_RULES['weights'])
+                if unknown:
+                    raise ValueError(f"알 수 없는 검토 유형입니다: {', '.join(sorted(unknown))}")
+                if not all(isinstance(weight, (int, float)) and weight >= 0 for weight in value.values()):
+                    raise ValueError('weights 값은 0 이상의 숫자여야 합니다.')
+                merged[name].update(value)
+            else:
+                merged[name] = {str(category): str(identifier_type) for category, identifier_type in value.items()}
+        elif name == 'person_suffixes':
+            if not isinstance(value, list) or not all(isinstance(suffix, str) and suffix for suffix in value):
+                raise ValueError('person_suffixes 는 문자열 목록이어야 합니다.')
+            merged[name] = value
+        elif name == 'boundary_characters':
+            if not isinstance(value, str):
+                raise ValueError('boundary_characters 는 문자열이어야 합니다.')
+            merged[name] = value
+        elif name == 'forbid_overlap':
+            merged[name] = bool(value)
+        elif name == 'min_support':
+            if not isinstance(value, int) or value < 2:
+                raise ValueError('min_support 는 2 이상의 정수여야 합니다.')
+            merged[name] = value
+        elif name == 'max_outlier_share':
+            if not isinstance(value, (int, float)) or not 0 < value < 0.5:
+                raise ValueError('max_outlier_share 는 0 과 0.5 사이여야 합니다.')
+            merged[name] = float(value)
+    return merged
+
+
+def load_rules(path=None):
+    """path(기본: CONSISTENCY_RULES_PATH)의 JSON 규칙을 기본값과 합쳐 반환"""
+    path = path or settings.CONSISTENCY_RULES_PATH
+    if not path:
+        return validate_rules({})
+    with open(path, encoding='utf-8') as f:
+        return validate_rules(json.load(f))
+
+
+def rules_digest(rules):
+    return hashlib.sha1(json.dumps(rules, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def normalize_key(span_text):
+    return normalize_text(span_text)[0].strip()[:KEY_LENGTH]
+
+
+def _score(rules, kind, share=0.0, support=1):
+    """가중치 × (1 - 라벨 비율) × 근거 수의 로그 보정 (근거가 많을수록 확실한 불일치)"""
+    return round(rules['weights'][kind] * (1 - share) * (1 + math.log10(max(support, 1))), 4)
+
+
+def analyze_document(tags, rules):
+    """문서 하나의 태그를 검사하여 (출현 목록, 문서 안 검토 항목 목록) 반환
+
+    tags 는 start 순 (id, start, end, span_text, category, identifier_type, entity_id) 목록이다.
+    출현은 (tag_id, key, category, identifier_type), 검토 항목은 (kind, tag, expected, message, support, score) 이다.
+    """
+    occurrences = []
+    findings = []
+    boundary = rules['boundary_characters']
+    entities = defaultdict(list)
+    previous = None
+    for tag in tags:
+        tag_id, start, end, span_text, category, identifier_type, entity_id = tag
+        key = normalize_key(span_text)
+        if key:
+            occurrences.append((tag_id, key, category, identifier_type))
+        if entity_id:
+            entities[entity_id].append(tag)
+
+        expected = rules['identifier_types'].get(category)
+        if expected and identifier_type and identifier_type != expected:
+            findings.append((
+                ReviewItem.IDENTIFIER_RULE, tag, expected,
+                f'가이드라인상 {category} 는 {expected} 식별자입니다.', 1, _score(rules, ReviewItem.IDENTIFIER_RULE),
+            ))
+        if boundary and span_text and (span_text[0] in boundary or span_text[-1] in boundary):
+            findings.append((
+                ReviewItem.SPAN_BOUNDARY, tag, span_text.strip(boundary),
+                '범위 앞뒤에 공백이나 구두점이 포함되어 있습니다.', 1, _score(rules, ReviewItem.SPAN_BOUNDARY),
+            ))
+        if category == 'PERSON':
+            for suffix in rules['person_suffixes']:
+                if len(span_text) > len(suffix) and span_text.endswith(suffix):
+                    findings.append((
+                        ReviewItem.PERSON_SUFFIX, tag, span_text[:-len(suffix)],
+                        f"이름 뒤의 호칭 '{suffix}' 은(는) 범위에서 제외합니다.", 1, _score(rules, ReviewItem.PERSON_SUFFIX),
+                    ))
+                    break
+        if rules['forbid_overlap'] and previous is not None and start < previous[2]:
+            findings.append((
+                ReviewItem.OVERLAP, tag, previous[3],
+                f"'{previous[3]}' ({previous[4]}) 태그와 범위가 겹칩니다.", 2, _score(rules, ReviewItem.OVERLAP),
+            ))
+        if previous is None or end > previous[2]:
+            previous = tag
+
+    for entity_tags in entities.values():
+        categories = Counter(tag[4] for tag in entity_tags)
+        if len(categories) < 2:
+            continue
+        majority, _ = categories.most_common(1)[0]
+        for tag in entity_tags:
+            if tag[4] != majority:
+                share = categories[tag[4]] / len(entity_tags)
+                findings.append((
+                    ReviewItem.ENTITY_MIXED, tag, majority,
+                    f'entity {tag[6]} 의 다른 태그는 대부분 {majority} 입니다.', len(entity_tags),
+                    _score(rules, ReviewItem.ENTITY_MIXED, share, len(entity_tags)),
+                ))
+    return occurrences, findings
+
+
+def find_outliers(label_counts, rules):
+    """한 텍스트의 {(category, identifier_type): 태그 수} 에서 이상치 라벨 목록 반환
+
+    항목은 (kind, category, identifier_type, expected, share, support) 이며, category_outlier 의
+    identifier_type 은 None(그 카테고리의 모든 태그)이다.
+    """
+    outliers = []
+    categories = Counter()
+    identifier_types = defaultdict(Counter)
+    for (category, identifier_type), count in label_counts.items():
+        categories[category] += count
+        if identifier_type:
+            identifier_types[category][identifier_type] += count
+
+    total = sum(categories.values())
+    if total >= rules['min_support'] and len(categories) > 1:
+        majority, _ = categories.most_common(1)[0]
+        for category, count in categories.items():
+            share = count / total
+            if category != majority and share <= rules['max_outlier_share']:
+                outliers.append((ReviewItem.CATEGORY_OUTLIER, category, None, majority, share, total))
+
+    for category, counts in identifier_types.items():
+        total = sum(counts.values())
+        if total < rules['min_support'] or len(counts) < 2:
+            continue
+        majority, _ = counts.most_common(1)[0]
+        for identifier_type, count in counts.items():
+            share = count / total
+            if identifier_type != majority and share <= rules['max_outlier_share']:
+                outliers.append((ReviewItem.IDENTIFIER_OUTLIER, category, identifier_type, majority, share, total))
+    return outliers
+
+
+def _review_item(document_id, kind, tag, expected, message, support, score, key='', dismissed=frozenset()):
+    tag_id, start, end, span_text, category, identifier_type, _ = tag
+    return ReviewItem(
+        document_id=document_id, tag_id=tag_id, kind=kind, key=key, span_text=span_text,
+        start_offset=start, end_offset=end, category=category, identifier_type=identifier_type,
+        expected=expected[:500], message=message[:500], support=support, score=score,
+        dismissed=(tag_id, kind) in dismissed,
+    )
+
+
+def _apply_counts(delta):
+    """(key, category, identifier_type) 별 증감을 LabelCount 에 반영 (0 이 되면 삭제)"""
+    delta = {label: change for label, change in delta.items() if change}
+    if not delta:
+        return
+    existing = {
+        (row.key, row.category, row.identifier_type): row
+        for row in LabelCount.objects.filter(key__in={key for key, _, _ in delta})
+    }
+    updated, created, removed = [], [], []
+    for label, change in delta.items():
+        row = existing.get(label)
+        if row is None:
+            if change > 0:
+                created.append(LabelCount(key=label[0], category=label[1], identifier_type=label[2], count=change))
+        elif row.count + change > 0:
+            row.count += change
+            updated.append(row)
+        else:
+            removed.append(row.id)
+    LabelCount.objects.bulk_create(created, batch_size=1000)
+    LabelCount.objects.bulk_update(updated, ['count'], batch_size=1000)
+    LabelCount.objects.filter(id__in=removed).delete()
+
+
+def _replace_documents(documents, rules, digest):
+    """문서 묶음 [(id, updated_at)] 의 이전 기여분을 새 검사 결과로 바꾸고 건드린 텍스트 집합 반환
+
+    updated_at 이 None 이면 삭제되었거나 범위에서 빠진 문서로 보고 기여분만 뺀다.
+    """
+    document_ids = [document_id for document_id, _ in documents]
+    tags = defaultdict(list)
+    rows = PIITag.objects.filter(document_id__in=document_ids).values_list(
+        'document_id', 'id', 'start_offset', 'end_offset', 'span_text', 'pii_category__value', 'identifier_type', 'entity_id',
+    )
+    for document_id, *tag in rows:
+        tags[document_id].append(tuple(tag))
+
+    delta = Counter()
+    previous = LabelOccurrence.objects.filter(document_id__in=document_ids)
+    for label in previous.values_list('key', 'category', 'identifier_type'):
+        delta[label] -= 1
+    previous.delete()
+    # 이상치 항목은 건드린 텍스트마다 _refresh_outliers 가 다시 만든다
+    items = ReviewItem.objects.filter(document_id__in=document_ids).exclude(kind__in=ReviewItem.OUTLIER_KINDS)
+    dismissed = defaultdict(set)
+    for document_id, tag_id, kind in items.filter(dismissed=True).values_list('document_id', 'tag_id', 'kind'):
+        dismissed[document_id].add((tag_id, kind))
+    items.delete()
+    ConsistencyDocument.objects.filter(document_id__in=document_ids).delete()
+
+    occurrences, review_items, states = [], [], []
+    for document_id, updated_at in documents:
+        if updated_at is None:
+            continue
+        document_occurrences, findings = analyze_document(tags[document_id], rules)
+        for tag_id, key, category, identifier_type in document_occurrences:
+            delta[(key, category, identifier_type)] += 1
+            occurrences.append(LabelOccurrence(
+                document_id=document_id, tag_id=tag_id, key=key, category=category, identifier_type=identifier_type,
+            ))
+        review_items.extend(
+            _review_item(document_id, *finding, dismissed=dismissed[document_id]) for finding in findings
+        )
+        states.append(ConsistencyDocument(document_id=document_id, updated_at=updated_at, rules_digest=digest))
+
+    LabelOccurrence.objects.bulk_create(occurrences, batch_size=1000)
+    ReviewItem.objects.bulk_create(review_items, batch_size=1000)
+    ConsistencyDocument.objects.bulk_create(states, batch_size=1000)
+    _apply_counts(delta)
+    return {key for key, _, _ in delta}
+
+
+def _refresh_outliers(keys, rules):
+    """keys 텍스트의 이상치 검토 항목을 LabelCount 로 다시 계산하고 생성한 항목 수 반환"""
+    outlier_items = ReviewItem.objects.filter(kind__in=ReviewItem.OUTLIER_KINDS, key__in=keys)
+    dismissed = set(outlier_items.filter(dismissed=True).values_list('tag_id', 'kind'))
+    outlier_items.delete()
+
+    label_counts = defaultdict(dict)
+    for key, category, identifier_type, count in LabelCount.objects.filter(key__in=keys).values_list(
+        'key', 'category', 'identifier_type', 'count'
+    ):
+        label_counts[key][(category, identifier_type)] = count
+    flagged = {}
+    for key, counts in label_counts.items():
+        for kind, category, identifier_type, expected, share, support in find_outliers(counts, rules):
+            flagged[(key, category, identifier_type)] = (kind, expected, share, support)
+    if not flagged:
+        return 0
+
+    occurrences = LabelOccurrence.objects.filter(key__in={key for key, _, _ in flagged}).values_list(
+        'document_id', 'tag_id', 'key', 'category', 'identifier_type'
+    )
+    matches = []
+    for document_id, tag_id, key, category, identifier_type in occurrences:
+        for label in ((key, category, None), (key, category, identifier_type)):
+            if label in flagged:
+                matches.append((document_id, tag_id, key, flagged[label]))
+    if not matches:
+        return 0
+
+    tags = {
+        tag[0]: tag
+        for tag in PIITag.objects.filter(
+            id__in={tag_id for _, tag_id, _, _ in matches}, document_id__in={document_id for document_id, *_ in matches},
+        ).values_list('id', 'start_offset', 'end_offset', 'span_text', 'pii_category__value', 'identifier_type', 'entity_id')
+    }
+    review_items = []
+    for document_id, tag_id, key, (kind, expected, share, support) in matches:
+        if tag_id not in tags:
+            continue
+        if kind == ReviewItem.CATEGORY_OUTLIER:
+            message = f"'{key}' 는 다른 태그 {support}개 중 대부분 {expected} 입니다 ({share:.0%} 만 {tags[tag_id][4]})."
+        else:
+            message = f"'{key}' ({tags[tag_id][4]}) 는 다른 태그 {support}개 중 대부분 {expected} 입니다 ({share:.0%} 만 {tags[tag_id][5]})."
+        review_items.append(_review_item(
+            document_id, kind, tags[tag_id], expected, message, support, _score(rules, kind, share, support),
+            key=key, dismissed=dismissed,
+        ))
+    ReviewItem.objects.bulk_create(review_items, batch_size=1000)
+    return len(review_items)
+
+
+def check_consistency(documents=None, rules=None, full=False, chunk_size=500):
+    """documents(기본: gold 를 뺀 전체 문서)의 라벨 일관성을 증분 검사하고 요약 반환
+
+    full=True 이면 이전 결과를 모두 지우고 처음부터 검사한다 (무시한 검토 항목도 초기화).
+    """
+    rules = validate_rules({}) if rules is None else rules
+    digest = rules_digest(rules)
+    if documents is None:
+        documents = Document.objects.exclude(created_by__username=settings.ADJUDICATION_USERNAME)
+    if full:
+        with transaction.atomic():
+            for model in (ReviewItem, LabelOccurrence, LabelCount, ConsistencyDocument):
+                model.objects.all().delete()
+
+    summary = {'documents': 0, 'removed': 0, 'keys': 0, 'outliers': 0}
+    keys = set()
+
+    # 삭제되었거나 범위에서 빠진 문서의 기여분 제거
+    removed = list(
+        ConsistencyDocument.objects.exclude(document_id__in=documents.values('id')).values_list('document_id', flat=True)
+    )
+    for start in range(0, len(removed), chunk_size):
+        with transaction.atomic():
+            keys |= _replace_documents([(document_id, None) for document_id in removed[start:start + chunk_size]], rules, digest)
+    summary['removed'] = len(removed)
+
+    # 처음 보거나 수정되었거나 규칙이 바뀐 문서만 다시 검사
+    current = ConsistencyDocument.objects.filter(
+        document_id=OuterRef('pk'), updated_at=OuterRef('updated_at'), rules_digest=digest,
+    )
+    changed = documents.filter(~Exists(current))
+    last_id = 0
+    while True:
+        chunk = list(changed.filter(id__gt=last_id).order_by('id').values_list('id', 'updated_at')[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        with transaction.atomic():
+            keys |= _replace_documents(chunk, rules, digest)
+        summary['documents'] += len(chunk)
+
+    keys = sorted(keys)
+    for start in range(0, len(keys), OUTLIER_BATCH_SIZE):
+        with transaction.atomic():
+            summary['outliers'] += _refresh_outliers(keys[start:start + OUTLIER_BATCH_SIZE], rules)
+    summary['keys'] = len(keys)
+    summary['queue'] = ReviewItem.objects.filter(dismissed=False).count()
+    return summary
+
+
+def review_item_to_dict(item):
+    return {
+        'id': item.id,
+        'document_id': item.document_id,
+        'data_id': item.document.data_id,
+        'tag_id': item.tag_id,
+        'kind': item.kind,
+        'kind_label': item.get_kind_display(),
+        'span_text': item.span_text,
+        'start_offset': item.start_offset,
+        'end_offset': item.end_offset,
+        'category': item.category,
+        'identifier_type': item.identifier_type,
+        'expected': item.expected,
+        'message': item.message,
+        'support': item.support,
+        'score': item.score,
+        'dismissed': item.dismissed,
+    }
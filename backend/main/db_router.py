@@ -0,0 +1,165 @@
+"""
+읽기 전용 복제본 라우팅
+
+settings.READ_REPLICA_ALIAS 가 설정되면(DB_REPLICA_HOST) 목록/검색/통계/내보내기처럼 쓰기가 없는
+무거운 읽기를 복제본 DB 로 보내고, 태그 편집 같은 쓰기와 나머지 읽기는 primary(default)에 둡니다.
+
+- 복제본 읽기는 opt-in 입니다. use_read_replica 로 감싼 뷰와 read_replica() 블록 안의 읽기만
+  복제본으로 가며, 트랜잭션(atomic) 안의 읽기는 항상 primary 입니다.
+- 쓰기는 항상 primary 입니다. 요청 중 primary 에 쓰기 SQL 이 실행되었으면 (ORM, raw SQL 모두)
+  ReplicaPinMiddleware 가 응답에 고정 쿠키를 붙이고, 쿠키가 유효한 동안(REPLICA_PIN_SECONDS)
+  그 브라우저의 읽기는 복제 지연과 무관하게 primary 에서 합니다 (read-your-writes).
+"""
+
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_PIN_COOKIE = 'primary_pin'
+
+# 쓰기가 아닌 SQL (트랜잭션 제어 포함)
+_READ_STATEMENTS = ('SELECT', 'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'SET', 'SHOW', 'EXPLAIN')
+
+# 현재 읽기를 보낼 DB 별칭 (None 이면 라우터가 관여하지 않아 default)
+_read_database = ContextVar('read_database', default=None)
+
+
+class ReplicaRouter:
+    """read_replica() 블록의 읽기는 복제본으로, 쓰기와 마이그레이션은 primary 로"""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_database.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 복제본은 primary 의 사본이므로 어느 쪽에서 읽은 객체든 서로 참조할 수 있다
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def is_pinned(request):
+    """최근에 쓰기를 한 브라우저인지 (고정 쿠키가 아직 유효한지)"""
+    try:
+        return float(request.COOKIES.get(REPLICA_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+@contextmanager
+def read_replica(request=None):
+    """블록 안의 읽기를 복제본으로 (복제본이 없거나 request 가 고정 상태면 primary), 별칭을 반환"""
+    alias = settings.READ_REPLICA_ALIAS or None
+    if request is not None and is_pinned(request):
+        alias = None
+    token = _read_database.set(alias)
+    try:
+        yield alias or DEFAULT_DB_ALIAS
+    finally:
+        _read_database.reset(token)
+
+
+def _iter_reading_from(alias, iterator):
+    """스트리밍 응답을 뷰가 끝난 뒤 소비할 때도 같은 DB 에서 읽도록 항목마다 별칭을 다시 지정"""
+    iterator = iter(iterator)
+    while True:
+        token = _read_database.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _read_database.reset(token)
+        yield chunk
+
+
+def use_read_replica(view_func):
+    """쓰기가 없는 (동기) 뷰의 읽기를 복제본으로 보내는 데코레이터
+
+    스트리밍 응답은 소비 시점에도, TemplateResponse 는 렌더링까지 복제본에서 읽는다.
+    """
+
+    @wraps(view_func)
+    def _wrapper_view(request, *args, **kwargs):
+        with read_replica(request):
+            alias = _read_database.get()
+            response = view_func(request, *args, **kwargs)
+            if response.streaming:
+                response.streaming_content = _iter_reading_from(alias, response.streaming_content)
+            elif hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+
+    return _wrapper_view
+
+
+class _WriteRecorder:
+    """connection.execute_wrapper 로 설치되어 쓰기 SQL 실행 여부를 기록"""
+
+    def __init__(self):
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.wrote and not sql.lstrip().upper().startswith(_READ_STATEMENTS):
+            self.wrote = True
+        return execute(sql, params, many, context)
+
+
+class ReplicaPinMiddleware:
+    """요청 중 primary 쓰기가 있었으면 REPLICA_PIN_SECONDS 동안 읽기를 primary 로 고정하는 쿠키 설정
+
+    settings.READ_REPLICA_ALIAS 가 있을 때만 MIDDLEWARE 에 추가된다 (세션 저장은 세지 않도록 SessionMiddleware 뒤).
+    라우터를 거치지 않는 쓰기(.using(), raw SQL)도 잡도록 primary 연결의 실행 SQL 을 본다.
+    sync/async 양쪽을 지원하므로 ASGI 에서 async 뷰를 sync 스레드로 옮기지 않는다.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        writes = _WriteRecorder()
+        with ExitStack() as stack:
+            self._install(stack, writes)
+            response = self.get_response(request)
+        return self._pin(response, writes)
+
+    async def __acall__(self, request):
+        writes = _WriteRecorder()
+        with ExitStack() as stack:
+            # async 뷰의 ORM 쿼리는 요청의 sync 스레드에서 실행되므로 그 스레드의 primary 연결에 설치한다
+            await sync_to_async(self._install)(stack, writes)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        return self._pin(response, writes)
+
+    @staticmethod
+    def _install(stack, writes):
+        stack.enter_context(connections[DEFAULT_DB_ALIAS].execute_wrapper(writes))
+
+    def _pin(self, response, writes):
+        if writes.wrote:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                REPLICA_PIN_COOKIE, f'{time.time() + seconds:.3f}', max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,46 @@
+"""
+async 뷰용 데코레이터
+
+Django 4.2 의 login_required/csrf_exempt 는 뷰를 동기 함수로 감싸므로
+async 뷰에 쓰면 ASGI 에서 스레드로 넘어가 코루틴이 실행되지 않는다.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+
+
+def async_login_required(view_func):
+    """login_required 의 async 버전 (request.user 를 미리 평가하여 뷰에서 바로 사용 가능)"""
+
+    @wraps(view_func)
+    async def _wrapper_view(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if is_authenticated:
+            return await view_func(request, *args, **kwargs)
+        return redirect_to_login(request.get_full_path())
+
+    return _wrapper_view
+
+
+def async_csrf_exempt(view_func):
+    """csrf_exempt 의 async 버전"""
+
+    @wraps(view_func)
+    async def _wrapper_view(*args, **kwargs):
+        return await view_func(*args, **kwargs)
+
+    _wrapper_view.csrf_exempt = True
+    return _wrapper_view
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    """get_object_or_404 의 async 버전 (queryset 에 모델 클래스도 허용)"""
+    if hasattr(queryset, '_default_manager'):
+        queryset = queryset._default_manager.all()
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
@@ -0,0 +1,122 @@
+"""
+비식별화 출력 (마스킹/가명 처리된 본문 내보내기)
+
+문서 본문을 그 문서의 PIITag 로 다시 써서 비식별화된 JSONL 을 만듭니다.
+태그의 identifier_type(DIRECT/QUASI/그 외)별로 규칙을 고를 수 있습니다.
+
+- placeholder: 카테고리 자리표시자 ``[PERSON]``
+- pseudonym: entity_id 별로 일관된 가명 ``[PERSON_1]`` (같은 entity 의 모든 언급이 같은 번호)
+- redact: 같은 길이의 ``*``
+- keep: 원문 유지
+
+본문은 정렬된 span 을 한 번 훑으며 조각 목록을 만들어 join 하므로 본문 길이와 태그 수에 선형입니다.
+문서는 id 순 묶음으로 읽고, 묶음별 재작성은 작업자 프로세스에서 수행하여 결과를 순서대로 스트리밍합니다.
+"""
+
+import json
+
+from .export import map_chunks
+from .offsets import CODEPOINT, OffsetMap
+
+PLACEHOLDER = 'placeholder'
+PSEUDONYM = 'pseudonym'
+REDACT = 'redact'
+KEEP = 'keep'
+RULES = (PLACEHOLDER, PSEUDONYM, REDACT, KEEP)
+RULE_LABELS = {PLACEHOLDER: '카테고리', PSEUDONYM: '가명', REDACT: '***', KEEP: '원문 유지'}
+
+# 규칙을 고르는 identifier_type (DIRECT/QUASI 가 아닌 태그는 OTHER 규칙을 따른다)
+DIRECT = 'DIRECT'
+QUASI = 'QUASI'
+OTHER = 'OTHER'
+DEFAULT_RULES = {DIRECT: PSEUDONYM, QUASI: PLACEHOLDER, OTHER: PLACEHOLDER}
+
+
+def validate_rules(rules):
+    """identifier_type 별 규칙을 기본값과 합쳐 반환 (알 수 없는 규칙은 ValueError)"""
+    merged = dict(DEFAULT_RULES)
+    for identifier_type, rule in rules.items():
+        if identifier_type not in DEFAULT_RULES:
+            raise ValueError(f'알 수 없는 식별자 유형입니다: {identifier_type}')
+        if rule not in RULES:
+            raise ValueError(f'알 수 없는 비식별화 규칙입니다: {rule}')
+        merged[identifier_type] = rule
+    return merged
+
+
+def deidentify_text(text, spans, rules):
+    """본문을 span 규칙대로 다시 써서 (비식별 본문, 치환 목록) 반환
+
+    spans 는 (start, end, category, identifier_type, entity_id) 목록이다. 시작이 같으면 긴 span 을
+    먼저 적용하고, 앞선 span 과 일부만 겹치는 span 은 아직 치환되지 않은 나머지 구간을 치환한다
+    (원문이 새어 나가지 않도록). 앞선 span 에 완전히 덮인 span 과 본문 범위를 벗어난 span 은 건너뛴다.
+    치환 목록의 오프셋은 비식별 본문 기준이다.
+    """
+    parts = []
+    replacements = []
+    pseudonyms = {}
+    counters = {}
+    position = 0
+    length = 0
+    for start, end, category, identifier_type, entity_id in sorted(spans, key=lambda span: (span[0], -span[1])):
+        if end <= position or end <= start or end > len(text):
+            continue
+        rule = rules.get(identifier_type, rules[OTHER])
+        if rule == KEEP:
+            continue
+        begin = max(start, position)
+        if rule == REDACT:
+            replacement = '*' * (end - begin)
+        elif rule == PSEUDONYM:
+            # entity_id 가 없는 태그는 같은 원문끼리 같은 가명을 받는다
+            key = (category, entity_id or text[start:end])
+            if key not in pseudonyms:
+                counters[category] = counters.get(category, 0) + 1
+                pseudonyms[key] = f'[{category}_{counters[category]}]'
+            replacement = pseudonyms[key]
+        else:
+            replacement = f'[{category}]'
+
+        parts.append(text[position:begin])
+        length += begin - position
+        replacements.append({
+            'entity_type': category,
+            'identifier_type': identifier_type,
+            'entity_id': entity_id,
+            'rule': rule,
+            'start_offset': length,
+            'end_offset': length + len(replacement),
+        })
+        parts.append(replacement)
+        length += len(replacement)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts), replacements
+
+
+def deidentify_chunk(rows, rules, offset_unit=CODEPOINT):
+    """(metadata, text, spans) 묶음을 비식별 JSONL 줄 목록으로 변환 (작업자 프로세스에서 실행)
+
+    치환 위치는 offset_unit 단위로 기록한다 (비식별 본문의 오프셋 맵을 문서마다 한 번 만든다).
+    """
+    lines = []
+    for metadata, text, spans in rows:
+        deidentified, replacements = deidentify_text(text, spans, rules)
+        if offset_unit != CODEPOINT and replacements:
+            offset_map = OffsetMap.build(deidentified)
+            for replacement in replacements:
+                replacement['start_offset'] = offset_map.to_unit(replacement['start_offset'], offset_unit)
+                replacement['end_offset'] = offset_map.to_unit(replacement['end_offset'], offset_unit)
+        lines.append(json.dumps(
+            {'metadata': metadata, 'text': deidentified, 'entities': replacements}, ensure_ascii=False,
+        ) + '\n')
+    return lines
+
+
+def iter_deidentified(documents, rules=None, workers=1, chunk_size=500, offset_unit=CODEPOINT):
+    """문서 QuerySet 을 비식별 JSONL 줄로 스트리밍 (id 순)
+
+    workers 가 2 이상이면 묶음별 재작성을 프로세스 풀에서 수행한다 (main/export.py).
+    """
+    rules = validate_rules(rules or {})
+    return map_chunks(documents, deidentify_chunk, (rules, offset_unit), workers=workers, chunk_size=chunk_size)
@@ -0,0 +1,129 @@
+"""
+코퍼스 내보내기 공통 처리 (id 순 묶음 읽기, 프로세스 풀 변환, 순서 유지 스트리밍)
+
+문서를 id 순 keyset 묶음으로 읽어 (metadata, text, spans) 목록으로 만들고, 묶음별 변환 함수를
+요청 프로세스 또는 작업자 프로세스에서 실행하여 결과를 원래 순서대로 내보냅니다.
+변환 함수는 Django 없이 실행되는 모듈 수준 함수여야 합니다 (비식별화: main/deidentify.py, BIO: main/conll.py).
+결과는 ShardWriter 로 문서 수 기준 샤드 파일(gzip/zstd 압축 선택)에 나누어 쓸 수 있습니다.
+"""
+
+import gzip
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+
+from .models import PIITag
+
+try:
+    import zstandard
+except ImportError:  # zstd 압축을 쓸 때만 필요
+    zstandard = None
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+COMPRESSIONS = (GZIP, ZSTD)
+EXTENSIONS = {None: '', GZIP: '.gz', ZSTD: '.zst'}
+
+# read_chunks 가 태그마다 읽는 값 (코드 포인트 오프셋)
+SPAN_FIELDS = ('start_offset', 'end_offset', 'pii_category__value', 'identifier_type', 'entity_id')
+
+
+def read_chunks(documents, chunk_size, span_fields=SPAN_FIELDS):
+    """문서를 id 순 묶음으로 읽어 (metadata, text, spans) 목록으로 반환
+
+    spans 는 태그마다 span_fields 값의 튜플이다 (기본: start, end, category, identifier_type, entity_id).
+    """
+    last_id = 0
+    while True:
+        chunk = list(
+            documents.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'data_id', 'number_of_subjects', 'provenance', 'body__text')[:chunk_size]
+        )
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+        spans = {document_id: [] for document_id, *_ in chunk}
+        tags = PIITag.objects.filter(document_id__in=list(spans)).values_list('document_id', *span_fields)
+        for document_id, *span in tags:
+            spans[document_id].append(tuple(span))
+        yield [
+            (
+                {'data_id': data_id, 'number_of_subjects': number_of_subjects, 'provenance': provenance},
+                text,
+                spans[document_id],
+            )
+            for document_id, data_id, number_of_subjects, provenance, text in chunk
+        ]
+
+
+def map_chunks(documents, convert, args=(), workers=1, chunk_size=500):
+    """묶음마다 convert(rows, *args) 가 반환한 목록의 항목을 id 순으로 하나씩 생성
+
+    workers 가 2 이상이면 변환을 프로세스 풀에서 수행한다. 진행 중인 묶음 수를 제한하여
+    메모리 사용량은 코퍼스 크기가 아니라 workers * chunk_size 에 비례한다.
+    """
+    if workers <= 1:
+        for rows in read_chunks(documents, chunk_size):
+            yield from convert(rows, *args)
+        return
+
+    # fork 된 작업자가 부모의 DB 연결을 물려받지 않도록 연결을 닫고 작업자를 미리 띄운다
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        executor.submit(len, ()).result()
+        pending = []
+        for rows in read_chunks(documents, chunk_size):
+            pending.append(executor.submit(convert, rows, *args))
+            if len(pending) >= workers * 2:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+
+def open_compressed(path, compression=None):
+    """텍스트 쓰기용 파일 열기 (gzip 은 헤더 시각을 0 으로 고정하여 같은 내용이면 같은 바이트)"""
+    if compression == GZIP:
+        return io.TextIOWrapper(gzip.GzipFile(path, 'wb', mtime=0), encoding='utf-8')
+    if compression == ZSTD:
+        if zstandard is None:
+            raise ValueError('zstd 압축에는 zstandard 패키지가 필요합니다.')
+        return zstandard.open(path, 'wt', encoding='utf-8')
+    if compression is not None:
+        raise ValueError(f"알 수 없는 압축 형식입니다: {compression} ({', '.join(COMPRESSIONS)} 중 하나)")
+    return open(path, 'w', encoding='utf-8')
+
+
+class ShardWriter:
+    """문서 블록을 shard_size 개씩 part-NNNNN.<extension>[.gz|.zst] 파일에 나누어 기록
+
+    shards 에 샤드마다 파일 이름, 문서 수, write(tags=...) 로 넘긴 태그 수를 남긴다.
+    """
+
+    def __init__(self, directory, extension, shard_size, compression=None):
+        self.directory = directory
+        self.extension = extension + EXTENSIONS[compression]
+        self.compression = compression
+        self.shard_size = shard_size
+        self.shards = []
+        self.file = None
+
+    @property
+    def paths(self):
+        return [os.path.join(self.directory, shard['file']) for shard in self.shards]
+
+    def write(self, block, tags=0):
+        if self.file is None or self.shards[-1]['documents'] >= self.shard_size:
+            self.close()
+            name = f'part-{len(self.shards):05d}.{self.extension}'
+            self.file = open_compressed(os.path.join(self.directory, name), self.compression)
+            self.shards.append({'file': name, 'documents': 0, 'tags': 0})
+        self.file.write(block)
+        self.shards[-1]['documents'] += 1
+        self.shards[-1]['tags'] += tags
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
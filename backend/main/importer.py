@@ -0,0 +1,507 @@
+"""
+JSONL 문서 가져오기 (여러 파일/압축 아카이브, 병렬 파싱)
+
+업로드된 .jsonl, .jsonl.gz, .zip, .tar(.gz) 의 샤드(.jsonl/.jsonl.gz)를 스트림으로 풀면서 줄 묶음 단위로
+작업자 프로세스에 넘겨 JSON 파싱과 엔티티 정리를 하고, 부모 프로세스의 단일 writer 가
+data_id 중복을 해시 집합(업로드 안)과 묶음 단위 IN 쿼리(기존 문서)로 검사한 뒤 bulk_create 로 저장합니다.
+
+가져오기는 하나의 트랜잭션입니다. 중복 data_id 와 파싱 오류는 처리 방식(fail/skip/overwrite)에
+따라 전체를 되돌리거나(ImportRejected) 해당 줄만 건너뛰며, 건너뛴 줄은 모두 보고서에 남습니다.
+"""
+
+import csv
+import gzip
+import json
+import os
+import tarfile
+import uuid
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import Document, DocumentBody, PIICategory, PIITag, text_digest
+from .offsets import CODEPOINT, OffsetMap, validate_unit
+
+SHARD_SUFFIXES = ('.jsonl', '.jsonl.gz')
+ZIP_SUFFIXES = ('.zip',)
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz')
+SUPPORTED_SUFFIXES = SHARD_SUFFIXES + ZIP_SUFFIXES + TAR_SUFFIXES
+
+# 중복 data_id 처리 방식
+FAIL = 'fail'
+SKIP = 'skip'
+OVERWRITE = 'overwrite'
+UPSERT = 'upsert'
+POLICIES = (FAIL, SKIP, OVERWRITE, UPSERT)
+
+# upsert 에서 (start_offset, end_offset, 카테고리) 가 같은 기존 태그에 덮어쓰는 필드
+UPSERT_TAG_FIELDS = ('span_text', 'span_id', 'entity_id', 'annotator', 'identifier_type')
+
+REJECT_REASONS = {
+    'duplicate': '업로드 안에서 중복된 data_id',
+    'exists': '이미 존재하는 data_id',
+    'invalid': 'JSON 파싱 오류',
+}
+
+# 화면에 보여 줄 샤드별 중복 data_id/오류 최대 개수 (전체 목록은 report['rejections'])
+REPORT_LIMIT = 50
+
+
+class ParsedEntity(NamedTuple):
+    category: str
+    span_text: str
+    start_offset: int
+    end_offset: int
+    span_id: str
+    entity_id: str
+    annotator: str
+    identifier_type: str
+
+
+class ParsedDocument(NamedTuple):
+    line: int
+    data_id: str
+    number_of_subjects: str
+    provenance: object
+    text: str
+    entities: list
+    # 작업자 프로세스에서 만든 본문 오프셋 맵 (DocumentBody 에 그대로 저장)
+    offset_map: OffsetMap
+
+
+class ImportRejected(Exception):
+    """중복/오류로 가져오기를 되돌렸을 때 (report 에 샤드별 내역)"""
+
+    def __init__(self, report):
+        super().__init__('중복 data_id 또는 파싱 오류가 있어 가져오기를 중단했습니다.')
+        self.report = report
+
+
+def is_supported(name):
+    return name.lower().endswith(SUPPORTED_SUFFIXES)
+
+
+def write_rejection_report(rejections, stream):
+    """report['rejections'] 를 CSV (shard, line, data_id, reason, detail) 로 기록"""
+    writer = csv.writer(stream)
+    writer.writerow(('shard', 'line', 'data_id', 'reason', 'detail'))
+    writer.writerows(rejections)
+
+
+def save_rejection_report(rejections, directory):
+    """거부 보고서를 directory 에 CSV 파일로 저장하고 파일 이름을 반환 (엑셀용 BOM 포함)"""
+    os.makedirs(directory, exist_ok=True)
+    name = f'{uuid.uuid4().hex}.csv'
+    with open(os.path.join(directory, name), 'w', encoding='utf-8-sig', newline='') as stream:
+        write_rejection_report(rejections, stream)
+    return name
+
+
+def rejection_report_path(name, directory):
+    """save_rejection_report 가 반환한 이름의 경로 (다른 경로를 가리키는 이름이면 None)"""
+    if not name or os.path.basename(name) != name or not name.endswith('.csv'):
+        return None
+    return os.path.join(directory, name)
+
+
+def normalize_entities(entities, category_values, offset_map=None, offset_unit=CODEPOINT):
+    """업로드 엔티티를 PIITag 값으로 정리
+
+    알 수 없는 카테고리와 빈 스팬은 건너뛰고, span_text 앞뒤 공백은 잘라 오프셋을 맞춘다.
+    span_id/entity_id 가 없으면 문서에서 앞서 채택된 태그 수 + 1 을 쓴다.
+    오프셋은 offset_unit(utf16/utf8) 단위로 읽어 offset_map 으로 코드 포인트로 바꾼다.
+    """
+    parsed = []
+    for entity in entities:
+        category = entity.get('entity_type', '')
+        if category not in category_values:
+            continue
+        span_id = entity.get('span_id', '') or str(len(parsed) + 1)
+        entity_id = entity.get('entity_id', '') or str(len(parsed) + 1)
+        annotator = entity.get('annotator', 'Anonymous') or 'Anonymous'
+        identifier_type = entity.get('identifier_type', 'QUASI').upper() or 'QUASI'
+
+        # 공백 트림 처리
+        original_span_text = entity.get('span_text', '')
+        trimmed_span_text = original_span_text.strip()
+        start_offset = entity.get('start_offset', 0)
+        end_offset = entity.get('end_offset', 0)
+        if offset_unit != CODEPOINT:
+            start_offset = offset_map.from_unit(start_offset, offset_unit)
+            end_offset = offset_map.from_unit(end_offset, offset_unit)
+        if trimmed_span_text != original_span_text:
+            start_offset += len(original_span_text) - len(original_span_text.lstrip())
+            end_offset -= len(original_span_text) - len(original_span_text.rstrip())
+            # end_offset이 start_offset보다 작아지지 않도록 보정
+            if end_offset <= start_offset:
+                end_offset = start_offset + len(trimmed_span_text)
+        if trimmed_span_text == '' or end_offset == 0:
+            continue
+        parsed.append(ParsedEntity(
+            category, trimmed_span_text, start_offset, end_offset,
+            str(span_id), str(entity_id), annotator, identifier_type,
+        ))
+    return parsed
+
+
+def parse_lines(name, start, lines, read_error, category_values, offset_unit=CODEPOINT):
+    """샤드의 줄 묶음을 (이름, 첫 줄 번호, [ParsedDocument], [(줄 번호, 오류)]) 로 파싱 (본문 오프셋 맵도 여기서 만든다)
+
+    lines 는 start 번째 줄부터의 바이트 줄 목록이고, read_error 는 이 묶음 뒤에서 샤드를 더 읽지 못한 오류다.
+    """
+    documents = []
+    errors = []
+    for number, line in enumerate(lines, start):
+        try:
+            line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            metadata = data.get('metadata', {})
+            text = data.get('text', '')
+            offset_map = OffsetMap.build(text)
+            documents.append(ParsedDocument(
+                line=number,
+                data_id=metadata.get('data_id', ''),
+                number_of_subjects=metadata.get('number_of_subjects', 0),
+                provenance=metadata.get('provenance', {}),
+                text=text,
+                entities=normalize_entities(data.get('entities', []), category_values, offset_map, offset_unit),
+                offset_map=offset_map,
+            ))
+        except (ValueError, AttributeError, TypeError) as e:
+            errors.append((number, str(e)))
+    if read_error:
+        errors.append((0, f'파일을 읽을 수 없습니다: {read_error}'))
+    return name, start, documents, errors
+
+
+def _iter_lines(stream, compressed):
+    """바이너리 스트림의 줄 (gzip 은 읽으면서 푼다)"""
+    if compressed:
+        stream = gzip.GzipFile(fileobj=stream)
+    yield from stream
+
+
+def iter_shards(files):
+    """(파일 이름, 바이너리 파일 객체) 목록에서 (샤드 이름, 바이트 줄 iterator) 를 하나씩 생성
+
+    아카이브 멤버와 .jsonl.gz 는 스트림으로 읽으므로 샤드 전체를 메모리에 올리지 않는다.
+    tar 는 순차 스트림이므로 다음 샤드로 넘어가기 전에 줄 iterator 를 끝까지 소비해야 한다.
+    """
+    for name, fileobj in files:
+        lower = name.lower()
+        if lower.endswith(SHARD_SUFFIXES):
+            yield name, _iter_lines(fileobj, lower.endswith('.gz'))
+        elif lower.endswith(ZIP_SUFFIXES):
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(SHARD_SUFFIXES):
+                        with archive.open(info) as member:
+                            yield f'{name}/{info.filename}', _iter_lines(member, info.filename.lower().endswith('.gz'))
+        elif lower.endswith(TAR_SUFFIXES):
+            # 'r|*' 는 앞에서부터 순차로 읽는 스트리밍 모드 (압축 형식 자동 감지)
+            with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+                for member in archive:
+                    if member.isfile() and member.name.lower().endswith(SHARD_SUFFIXES):
+                        yield f'{name}/{member.name}', _iter_lines(
+                            archive.extractfile(member), member.name.lower().endswith('.gz')
+                        )
+        else:
+            raise ValueError(f'지원하지 않는 파일 형식입니다: {name}')
+
+
+def iter_chunks(files, chunk_lines):
+    """샤드를 chunk_lines 줄씩 (샤드 이름, 첫 줄 번호, [바이트 줄], 읽기 오류) 로 생성
+
+    샤드마다 첫 줄 번호가 1 인 묶음이 하나 이상 나온다 (빈 샤드도 보고서에 남도록).
+    """
+    for name, lines in iter_shards(files):
+        start = 1
+        chunk = []
+        try:
+            for number, line in enumerate(lines, 1):
+                chunk.append(line)
+                if len(chunk) >= chunk_lines:
+                    yield name, start, chunk, None
+                    start, chunk = number + 1, []
+        except (OSError, EOFError, zlib.error, zipfile.BadZipFile) as e:
+            yield name, start, chunk, str(e)
+            continue
+        if chunk or start == 1:
+            yield name, start, chunk, None
+
+
+# --- 프로세스 풀 작업자 ---
+
+_worker_category_values = None
+_worker_offset_unit = CODEPOINT
+
+
+def _init_worker(category_values, offset_unit):
+    global _worker_category_values, _worker_offset_unit
+    _worker_category_values = category_values
+    _worker_offset_unit = offset_unit
+
+
+def _parse_in_worker(name, start, lines, read_error):
+    return parse_lines(name, start, lines, read_error, _worker_category_values, _worker_offset_unit)
+
+
+def _iter_parsed(files, executor, workers, chunk_lines, category_values, offset_unit):
+    if executor is None:
+        for chunk in iter_chunks(files, chunk_lines):
+            yield parse_lines(*chunk, category_values, offset_unit)
+        return
+
+    pending = []
+    for chunk in iter_chunks(files, chunk_lines):
+        pending.append(executor.submit(_parse_in_worker, *chunk))
+        # 메모리 사용량을 제한하기 위해 진행 중인 묶음 수를 제한 (보고서 순서 유지를 위해 앞에서부터 기다림)
+        if len(pending) >= workers * 2:
+            yield pending.pop(0).result()
+    for future in pending:
+        yield future.result()
+
+
+# --- 단일 writer ---
+
+def _build_tags(pairs, user, categories):
+    return [
+        PIITag(
+            document=document,
+            pii_category=categories[entity.category],
+            span_text=entity.span_text,
+            start_offset=entity.start_offset,
+            end_offset=entity.end_offset,
+            span_id=entity.span_id,
+            entity_id=entity.entity_id,
+            annotator=entity.annotator,
+            identifier_type=entity.identifier_type,
+            created_by=user,
+        )
+        for document, entities in pairs
+        for entity in entities
+    ]
+
+
+def _offset_maps(parsed_documents):
+    return {text_digest(parsed.text): parsed.offset_map for parsed in parsed_documents}
+
+
+def _write_batch(batch, user, categories):
+    """파싱된 문서 묶음을 본문/문서/태그 순서로 bulk_create"""
+    bodies = DocumentBody.objects.intern_many((parsed.text for parsed in batch), _offset_maps(batch))
+    documents = [
+        Document(
+            data_id=parsed.data_id,
+            number_of_subjects=parsed.number_of_subjects,
+            provenance=parsed.provenance,
+            body=bodies[text_digest(parsed.text)],
+            created_by=user,
+            tag_count=len(parsed.entities),
+        )
+        for parsed in batch
+    ]
+    Document.objects.bulk_create(documents, batch_size=500)
+    tags = _build_tags(zip(documents, (parsed.entities for parsed in batch)), user, categories)
+    PIITag.objects.bulk_create(tags, batch_size=1000)
+    Document.objects.filter(id__in=[document.id for document in documents]).sync_entities()
+    return documents, {'tags': len(tags)}
+
+
+def _update_documents(replacements):
+    """기존 문서 [(id, 기존 body_id, ParsedDocument)] 의 본문/메타데이터를 bulk_update (문서 id 유지)"""
+    parsed_documents = [parsed for _, _, parsed in replacements]
+    bodies = DocumentBody.objects.intern_many((parsed.text for parsed in parsed_documents), _offset_maps(parsed_documents))
+    now = timezone.now()
+    documents = [
+        Document(
+            id=document_id,
+            number_of_subjects=parsed.number_of_subjects,
+            provenance=parsed.provenance,
+            body=bodies[text_digest(parsed.text)],
+            tag_count=len(parsed.entities),
+            updated_at=now,
+        )
+        for document_id, _, parsed in replacements
+    ]
+    Document.objects.bulk_update(
+        documents, ['number_of_subjects', 'provenance', 'body', 'tag_count', 'updated_at'], batch_size=500,
+    )
+    return documents
+
+
+def _overwrite_batch(replacements, user, categories):
+    """기존 문서의 본문/메타데이터를 바꾸고 태그를 모두 업로드 내용으로 교체"""
+    documents = _update_documents(replacements)
+    PIITag.objects.filter(document_id__in=[document.id for document in documents]).delete()
+    tags = _build_tags(zip(documents, (parsed.entities for _, _, parsed in replacements)), user, categories)
+    PIITag.objects.bulk_create(tags, batch_size=1000)
+    Document.objects.filter(id__in=[document.id for document in documents]).sync_entities()
+    DocumentBody.objects.filter(id__in={body_id for _, body_id, _ in replacements}).orphaned().delete()
+    return documents, {'tags': len(tags)}
+
+
+def _upsert_batch(replacements, user, categories):
+    """기존 문서의 본문/메타데이터를 바꾸고 태그는 (start, end, 카테고리) 기준 차이만 반영
+
+    같은 위치/카테고리의 태그는 id 를 유지한 채 바뀐 필드만 bulk_update 하고,
+    업로드에 없는 태그는 삭제, 새 태그만 bulk_create 한다.
+    """
+    existing_tags = {}
+    # 같은 위치/카테고리로 중복 저장되어 있던 태그는 하나만 남긴다
+    deleted_ids = []
+    for tag in PIITag.objects.filter(
+        document_id__in=[document_id for document_id, _, _ in replacements]
+    ).only('id', 'document_id', 'pii_category_id', 'start_offset', 'end_offset', *UPSERT_TAG_FIELDS):
+        key = (tag.start_offset, tag.end_offset, tag.pii_category_id)
+        if existing_tags.setdefault(tag.document_id, {}).setdefault(key, tag) is not tag:
+            deleted_ids.append(tag.id)
+
+    created = {}
+    updated = []
+    kept_ids = set()
+    for document_id, _, parsed in replacements:
+        current = existing_tags.get(document_id, {})
+        entities = {}
+        for entity in parsed.entities:
+            entities.setdefault((entity.start_offset, entity.end_offset, categories[entity.category].id), entity)
+        for key, entity in entities.items():
+            tag = current.get(key)
+            if tag is None:
+                created.setdefault(document_id, []).append(entity)
+                continue
+            kept_ids.add(tag.id)
+            changed = False
+            for field in UPSERT_TAG_FIELDS:
+                if getattr(tag, field) != getattr(entity, field):
+                    setattr(tag, field, getattr(entity, field))
+                    changed = True
+            if changed:
+                updated.append(tag)
+    deleted_ids += [tag.id for tags in existing_tags.values() for tag in tags.values() if tag.id not in kept_ids]
+
+    documents = _update_documents(replacements)
+    PIITag.objects.filter(id__in=deleted_ids).delete()
+    PIITag.objects.bulk_update(updated, UPSERT_TAG_FIELDS, batch_size=1000)
+    tags = _build_tags(
+        ((Document(id=document_id), entities) for document_id, entities in created.items()), user, categories,
+    )
+    PIITag.objects.bulk_create(tags, batch_size=1000)
+    # 업로드 안에서 위치/카테고리가 겹친 엔티티는 하나로 합쳐졌으므로 태그 수를 다시 센다
+    Document.objects.filter(id__in=[document.id for document in documents]).recount_tags()
+    Document.objects.filter(id__in=[document.id for document in documents]).sync_entities()
+    DocumentBody.objects.filter(id__in={body_id for _, body_id, _ in replacements}).orphaned().delete()
+    return documents, {'tags': len(tags), 'tags_updated': len(updated), 'tags_deleted': len(deleted_ids)}
+
+
+def import_documents(files, user, workers=1, batch_size=500, policy=FAIL, offset_unit=CODEPOINT):
+    """파일/아카이브 목록을 user 의 문서로 가져오고 샤드별 보고서를 반환
+
+    files 는 (이름, 바이너리 파일 객체) 목록이다. 업로드 안의 data_id 중복은 해시 집합으로,
+    user 의 기존 문서와의 중복은 batch_size 단위 IN 쿼리로 검사하고 policy 에 따라 처리한다.
+
+    - fail: 중복이나 파싱 오류가 하나라도 있으면 전체를 되돌리고 ImportRejected
+    - skip: 해당 줄만 건너뛴다
+    - overwrite: 기존 문서의 본문/메타데이터/태그를 교체한다 (업로드 안의 중복 줄은 건너뛴다)
+    - upsert: overwrite 와 같되 태그는 (start, end, 카테고리) 기준 차이만 반영하여 태그 id 를 유지한다
+
+    건너뛴 줄은 report['rejections'] 에 (샤드, 줄 번호, data_id, 사유, 상세) 로 모두 남는다.
+    엔티티 오프셋은 offset_unit(codepoint/utf16/utf8) 단위로 읽어 코드 포인트로 저장한다.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f'알 수 없는 중복 처리 방식입니다: {policy}')
+    validate_unit(offset_unit)
+    categories = {category.value: category for category in PIICategory.objects.all()}
+    if workers <= 1:
+        return _import(files, user, categories, None, 1, batch_size, policy, offset_unit)
+
+    # fork 된 작업자가 부모의 DB 연결을 물려받지 않도록 연결을 닫고,
+    # 트랜잭션이 연결을 다시 열기 전에 작업자 프로세스를 미리 띄운다
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(frozenset(categories), offset_unit)
+    ) as executor:
+        executor.submit(len, ()).result()
+        return _import(files, user, categories, executor, workers, batch_size, policy, offset_unit)
+
+
+def _import(files, user, categories, executor, workers, batch_size, policy, offset_unit):
+    report = {
+        'policy': policy, 'shards': [], 'documents': 0, 'overwritten': 0,
+        'tags': 0, 'tags_updated': 0, 'tags_deleted': 0,
+        'document_ids': [], 'rejections': [],
+    }
+    seen = set()
+
+    def reject(shard, line, data_id, reason, detail=''):
+        shard['rejected'] += 1
+        report['rejections'].append((shard['shard'], line, data_id, reason, detail or REJECT_REASONS[reason]))
+        if reason == 'invalid':
+            if len(shard['errors']) < REPORT_LIMIT:
+                shard['errors'].append((line, detail))
+        elif len(shard['duplicates']) < REPORT_LIMIT:
+            shard['duplicates'].append(data_id)
+
+    with transaction.atomic():
+        parsed_chunks = _iter_parsed(files, executor, workers, batch_size, frozenset(categories), offset_unit)
+        for name, first_line, parsed_documents, errors in parsed_chunks:
+            # 샤드는 batch_size 줄씩 나뉘어 오므로 첫 묶음에서 샤드 보고서를 만들고 이후 묶음은 누적한다
+            if first_line == 1:
+                shard = {
+                    'shard': name, 'rows': 0, 'documents': 0, 'overwritten': 0,
+                    'tags': 0, 'tags_updated': 0, 'tags_deleted': 0, 'rejected': 0, 'duplicates': [], 'errors': [],
+                }
+                report['shards'].append(shard)
+            shard['rows'] += len(parsed_documents) + len(errors)
+            for line, error in errors:
+                reject(shard, line, '', 'invalid', error)
+
+            existing = {
+                data_id: (document_id, body_id)
+                for data_id, document_id, body_id in Document.objects.filter(
+                    created_by=user, data_id__in={parsed.data_id for parsed in parsed_documents}
+                ).values_list('data_id', 'id', 'body_id')
+            }
+            batch = []
+            replacements = []
+            for parsed in parsed_documents:
+                if parsed.data_id in seen:
+                    reject(shard, parsed.line, parsed.data_id, 'duplicate')
+                elif parsed.data_id in existing and policy not in (OVERWRITE, UPSERT):
+                    reject(shard, parsed.line, parsed.data_id, 'exists')
+                else:
+                    seen.add(parsed.data_id)
+                    if parsed.data_id in existing:
+                        replacements.append((*existing[parsed.data_id], parsed))
+                    else:
+                        batch.append(parsed)
+            # fail 에서 거부가 확정되면 되돌릴 것이므로 쓰지 않고 보고서만 채운다
+            if policy == FAIL and report['rejections']:
+                continue
+            replace = _upsert_batch if policy == UPSERT else _overwrite_batch
+            for write, counter, pending in (
+                (_write_batch, 'documents', batch), (replace, 'overwritten', replacements),
+            ):
+                if pending:
+                    documents, stats = write(pending, user, categories)
+                    for key, value in ((counter, len(documents)), *stats.items()):
+                        shard[key] += value
+                        report[key] += value
+                    report['document_ids'].extend(document.id for document in documents)
+
+        rejected = policy == FAIL and bool(report['rejections'])
+        if rejected:
+            transaction.set_rollback(True)
+    if rejected:
+        # 되돌렸으므로 저장 건수는 0
+        for shard in report['shards']:
+            shard.update(documents=0, overwritten=0, tags=0, tags_updated=0, tags_deleted=0)
+        report.update(documents=0, overwritten=0, tags=0, tags_updated=0, tags_deleted=0, document_ids=[])
+        raise ImportRejected(report)
+    return report
@@ -0,0 +1,229 @@
+import logging
+import re
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+logger = logging.getLogger(__name__)
+
+# 최근 요청 프로파일 링버퍼 (프로세스 단위)
+_profile_buffer = deque(maxlen=getattr(settings, 'QUERY_PROFILING_BUFFER_SIZE', 200))
+_profile_lock = threading.Lock()
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint_sql(sql):
+    """리터럴과 IN 목록을 제거해 같은 형태의 쿼리를 하나로 묶는 지문 생성"""
+    sql = _STRING_LITERAL_RE.sub('?', sql)
+    sql = _NUMBER_LITERAL_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+def get_recent_profiles():
+    """링버퍼에 쌓인 최근 요청 프로파일 목록 (오래된 순)"""
+    with _profile_lock:
+        return list(_profile_buffer)
+
+
+class _QueryRecorder:
+    """connection.execute_wrapper 로 설치되어 실행된 쿼리를 기록"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+        self.fingerprint_time = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            fingerprint = fingerprint_sql(sql)
+            self.count += 1
+            self.total_time += elapsed
+            self.fingerprints[fingerprint] += 1
+            self.fingerprint_time[fingerprint] += elapsed
+
+    def duplicates(self):
+        """두 번 이상 실행된 쿼리 지문 (N+1 후보)"""
+        return [
+            {
+                'sql': fingerprint,
+                'count': count,
+                'time_ms': round(self.fingerprint_time[fingerprint] * 1000, 2),
+            }
+            for fingerprint, count in self.fingerprints.most_common()
+            if count > 1
+        ]
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise 에 async 경로를 더한 정적 파일 미들웨어
+
+    WhiteNoiseMiddleware 는 sync 전용이라 ASGI 에서 체인에 있으면 Django 가 안쪽 async 뷰까지
+    sync 스레드를 거쳐 실행한다. 정적 파일이 아닌 요청은 이벤트 루프에서 그대로 넘기고,
+    정적 파일 응답을 만드는 파일 열기만 스레드에서 한다.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class _Measurement:
+    def __init__(self):
+        self.recorder = _QueryRecorder()
+        self.wall_time = 0.0
+        self.peak_memory = None
+
+
+class QueryProfilingMiddleware:
+    """요청 단위 쿼리 수, SQL 시간, 중복 쿼리, 처리 시간, 최대 메모리 측정
+
+    settings.QUERY_PROFILING 이 True 일 때만 MIDDLEWARE 에 추가된다.
+    측정 결과는 Server-Timing 헤더와 링버퍼(staff 전용 API)로 노출하고,
+    쿼리 수가 QUERY_PROFILING_THRESHOLD 를 넘는 뷰는 경고 로그를 남긴다.
+    최대 메모리는 QUERY_PROFILING_TRACE_MEMORY 를 켰을 때만 잰다. tracemalloc 은 프로세스 전역이고
+    부하가 크므로 요청을 처리하는 동안에만 켜고 끄며, 멀티스레드 서버에서 메모리 값은 근사치다.
+    sync/async 양쪽을 지원하므로 ASGI 에서 async 뷰를 sync 스레드로 옮기지 않는다.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'QUERY_PROFILING_THRESHOLD', 50)
+        self.trace_memory = getattr(settings, 'QUERY_PROFILING_TRACE_MEMORY', False)
+        self.exclude_prefixes = tuple(getattr(settings, 'QUERY_PROFILING_EXCLUDE', ('/static/',)))
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path.startswith(self.exclude_prefixes):
+            return self.get_response(request)
+        with self._measure() as measurement, ExitStack() as stack:
+            self._install(stack, measurement.recorder)
+            response = self.get_response(request)
+        return self._record(request, response, measurement)
+
+    async def __acall__(self, request):
+        if request.path.startswith(self.exclude_prefixes):
+            return await self.get_response(request)
+        with self._measure() as measurement, ExitStack() as stack:
+            # DB 연결은 스레드마다 따로이고 async 뷰의 ORM 쿼리는 요청의 sync 스레드에서 실행되므로
+            # 기록기도 그 스레드의 연결에 설치하고 해제한다
+            await sync_to_async(self._install)(stack, measurement.recorder)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        return self._record(request, response, measurement)
+
+    @staticmethod
+    def _install(stack, recorder):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    @contextmanager
+    def _measure(self):
+        measurement = _Measurement()
+        # 이 요청에서 켠 추적만 끈다 (다른 요청이나 개발자가 켜 둔 추적은 그대로 둔다)
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+
+        started = time.perf_counter()
+        try:
+            yield measurement
+            measurement.wall_time = time.perf_counter() - started
+            if self.trace_memory:
+                measurement.peak_memory = max(tracemalloc.get_traced_memory()[1] - memory_before, 0)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+    def _record(self, request, response, measurement):
+        recorder = measurement.recorder
+        wall_time = measurement.wall_time
+        peak_memory = measurement.peak_memory
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else ''
+        duplicates = recorder.duplicates()
+        profile = {
+            'timestamp': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'query_count': recorder.count,
+            'sql_time_ms': round(recorder.total_time * 1000, 2),
+            'wall_time_ms': round(wall_time * 1000, 2),
+            'peak_memory_kb': round(peak_memory / 1024, 1) if peak_memory is not None else None,
+            'duplicate_queries': duplicates,
+        }
+        with _profile_lock:
+            _profile_buffer.append(profile)
+
+        timings = [
+            f'db;dur={profile["sql_time_ms"]};desc="{recorder.count} queries"',
+            f'app;dur={profile["wall_time_ms"]}',
+        ]
+        if duplicates:
+            duplicate_count = sum(item['count'] for item in duplicates)
+            timings.append(f'dup;desc="{duplicate_count} duplicated queries"')
+        if peak_memory is not None:
+            timings.append(f'mem;desc="peak {profile["peak_memory_kb"]} KB"')
+        response['Server-Timing'] = ', '.join(timings)
+
+        if self.threshold and recorder.count > self.threshold:
+            logger.warning(
+                '쿼리 수 임계값 초과: %s %s (view=%s) queries=%d sql=%.1fms wall=%.1fms top=%s',
+                request.method,
+                request.path,
+                view_name or '-',
+                recorder.count,
+                profile['sql_time_ms'],
+                profile['wall_time_ms'],
+                duplicates[0]['sql'] if duplicates else '-',
+            )
+
+        return response
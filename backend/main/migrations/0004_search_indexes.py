@@ -0,0 +1,71 @@
+from django.db import migrations, models
+
+# 이 마이그레이션 시점의 검색 인덱스 SQL (main.search 가 바뀌어도 이력은 그대로 재현되도록 고정)
+# (FTS 테이블, 원본 테이블, 컬럼)
+SQLITE_FTS_TABLES = [
+    ('main_document_fts', 'main_document', 'text'),
+    ('main_piitag_fts', 'main_piitag', 'span_text'),
+]
+POSTGRES_INDEXES = [
+    ('main_document_text_trgm', 'main_document', 'gin (text gin_trgm_ops)'),
+    ('main_document_text_tsv', 'main_document', "gin (to_tsvector('simple', text))"),
+    ('main_piitag_span_text_trgm', 'main_piitag', 'gin (span_text gin_trgm_ops)'),
+]
+
+
+def sqlite_fts_statements(fts_table, table, column):
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{column}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"DROP TRIGGER IF EXISTS {fts_table}_ai",
+        f"DROP TRIGGER IF EXISTS {fts_table}_ad",
+        f"DROP TRIGGER IF EXISTS {fts_table}_au",
+        f"CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER {fts_table}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, table, definition in POSTGRES_INDEXES:
+            schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING {definition}')
+    elif vendor == 'sqlite':
+        for fts_table, table, column in SQLITE_FTS_TABLES:
+            for statement in sqlite_fts_statements(fts_table, table, column):
+                schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for name, _, _ in POSTGRES_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+    elif vendor == 'sqlite':
+        for fts_table, _, _ in SQLITE_FTS_TABLES:
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {fts_table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_alter_document_data_id_document_uniq_user_data_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='piitag',
+            index=models.Index(fields=['pii_category', 'span_text'], name='piitag_category_span_idx'),
+        ),
+        # PostgreSQL: pg_trgm/tsvector GIN 인덱스, SQLite: FTS5 가상 테이블과 동기화 트리거
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
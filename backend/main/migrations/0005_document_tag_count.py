@@ -0,0 +1,60 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# 0004_search_indexes 가 만든 main_document FTS5 테이블 (이 시점의 SQL 로 고정)
+FTS_TABLE, TABLE, COLUMN = 'main_document_fts', 'main_document', 'text'
+
+
+def backfill_tag_count(apps, schema_editor):
+    Document = apps.get_model('main', 'Document')
+    PIITag = apps.get_model('main', 'PIITag')
+    tag_counts = (
+        PIITag.objects.filter(document=OuterRef('pk'))
+        .order_by()
+        .values('document')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Document.objects.update(tag_count=Coalesce(Subquery(tag_counts), 0))
+
+
+def reinstall_search_indexes(apps, schema_editor):
+    # SQLite 는 컬럼 추가/삭제 시 main_document 를 재생성하므로 FTS 트리거를 다시 만든다
+    # (PostgreSQL 인덱스는 테이블과 함께 유지된다)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {COLUMN}) VALUES (new.id, new.{COLUMN}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMN}) VALUES ('delete', old.id, old.{COLUMN}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {COLUMN} ON {TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMN}) VALUES ('delete', old.id, old.{COLUMN}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {COLUMN}) VALUES (new.id, new.{COLUMN}); END"
+    )
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_indexes),
+        migrations.AddField(
+            model_name='document',
+            name='tag_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='태그 수'),
+        ),
+        migrations.RunPython(backfill_tag_count, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_search_indexes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,181 @@
+import hashlib
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 500
+
+# 0004 에서 main_document.text 에 만들었던 검색 인덱스 (본문 인덱스는 0014_documentbody_search_indexes 에서 만든다)
+LEGACY_SQLITE_FTS_TABLE = ('main_document_fts', 'main_document', 'text')
+LEGACY_POSTGRES_INDEXES = [
+    ('main_document_text_trgm', 'gin (text gin_trgm_ops)'),
+    ('main_document_text_tsv', "gin (to_tsvector('simple', text))"),
+]
+
+
+def _sqlite_fts_statements(fts_table, table, column):
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{column}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"DROP TRIGGER IF EXISTS {fts_table}_ai",
+        f"DROP TRIGGER IF EXISTS {fts_table}_ad",
+        f"DROP TRIGGER IF EXISTS {fts_table}_au",
+        f"CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER {fts_table}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def drop_document_text_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for name, _ in LEGACY_POSTGRES_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+    elif vendor == 'sqlite':
+        fts_table = LEGACY_SQLITE_FTS_TABLE[0]
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {fts_table}')
+
+
+def create_document_text_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for name, definition in LEGACY_POSTGRES_INDEXES:
+            schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON main_document USING {definition}')
+    elif vendor == 'sqlite':
+        for statement in _sqlite_fts_statements(*LEGACY_SQLITE_FTS_TABLE):
+            schema_editor.execute(statement)
+
+
+def _parse_provenance(value):
+    if not value:
+        return {}
+    try:
+        return json.loads(value)
+    except ValueError:
+        # JSON 이 아닌 값은 문자열 그대로 보존
+        return value
+
+
+def _move_batch(Document, DocumentBody, rows):
+    digests = {hashlib.sha256(text.encode('utf-8')).hexdigest(): text for _, text, _ in rows}
+    existing = DocumentBody.objects.filter(digest__in=list(digests)).in_bulk(field_name='digest')
+    DocumentBody.objects.bulk_create(
+        [DocumentBody(digest=digest, text=text) for digest, text in digests.items() if digest not in existing],
+        batch_size=BATCH_SIZE,
+    )
+    body_ids = dict(DocumentBody.objects.filter(digest__in=list(digests)).values_list('digest', 'id'))
+    Document.objects.bulk_update(
+        [
+            Document(
+                id=document_id,
+                body_id=body_ids[hashlib.sha256(text.encode('utf-8')).hexdigest()],
+                provenance_json=_parse_provenance(provenance),
+            )
+            for document_id, text, provenance in rows
+        ],
+        ['body', 'provenance_json'],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def move_bodies(apps, schema_editor):
+    """본문을 내용 주소로 main_documentbody 에 옮기고 provenance 를 JSON 으로 변환"""
+    Document = apps.get_model('main', 'Document')
+    DocumentBody = apps.get_model('main', 'DocumentBody')
+    rows = []
+    for row in Document.objects.order_by('id').values_list('id', 'text', 'provenance').iterator(chunk_size=BATCH_SIZE):
+        rows.append(row)
+        if len(rows) >= BATCH_SIZE:
+            _move_batch(Document, DocumentBody, rows)
+            rows = []
+    if rows:
+        _move_batch(Document, DocumentBody, rows)
+
+
+def restore_bodies(apps, schema_editor):
+    Document = apps.get_model('main', 'Document')
+    DocumentBody = apps.get_model('main', 'DocumentBody')
+    Document.objects.update(text=Subquery(DocumentBody.objects.filter(id=OuterRef('body_id')).values('text')[:1]))
+    documents = []
+    for document_id, provenance in Document.objects.values_list('id', 'provenance_json').iterator(chunk_size=BATCH_SIZE):
+        value = provenance if isinstance(provenance, str) else json.dumps(provenance, ensure_ascii=False)
+        documents.append(Document(id=document_id, provenance=value))
+    Document.objects.bulk_update(documents, ['provenance'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_document_tag_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_document_text_indexes, create_document_text_indexes),
+        migrations.CreateModel(
+            name='DocumentBody',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('text', models.TextField(verbose_name='text')),
+            ],
+            options={
+                'verbose_name': '문서 본문',
+                'verbose_name_plural': '문서 본문들',
+            },
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='body',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documents',
+                to='main.documentbody', verbose_name='본문',
+            ),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='provenance_json',
+            field=models.JSONField(blank=True, default=dict, verbose_name='provenance'),
+        ),
+        migrations.RunPython(move_bodies, restore_bodies),
+        # 되돌릴 때 빈 값으로 컬럼을 다시 만든 뒤 restore_bodies 가 채울 수 있도록 blank 허용 (DB 변경 없음)
+        migrations.AlterField(
+            model_name='document',
+            name='text',
+            field=models.TextField(blank=True, verbose_name='text'),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='provenance',
+            field=models.TextField(blank=True, verbose_name='provenance'),
+        ),
+        migrations.RemoveField(
+            model_name='document',
+            name='text',
+        ),
+        migrations.RemoveField(
+            model_name='document',
+            name='provenance',
+        ),
+        migrations.RenameField(
+            model_name='document',
+            old_name='provenance_json',
+            new_name='provenance',
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='body',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT, related_name='documents',
+                to='main.documentbody', verbose_name='본문',
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_document_body'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='piitag',
+            index=models.Index(fields=['document', 'start_offset'], name='piitag_document_start_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# PostgreSQL 에서 PIITag.document 외래키를 ON DELETE CASCADE 로 다시 만든다.
+# 문서 삭제(DocumentQuerySet.delete_in_chunks)가 태그를 Python 으로 모으지 않고 DB 에서 함께 지우게 한다.
+# SQLite 는 외래키 변경에 테이블 재생성이 필요하므로 그대로 두고, 태그를 먼저 DELETE 한다.
+CONSTRAINT_NAME = 'main_piitag_document_id_cascade'
+
+
+def _recreate_document_fk(apps, schema_editor, on_delete, name):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    PIITag = apps.get_model('main', 'PIITag')
+    for constraint in schema_editor._constraint_names(PIITag, ['document_id'], foreign_key=True):
+        schema_editor.execute(f'ALTER TABLE main_piitag DROP CONSTRAINT {schema_editor.quote_name(constraint)}')
+    schema_editor.execute(
+        f'ALTER TABLE main_piitag ADD CONSTRAINT {schema_editor.quote_name(name)} '
+        f'FOREIGN KEY (document_id) REFERENCES main_document (id) {on_delete}DEFERRABLE INITIALLY DEFERRED'
+    )
+
+
+def add_cascade(apps, schema_editor):
+    _recreate_document_fk(apps, schema_editor, 'ON DELETE CASCADE ', CONSTRAINT_NAME)
+
+
+def remove_cascade(apps, schema_editor):
+    _recreate_document_fk(apps, schema_editor, '', 'main_piitag_document_id_fk_main_document_id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_piitag_document_start_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_cascade, remove_cascade),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 1000
+
+# 0004_search_indexes 가 만든 main_piitag FTS5 테이블 (이 시점의 SQL 로 고정)
+FTS_TABLE, TABLE, COLUMN = 'main_piitag_fts', 'main_piitag', 'span_text'
+
+
+def entity_document_cascade(apps, schema_editor):
+    """PostgreSQL 에서 main_entity.document_id 외래키를 ON DELETE CASCADE 로 (0008 과 같은 이유)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Entity = apps.get_model('main', 'Entity')
+    for constraint in schema_editor._constraint_names(Entity, ['document_id'], foreign_key=True):
+        schema_editor.execute(f'ALTER TABLE main_entity DROP CONSTRAINT {schema_editor.quote_name(constraint)}')
+    schema_editor.execute(
+        'ALTER TABLE main_entity ADD CONSTRAINT main_entity_document_id_cascade '
+        'FOREIGN KEY (document_id) REFERENCES main_document (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED'
+    )
+
+
+def reinstall_search_indexes(apps, schema_editor):
+    # 되돌릴 때 SQLite 는 entity_ref 컬럼을 지우며 main_piitag 를 다시 만들어 FTS 트리거가 사라진다
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {COLUMN}) VALUES (new.id, new.{COLUMN}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMN}) VALUES ('delete', old.id, old.{COLUMN}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {COLUMN} ON {TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMN}) VALUES ('delete', old.id, old.{COLUMN}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {COLUMN}) VALUES (new.id, new.{COLUMN}); END"
+    )
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def create_entities(apps, schema_editor):
+    """기존 태그의 (문서, entity_id) 마다 Entity 를 만들고 태그에 연결"""
+    Entity = apps.get_model('main', 'Entity')
+    PIITag = apps.get_model('main', 'PIITag')
+    keys = PIITag.objects.exclude(entity_id='').values_list('document_id', 'entity_id').distinct().order_by()
+    batch = []
+    for document_id, entity_id in keys.iterator(chunk_size=BATCH_SIZE):
+        batch.append(Entity(document_id=document_id, representative_span_id=entity_id))
+        if len(batch) >= BATCH_SIZE:
+            Entity.objects.bulk_create(batch)
+            batch = []
+    Entity.objects.bulk_create(batch)
+    PIITag.objects.exclude(entity_id='').update(entity_ref=Subquery(
+        Entity.objects.filter(
+            document_id=OuterRef('document_id'), representative_span_id=OuterRef('entity_id')
+        ).values('id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_piitag_document_on_delete_cascade'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_indexes),
+        migrations.CreateModel(
+            name='Entity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('representative_span_id', models.CharField(max_length=100, verbose_name='대표 Span ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='생성일')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entities', to='main.document', verbose_name='문서')),
+            ],
+            options={
+                'verbose_name': 'Entity',
+                'verbose_name_plural': 'Entity들',
+            },
+        ),
+        migrations.AddField(
+            model_name='piitag',
+            name='entity_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tags', to='main.entity', verbose_name='Entity'),
+        ),
+        migrations.AddConstraint(
+            model_name='entity',
+            constraint=models.UniqueConstraint(fields=('document', 'representative_span_id'), name='uniq_entity_document_span'),
+        ),
+        migrations.RunPython(entity_document_cascade, migrations.RunPython.noop),
+        migrations.RunPython(create_entities, migrations.RunPython.noop),
+    ]
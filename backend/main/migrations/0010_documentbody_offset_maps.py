@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:10
+
+import re
+import struct
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+# main.offsets 의 이 시점 직렬화 형식을 그대로 담는다 (마이그레이션은 현재 코드를 import 하지 않는다)
+# 같은 코드 유닛 너비의 문자 구간마다 (구간 시작 코드 포인트, 구간 시작 코드 유닛) 을 두고,
+# 헤더 <III (구간 수, 코드 포인트 수, 코드 유닛 수) 뒤에 두 배열을 little-endian uint32 로 붙인다.
+# 너비 1 구간 하나뿐인 본문(항등 변환)은 빈 바이트열이다.
+UTF16_RUNS = re.compile('([\x00-\uffff]+)|([\U00010000-\U0010ffff]+)')
+UTF8_RUNS = re.compile('([\x00-\x7f]+)|([\x80-\u07ff]+)|([\u0800-\uffff]+)|([\U00010000-\U0010ffff]+)')
+
+
+def unit_map_bytes(text, pattern):
+    starts = []
+    unit_starts = []
+    units = 0
+    for match in pattern.finditer(text):
+        starts.append(match.start())
+        unit_starts.append(units)
+        units += (match.end() - match.start()) * match.lastindex
+    if len(starts) <= 1 and units == len(text):
+        return b''
+    return struct.pack(f'<III{len(starts)}I{len(starts)}I', len(starts), len(text), units, *starts, *unit_starts)
+
+
+def build_offset_maps(apps, schema_editor):
+    """기존 본문의 오프셋 맵을 묶음 단위로 생성"""
+    DocumentBody = apps.get_model('main', 'DocumentBody')
+    last_id = 0
+    while True:
+        bodies = list(DocumentBody.objects.filter(id__gt=last_id).order_by('id').only('id', 'text')[:BATCH_SIZE])
+        if not bodies:
+            return
+        for body in bodies:
+            body.utf16_offsets = unit_map_bytes(body.text, UTF16_RUNS)
+            body.utf8_offsets = unit_map_bytes(body.text, UTF8_RUNS)
+        DocumentBody.objects.bulk_update(bodies, ['utf16_offsets', 'utf8_offsets'])
+        last_id = bodies[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_entity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentbody',
+            name='utf16_offsets',
+            field=models.BinaryField(null=True, verbose_name='UTF-16 오프셋 맵'),
+        ),
+        migrations.AddField(
+            model_name='documentbody',
+            name='utf8_offsets',
+            field=models.BinaryField(null=True, verbose_name='UTF-8 오프셋 맵'),
+        ),
+        migrations.RunPython(build_offset_maps, migrations.RunPython.noop),
+    ]
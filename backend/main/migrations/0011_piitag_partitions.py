@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.db import migrations
+
+# PostgreSQL 에서 main_piitag 를 document_id 해시 파티션 테이블로 다시 만든다.
+# - PARTITION BY HASH (document_id) 부모 테이블에 PIITAG_PARTITIONS 개의 파티션(main_piitag_p00 ...)을 붙이고
+#   기존 행을 옮긴 뒤 옛 테이블을 지운다. 문서 단위 조회/삭제는 파티션 하나만 읽는다 (partition pruning).
+# - 파티션 키가 기본키에 포함되어야 하므로 DB 기본키는 (id, document_id) 이다. id 는 시퀀스로 계속 유일하고
+#   Django 는 그대로 id 를 기본키로 쓴다. PIITag 를 참조하는 외래키는 없다.
+# - PostgreSQL 15 는 파티션 테이블의 identity 컬럼을 지원하지 않으므로 id 는 소유 시퀀스 기본값이다.
+# - 외래키, Django 인덱스, pg_trgm 인덱스는 부모 테이블에 다시 만들어 모든 파티션에 적용된다.
+# - autovacuum 은 파티션 부모 테이블을 ANALYZE 하지 않으므로 부모의 pg_class.reltuples 는 이 마이그레이션의
+#   ANALYZE 값(새 설치에서는 0)에 머문다. 행 수 추정은 파티션들의 reltuples 를 더한다 (admin.EstimatedCountPaginator).
+# PIITAG_PARTITIONS 가 0 이거나 PostgreSQL 이 아니면 아무것도 하지 않는다. 되돌리면 일반 테이블로 옮긴다.
+TABLE = 'main_piitag'
+OLD_TABLE = 'main_piitag_old'
+SEQUENCE = 'main_piitag_id_seq'
+DOCUMENT_FK = 'main_piitag_document_id_cascade'
+# 0004_search_indexes 의 span_text pg_trgm 인덱스 (이 시점의 SQL 로 고정)
+TRGM_INDEX = 'CREATE INDEX IF NOT EXISTS main_piitag_span_text_trgm ON main_piitag USING gin (span_text gin_trgm_ops)'
+
+
+def _is_partitioned(cursor):
+    cursor.execute('SELECT relkind FROM pg_class WHERE oid = %s::regclass', [TABLE])
+    return cursor.fetchone()[0] == 'p'
+
+
+def _detach_id_sequence(schema_editor, cursor, table):
+    """table.id 의 identity/시퀀스 기본값을 떼어 내고 다음 id 값을 반환"""
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {table}')
+    next_id = cursor.fetchone()[0]
+    if sequence:
+        cursor.execute(f'SELECT last_value + CASE WHEN is_called THEN 1 ELSE 0 END FROM {sequence}')
+        next_id = max(next_id, cursor.fetchone()[0])
+
+    cursor.execute("SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'", [table])
+    if cursor.fetchone()[0]:
+        schema_editor.execute(f'ALTER TABLE {table} ALTER COLUMN id DROP IDENTITY')
+    else:
+        schema_editor.execute(f'ALTER TABLE {table} ALTER COLUMN id DROP DEFAULT')
+        if sequence:
+            schema_editor.execute(f'DROP SEQUENCE {sequence}')
+    return next_id
+
+
+def _rebuild_tags(apps, schema_editor, partitions):
+    """main_piitag 를 partitions 개 해시 파티션 테이블(0 이면 일반 테이블)로 다시 만들고 행을 옮김"""
+    PIITag = apps.get_model('main', 'PIITag')
+    execute = schema_editor.execute
+
+    execute(f'ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}')
+    with schema_editor.connection.cursor() as cursor:
+        next_id = _detach_id_sequence(schema_editor, cursor, OLD_TABLE)
+
+    partition_by = ' PARTITION BY HASH (document_id)' if partitions else ''
+    execute(f'CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS){partition_by}')
+    if partitions:
+        execute(f'CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id')
+        execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        execute('SELECT setval(%s, %s, false)', [SEQUENCE, next_id])
+        for remainder in range(partitions):
+            execute(
+                f'CREATE TABLE {TABLE}_p{remainder:02d} PARTITION OF {TABLE} '
+                f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+            )
+    else:
+        execute(f'ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (START WITH {next_id})')
+
+    # 인덱스 없이 옮긴 뒤 키와 인덱스를 한 번에 만든다
+    execute(f'INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}')
+    execute(f'DROP TABLE {OLD_TABLE}')
+
+    execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY ({'id, document_id' if partitions else 'id'})")
+    execute(
+        f'ALTER TABLE {TABLE} ADD CONSTRAINT {DOCUMENT_FK} FOREIGN KEY (document_id) '
+        'REFERENCES main_document (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED'
+    )
+    for name in ('pii_category', 'entity_ref', 'created_by'):
+        execute(schema_editor._create_fk_sql(PIITag, PIITag._meta.get_field(name), '_fk_%(to_table)s_%(to_column)s'))
+    for statement in schema_editor._model_indexes_sql(PIITag):
+        execute(statement)
+    execute(TRGM_INDEX)
+    execute(f'ANALYZE {TABLE}')
+
+
+def partition_tags(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql' or settings.PIITAG_PARTITIONS <= 0:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if _is_partitioned(cursor):
+            return
+    _rebuild_tags(apps, schema_editor, settings.PIITAG_PARTITIONS)
+
+
+def unpartition_tags(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not _is_partitioned(cursor):
+            return
+    _rebuild_tags(apps, schema_editor, 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_documentbody_offset_maps'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tags, unpartition_tags),
+    ]
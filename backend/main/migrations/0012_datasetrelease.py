@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0011_piitag_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetRelease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='이름')),
+                ('status', models.CharField(choices=[('building', '생성 중'), ('ready', '완료'), ('failed', '실패')], default='building', max_length=20, verbose_name='상태')),
+                ('compression', models.CharField(blank=True, max_length=10, verbose_name='압축')),
+                ('filters', models.JSONField(blank=True, default=dict, verbose_name='필터')),
+                ('document_count', models.PositiveIntegerField(default=0, verbose_name='문서 수')),
+                ('tag_count', models.PositiveIntegerField(default=0, verbose_name='태그 수')),
+                ('manifest', models.JSONField(blank=True, default=dict, verbose_name='manifest')),
+                ('message', models.TextField(blank=True, verbose_name='메시지')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='생성일')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, verbose_name='작성자')),
+            ],
+            options={
+                'verbose_name': '데이터셋 릴리스',
+                'verbose_name_plural': '데이터셋 릴리스들',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_datasetrelease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsistencyDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_id', models.BigIntegerField(unique=True, verbose_name='문서 ID')),
+                ('updated_at', models.DateTimeField(verbose_name='검사한 문서 수정일')),
+                ('rules_digest', models.CharField(max_length=40, verbose_name='규칙 digest')),
+            ],
+            options={
+                'verbose_name': '일관성 검사 문서',
+                'verbose_name_plural': '일관성 검사 문서들',
+            },
+        ),
+        migrations.CreateModel(
+            name='LabelCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=500, verbose_name='정규화 텍스트')),
+                ('category', models.CharField(max_length=50, verbose_name='카테고리')),
+                ('identifier_type', models.CharField(blank=True, max_length=100, verbose_name='식별자 유형')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='태그 수')),
+            ],
+            options={
+                'verbose_name': '라벨 통계',
+                'verbose_name_plural': '라벨 통계들',
+            },
+        ),
+        migrations.CreateModel(
+            name='LabelOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_id', models.BigIntegerField(db_index=True, verbose_name='문서 ID')),
+                ('tag_id', models.BigIntegerField(verbose_name='태그 ID')),
+                ('key', models.CharField(db_index=True, max_length=500, verbose_name='정규화 텍스트')),
+                ('category', models.CharField(max_length=50, verbose_name='카테고리')),
+                ('identifier_type', models.CharField(blank=True, max_length=100, verbose_name='식별자 유형')),
+            ],
+            options={
+                'verbose_name': '라벨 출현',
+                'verbose_name_plural': '라벨 출현들',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag_id', models.BigIntegerField(verbose_name='태그 ID')),
+                ('kind', models.CharField(choices=[('category_outlier', '같은 텍스트의 다른 카테고리'), ('identifier_outlier', '같은 텍스트의 다른 식별자 유형'), ('entity_mixed', 'entity 안의 다른 카테고리'), ('identifier_rule', '가이드라인 식별자 유형'), ('span_boundary', '범위 앞뒤 공백/구두점'), ('person_suffix', 'PERSON 호칭 포함'), ('overlap', '태그 겹침')], max_length=30, verbose_name='유형')),
+                ('key', models.CharField(blank=True, max_length=500, verbose_name='정규화 텍스트')),
+                ('span_text', models.CharField(max_length=500, verbose_name='태그된 텍스트')),
+                ('start_offset', models.IntegerField(verbose_name='시작 오프셋')),
+                ('end_offset', models.IntegerField(verbose_name='끝 오프셋')),
+                ('category', models.CharField(max_length=50, verbose_name='카테고리')),
+                ('identifier_type', models.CharField(blank=True, max_length=100, verbose_name='식별자 유형')),
+                ('expected', models.CharField(blank=True, max_length=500, verbose_name='제안')),
+                ('message', models.CharField(max_length=500, verbose_name='설명')),
+                ('support', models.PositiveIntegerField(default=1, verbose_name='근거 태그 수')),
+                ('score', models.FloatField(default=0.0, verbose_name='우선순위')),
+                ('dismissed', models.BooleanField(default=False, verbose_name='무시')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='생성일')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_items', to='main.document', verbose_name='문서')),
+            ],
+            options={
+                'verbose_name': '검토 항목',
+                'verbose_name_plural': '검토 항목들',
+                'ordering': ['-score', 'id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='labelcount',
+            constraint=models.UniqueConstraint(fields=('key', 'category', 'identifier_type'), name='uniq_labelcount_key_label'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewitem',
+            index=models.Index(fields=['dismissed', '-score'], name='reviewitem_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewitem',
+            index=models.Index(fields=['kind', 'key'], name='reviewitem_kind_key_idx'),
+        ),
+    ]
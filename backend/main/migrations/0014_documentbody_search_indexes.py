@@ -0,0 +1,60 @@
+from django.db import migrations
+
+# 문서 본문(main_documentbody.text) 검색 인덱스. 본문 테이블은 0006_document_body 에서 생겼고,
+# 이미 인덱스가 있는 DB 에서도 다시 실행할 수 있도록 모든 문장이 멱등이다 (이 시점의 SQL 로 고정).
+FTS_TABLE, TABLE, COLUMN = 'main_documentbody_fts', 'main_documentbody', 'text'
+POSTGRES_INDEXES = [
+    ('main_documentbody_text_trgm', 'gin (text gin_trgm_ops)'),
+    ('main_documentbody_text_tsv', "gin (to_tsvector('simple', text))"),
+]
+
+
+def create_body_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, definition in POSTGRES_INDEXES:
+            schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {TABLE} USING {definition}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{COLUMN}, content='{TABLE}', content_rowid='id', tokenize='trigram')"
+        )
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {COLUMN}) VALUES (new.id, new.{COLUMN}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMN}) VALUES ('delete', old.id, old.{COLUMN}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {COLUMN} ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMN}) VALUES ('delete', old.id, old.{COLUMN}); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {COLUMN}) VALUES (new.id, new.{COLUMN}); END"
+        )
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_body_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for name, _ in POSTGRES_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_label_consistency'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_body_indexes, drop_body_indexes),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# PostgreSQL 에서 ReviewItem.document 외래키를 ON DELETE CASCADE 로 다시 만든다 (0008 과 같은 이유).
+# 문서 삭제(DocumentQuerySet.delete_in_chunks)가 검토 큐 항목도 DB 에서 함께 지우게 한다.
+# SQLite 는 그대로 두고, 검토 큐 항목을 먼저 DELETE 한다.
+CONSTRAINT_NAME = 'main_reviewitem_document_id_cascade'
+
+
+def _recreate_document_fk(apps, schema_editor, on_delete, name):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    ReviewItem = apps.get_model('main', 'ReviewItem')
+    for constraint in schema_editor._constraint_names(ReviewItem, ['document_id'], foreign_key=True):
+        schema_editor.execute(f'ALTER TABLE main_reviewitem DROP CONSTRAINT {schema_editor.quote_name(constraint)}')
+    schema_editor.execute(
+        f'ALTER TABLE main_reviewitem ADD CONSTRAINT {schema_editor.quote_name(name)} '
+        f'FOREIGN KEY (document_id) REFERENCES main_document (id) {on_delete}DEFERRABLE INITIALLY DEFERRED'
+    )
+
+
+def add_cascade(apps, schema_editor):
+    _recreate_document_fk(apps, schema_editor, 'ON DELETE CASCADE ', CONSTRAINT_NAME)
+
+
+def remove_cascade(apps, schema_editor):
+    _recreate_document_fk(apps, schema_editor, '', 'main_reviewitem_document_id_fk_main_document_id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_documentbody_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_cascade, remove_cascade),
+    ]
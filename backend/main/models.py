@@ -1,5 +1,12 @@
-from django.db import models
+import hashlib
+
+from django.db import connections, models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .offsets import OffsetMap
 
 # Create your models here.
 
@@ -18,15 +25,175 @@ class PIICategory(models.Model):
     def __str__(self):
         return self.value
 
+
+def text_digest(text):
+    """본문의 내용 주소 (SHA-256 hex)"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class DocumentBodyQuerySet(models.QuerySet):
+    def intern(self, text):
+        """같은 내용의 본문이 있으면 재사용하고 없으면 생성"""
+        body, _ = self.get_or_create(digest=text_digest(text), defaults={'text': text})
+        return body
+
+    def intern_many(self, texts, offset_maps=None):
+        """여러 본문을 한 번에 저장하고 {digest: DocumentBody} 반환
+
+        offset_maps 에 {digest: OffsetMap} 으로 미리 만든 오프셋 맵을 주면 다시 만들지 않는다.
+        """
+        offset_maps = offset_maps or {}
+        bodies = {text_digest(text): text for text in texts}
+        existing = self.filter(digest__in=list(bodies)).in_bulk(field_name='digest')
+        self.bulk_create(
+            [
+                DocumentBody(digest=digest, **DocumentBody.offset_fields(text, offset_maps.get(digest)))
+                for digest, text in bodies.items() if digest not in existing
+            ],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        return self.filter(digest__in=list(bodies)).defer('text', *OFFSET_FIELDS).in_bulk(field_name='digest')
+
+    def orphaned(self):
+        """어느 문서도 참조하지 않는 본문"""
+        return self.filter(documents__isnull=True)
+
+
+OFFSET_FIELDS = ('utf16_offsets', 'utf8_offsets')
+
+
+class DocumentBody(models.Model):
+    """문서 본문 (내용 주소 저장, 여러 주석자가 올린 같은 본문은 한 행을 공유)"""
+    digest = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    text = models.TextField(verbose_name="text")
+    # 코드 포인트 <-> UTF-16/UTF-8 오프셋 맵 (main/offsets.py, 저장 시 한 번 생성, 빈 값이면 항등 변환)
+    utf16_offsets = models.BinaryField(null=True, editable=False, verbose_name="UTF-16 오프셋 맵")
+    utf8_offsets = models.BinaryField(null=True, editable=False, verbose_name="UTF-8 오프셋 맵")
+
+    objects = DocumentBodyQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "문서 본문"
+        verbose_name_plural = "문서 본문들"
+
+    def __str__(self):
+        return self.digest[:12]
+
+    @staticmethod
+    def offset_fields(text, offset_map=None):
+        """본문과 오프셋 맵 필드 값 (offset_map 이 없으면 본문으로 생성)"""
+        offset_map = offset_map or OffsetMap.build(text)
+        utf16, utf8 = offset_map.to_bytes()
+        return {'text': text, 'utf16_offsets': utf16, 'utf8_offsets': utf8}
+
+    def offset_map(self):
+        return OffsetMap.from_bytes(self.utf16_offsets, self.utf8_offsets)
+
+    def save(self, *args, **kwargs):
+        if self.utf16_offsets is None or self.utf8_offsets is None:
+            self.utf16_offsets, self.utf8_offsets = OffsetMap.build(self.text).to_bytes()
+        super().save(*args, **kwargs)
+
+
+class DocumentQuerySet(models.QuerySet):
+    """Document 대량 작업 메서드
+
+    touch/recount_tags 는 본문(text) 을 포함한 행 전체를 save() 하지 않고 작은 컬럼(updated_at, tag_count)만
+    UPDATE 한 번으로 갱신하고, delete_in_chunks 는 삭제 collector 없이 묶음 단위로 삭제한다.
+    """
+
+    def _touch_values(self, tag_delta):
+        values = {'updated_at': timezone.now()}
+        if tag_delta:
+            values['tag_count'] = F('tag_count') + tag_delta
+        return values
+
+    def touch(self, tag_delta=0):
+        """updated_at 갱신과 tag_count 증감 (태그 한 건 추가/삭제/수정용)"""
+        return self.update(**self._touch_values(tag_delta))
+
+    async def atouch(self, tag_delta=0):
+        return await self.aupdate(**self._touch_values(tag_delta))
+
+    def recount_tags(self):
+        """tag_count 를 실제 태그 수로 다시 계산 (일괄 생성/삭제 후 사용)"""
+        tag_counts = (
+            PIITag.objects.filter(document=OuterRef('pk'))
+            .order_by()
+            .values('document')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return self.update(
+            tag_count=Coalesce(Subquery(tag_counts), 0),
+            updated_at=timezone.now(),
+        )
+
+    def sync_entities(self):
+        """태그의 entity_id 에 맞춰 Entity 행을 만들고 PIITag.entity_ref 를 UPDATE 한 번으로 연결
+
+        태그를 일괄 생성/수정한 뒤 recount_tags 와 함께 사용한다. 태그가 남지 않은 Entity 는 삭제한다.
+        """
+        tags = PIITag.objects.filter(document__in=self)
+        Entity.objects.bulk_create(
+            [
+                Entity(document_id=document_id, representative_span_id=entity_id)
+                for document_id, entity_id in tags.exclude(entity_id='').values_list('document_id', 'entity_id').distinct()
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        tags.update(entity_ref=Subquery(
+            Entity.objects.filter(
+                document_id=OuterRef('document_id'), representative_span_id=OuterRef('entity_id')
+            ).values('id')[:1]
+        ))
+        Entity.objects.filter(document__in=self).empty().delete()
+
+    def delete_in_chunks(self, chunk_size=500):
+        """문서를 chunk_size 개씩 별도 트랜잭션으로 삭제하며 (삭제한 id 목록, 누적 삭제 수, 전체 수) 를 생성
+
+        Django 삭제 collector 를 거치지 않는다. PostgreSQL 은 PIITag.document 의 ON DELETE CASCADE
+        (0008 마이그레이션) 로 태그를 DB 에서 함께 지우고, 그 밖의 DB 는 태그를 먼저 DELETE 한다.
+        Entity.document 와 ReviewItem.document 도 같은 방식으로 지운다. 더 이상 참조되지 않는 본문도 묶음마다 정리한다.
+        """
+        ids = list(self.order_by('id').values_list('id', flat=True))
+        connection = connections[self.db]
+        deleted = 0
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            with transaction.atomic(using=self.db), connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(
+                        f'DELETE FROM {self.model._meta.db_table} WHERE id = ANY(%s) RETURNING id, body_id', [chunk]
+                    )
+                    rows = cursor.fetchall()
+                else:
+                    rows = list(self.model.objects.using(self.db).filter(id__in=chunk).values_list('id', 'body_id'))
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    for model in (PIITag, Entity, ReviewItem):
+                        cursor.execute(f'DELETE FROM {model._meta.db_table} WHERE document_id IN ({placeholders})', chunk)
+                    cursor.execute(f'DELETE FROM {self.model._meta.db_table} WHERE id IN ({placeholders})', chunk)
+                DocumentBody.objects.using(self.db).filter(id__in={body_id for _, body_id in rows}).orphaned().delete()
+            deleted += len(rows)
+            yield [document_id for document_id, _ in rows], deleted, len(ids)
+
+
 class Document(models.Model):
     """문서 모델"""
     data_id = models.CharField(max_length=200, verbose_name="data_id")
     number_of_subjects = models.TextField(verbose_name="number_of_subjects")
-    provenance = models.TextField(verbose_name="provenance")
-    text = models.TextField(verbose_name="text")
+    provenance = models.JSONField(default=dict, blank=True, verbose_name="provenance")
+    # 본문은 별도 테이블에 두어 목록/이동/메타데이터 조회가 본문을 읽지 않게 한다
+    body = models.ForeignKey(DocumentBody, on_delete=models.PROTECT, related_name='documents', verbose_name="본문")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="생성일")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="수정일")
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="작성자")
+    # 비정규화된 태그 수 (DocumentQuerySet.touch/recount_tags 로 유지)
+    tag_count = models.PositiveIntegerField(default=0, verbose_name="태그 수")
+    
+    objects = DocumentQuerySet.as_manager()
     
     class Meta:
         verbose_name = "문서"
@@ -39,8 +206,127 @@ class Document(models.Model):
     def __str__(self):
         return self.data_id
 
+    @property
+    def text(self):
+        return self.body.text
+
+    @text.setter
+    def text(self, value):
+        # Document(text=...) 호환: 저장 시점에 내용 주소로 본문을 찾거나 만든다
+        self.body = DocumentBody(digest=text_digest(value), text=value)
+
+    def save(self, *args, **kwargs):
+        if self.body_id is None and Document.body.field.is_cached(self):
+            self.body = DocumentBody.objects.intern(self.body.text)
+        super().save(*args, **kwargs)
+
+def _numeric_span_ids(tags):
+    """태그의 숫자 span_id (작은 순서)"""
+    return (
+        tags.filter(span_id__regex=r'^[0-9]+$')
+        .annotate(span_number=Cast('span_id', models.BigIntegerField()))
+        .order_by('span_number')
+        .values_list('span_id', flat=True)
+    )
+
+
+class EntityQuerySet(models.QuerySet):
+    def empty(self):
+        """태그가 하나도 연결되지 않은 entity (태그 조회를 entity 의 문서로 한정하여 파티션 하나만 읽음)"""
+        return self.filter(~Exists(
+            PIITag.objects.filter(entity_ref=OuterRef('pk'), document_id=OuterRef('document_id'))
+        ))
+
+
+class Entity(models.Model):
+    """문서 안에서 같은 대상을 가리키는 태그 묶음
+
+    대표 스팬의 span_id 를 representative_span_id 로 저장하며, 묶음에 속한 태그의 entity_id 도 같은 값이다
+    (JSONL 입출력과 기존 entity_id 기반 코드 호환). 대표 교체/병합/분리는 묶음 단위 UPDATE 로 처리한다.
+    """
+    # PostgreSQL 에서는 DB 외래키도 ON DELETE CASCADE (0009 마이그레이션)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='entities', verbose_name="문서")
+    representative_span_id = models.CharField(max_length=100, verbose_name="대표 Span ID")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="생성일")
+
+    objects = EntityQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Entity"
+        verbose_name_plural = "Entity들"
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'representative_span_id'], name='uniq_entity_document_span')
+        ]
+
+    def __str__(self):
+        return f'{self.document_id}:{self.representative_span_id}'
+
+    @property
+    def document_tags(self):
+        """이 entity 의 태그 (문서로 한정하여 PostgreSQL 해시 파티션 하나만 읽음, 0011 마이그레이션)"""
+        return self.tags.filter(document_id=self.document_id)
+
+    def merge_into(self, other):
+        """이 entity 의 태그를 other 로 옮기고 삭제"""
+        self.document_tags.update(entity_ref=other, entity_id=other.representative_span_id)
+        self.delete()
+        return other
+
+    def set_representative(self, span_id):
+        """대표 span_id 변경 (같은 대표의 entity 가 이미 있으면 그쪽으로 병합)"""
+        other = Entity.objects.filter(
+            document_id=self.document_id, representative_span_id=span_id
+        ).exclude(id=self.id).first()
+        if other is not None:
+            return self.merge_into(other)
+        Entity.objects.filter(id=self.id).update(representative_span_id=span_id)
+        self.representative_span_id = span_id
+        self.document_tags.update(entity_id=span_id)
+        return self
+
+    def reparent(self):
+        """대표 태그가 삭제된 뒤 남은 태그 중 가장 작은 숫자 span_id 를 대표로 삼는다
+
+        남은 태그가 없으면 entity 를 삭제하고 None 을 반환한다.
+        """
+        span_id = _numeric_span_ids(self.document_tags).first()
+        if span_id is None:
+            if not self.document_tags.exists():
+                self.delete()
+                return None
+            return self
+        return self.set_representative(span_id)
+
+    def split(self, tag_ids):
+        """tag_ids 태그를 별도 entity 로 분리하여 그 entity 를 반환 (대표는 그중 가장 작은 숫자 span_id)"""
+        moved = self.document_tags.filter(id__in=tag_ids)
+        if moved.filter(span_id=self.representative_span_id).exists():
+            # 대표 태그가 분리되는 쪽에 있으면 남는 태그를 새 entity 로 옮긴다
+            rest = list(self.document_tags.exclude(id__in=tag_ids).values_list('id', flat=True))
+            if rest:
+                self.split(rest)
+            return self
+        span_id = _numeric_span_ids(moved).first()
+        if span_id is None:
+            return None
+        entity, _ = Entity.objects.get_or_create(document_id=self.document_id, representative_span_id=span_id)
+        moved.update(entity_ref=entity, entity_id=span_id)
+        return entity
+
+
+class PIITagQuerySet(models.QuerySet):
+    def in_document(self, document_id):
+        """document_id 가 주어지면 그 문서의 태그로 한정
+
+        PostgreSQL 에서 main_piitag 는 document_id 해시 파티션이므로(0011 마이그레이션) id 만으로 찾으면
+        모든 파티션의 인덱스를 읽는다. 문서를 알면 함께 걸러 파티션 하나만 읽게 한다.
+        """
+        return self.filter(document_id=document_id) if document_id else self
+
+
 class PIITag(models.Model):
     """PII 태그 모델"""
+    # PostgreSQL 에서는 DB 외래키도 ON DELETE CASCADE (0008 마이그레이션, Document.objects.delete_in_chunks)
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='pii_tags', verbose_name="문서")
     pii_category = models.ForeignKey(PIICategory, on_delete=models.CASCADE, verbose_name="PII 카테고리")
     
@@ -52,6 +338,10 @@ class PIITag(models.Model):
     # 추가 메타데이터 필드들
     span_id = models.CharField(max_length=100, blank=True, verbose_name="Span ID")
     entity_id = models.CharField(max_length=100, blank=True, verbose_name="Entity ID")
+    # entity_id 가 가리키는 Entity (entity_id 가 비어 있으면 NULL)
+    entity_ref = models.ForeignKey(
+        Entity, on_delete=models.SET_NULL, null=True, blank=True, related_name='tags', verbose_name="Entity"
+    )
     annotator = models.CharField(max_length=100, blank=True, verbose_name="주석자")
     identifier_type = models.CharField(max_length=100, blank=True, verbose_name="식별자 유형")
     
@@ -59,11 +349,156 @@ class PIITag(models.Model):
     confidence = models.FloatField(default=0.0, verbose_name="신뢰도")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="생성일")
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="작성자")
+
+    objects = PIITagQuerySet.as_manager()
     
     class Meta:
         verbose_name = "PII 태그"
         verbose_name_plural = "PII 태그들"
         ordering = ['start_offset']
+        indexes = [
+            models.Index(fields=['pii_category', 'span_text'], name='piitag_category_span_idx'),
+            # 문서 구간(document_window)에 걸친 태그 조회
+            models.Index(fields=['document', 'start_offset'], name='piitag_document_start_idx'),
+        ]
     
     def __str__(self):
         return f"{self.document.data_id} - {self.pii_category.value}: {self.span_text}"
+
+
+class DatasetReleaseQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """user 가 볼 수 있는 릴리스 (관리자는 전체, 그 외에는 자신이 만든 릴리스)"""
+        return self if user.is_staff else self.filter(created_by=user)
+
+
+class DatasetRelease(models.Model):
+    """변경되지 않는 데이터셋 릴리스 (main/releases.py 가 RELEASE_ROOT/<name>/ 에 샤드와 manifest.json 을 기록)"""
+    BUILDING = 'building'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (BUILDING, '생성 중'),
+        (READY, '완료'),
+        (FAILED, '실패'),
+    ]
+    MANIFEST = 'manifest.json'
+
+    name = models.CharField(max_length=100, unique=True, verbose_name="이름")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=BUILDING, verbose_name="상태")
+    compression = models.CharField(max_length=10, blank=True, verbose_name="압축")
+    filters = models.JSONField(default=dict, blank=True, verbose_name="필터")
+    document_count = models.PositiveIntegerField(default=0, verbose_name="문서 수")
+    tag_count = models.PositiveIntegerField(default=0, verbose_name="태그 수")
+    manifest = models.JSONField(default=dict, blank=True, verbose_name="manifest")
+    message = models.TextField(blank=True, verbose_name="메시지")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="생성일")
+    created_by = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name="작성자")
+
+    objects = DatasetReleaseQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "데이터셋 릴리스"
+        verbose_name_plural = "데이터셋 릴리스들"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def files(self):
+        """내려받을 수 있는 파일 이름 (manifest.json 과 샤드)"""
+        return [self.MANIFEST, *(shard['file'] for shard in self.manifest.get('shards', []))]
+
+
+# --- 라벨 일관성 검사 (main/consistency.py) ---
+
+class ConsistencyDocument(models.Model):
+    """일관성 검사가 반영한 문서 상태 (updated_at 과 규칙이 같으면 다시 검사하지 않는다)
+
+    문서가 삭제된 뒤에도 기여분을 빼야 하므로 외래키가 아닌 document_id 값으로 둔다.
+    """
+    document_id = models.BigIntegerField(unique=True, verbose_name="문서 ID")
+    updated_at = models.DateTimeField(verbose_name="검사한 문서 수정일")
+    rules_digest = models.CharField(max_length=40, verbose_name="규칙 digest")
+
+    class Meta:
+        verbose_name = "일관성 검사 문서"
+        verbose_name_plural = "일관성 검사 문서들"
+
+
+class LabelOccurrence(models.Model):
+    """태그 하나의 정규화 텍스트와 라벨 (문서가 바뀌면 이전 기여분을 빼고, 이상치 라벨의 태그를 찾는 데 쓴다)"""
+    document_id = models.BigIntegerField(db_index=True, verbose_name="문서 ID")
+    tag_id = models.BigIntegerField(verbose_name="태그 ID")
+    key = models.CharField(max_length=500, db_index=True, verbose_name="정규화 텍스트")
+    category = models.CharField(max_length=50, verbose_name="카테고리")
+    identifier_type = models.CharField(max_length=100, blank=True, verbose_name="식별자 유형")
+
+    class Meta:
+        verbose_name = "라벨 출현"
+        verbose_name_plural = "라벨 출현들"
+
+
+class LabelCount(models.Model):
+    """정규화 텍스트 → (카테고리, 식별자 유형) 별 태그 수"""
+    key = models.CharField(max_length=500, verbose_name="정규화 텍스트")
+    category = models.CharField(max_length=50, verbose_name="카테고리")
+    identifier_type = models.CharField(max_length=100, blank=True, verbose_name="식별자 유형")
+    count = models.PositiveIntegerField(default=0, verbose_name="태그 수")
+
+    class Meta:
+        verbose_name = "라벨 통계"
+        verbose_name_plural = "라벨 통계들"
+        constraints = [
+            models.UniqueConstraint(fields=['key', 'category', 'identifier_type'], name='uniq_labelcount_key_label')
+        ]
+
+
+class ReviewItem(models.Model):
+    """검토 큐 항목 (일관성 검사가 찾은 의심 태그, score 가 높은 순으로 검토)"""
+    CATEGORY_OUTLIER = 'category_outlier'
+    IDENTIFIER_OUTLIER = 'identifier_outlier'
+    ENTITY_MIXED = 'entity_mixed'
+    IDENTIFIER_RULE = 'identifier_rule'
+    SPAN_BOUNDARY = 'span_boundary'
+    PERSON_SUFFIX = 'person_suffix'
+    OVERLAP = 'overlap'
+    KIND_CHOICES = [
+        (CATEGORY_OUTLIER, '같은 텍스트의 다른 카테고리'),
+        (IDENTIFIER_OUTLIER, '같은 텍스트의 다른 식별자 유형'),
+        (ENTITY_MIXED, 'entity 안의 다른 카테고리'),
+        (IDENTIFIER_RULE, '가이드라인 식별자 유형'),
+        (SPAN_BOUNDARY, '범위 앞뒤 공백/구두점'),
+        (PERSON_SUFFIX, 'PERSON 호칭 포함'),
+        (OVERLAP, '태그 겹침'),
+    ]
+    OUTLIER_KINDS = (CATEGORY_OUTLIER, IDENTIFIER_OUTLIER)
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='review_items', verbose_name="문서")
+    tag_id = models.BigIntegerField(verbose_name="태그 ID")
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, verbose_name="유형")
+    key = models.CharField(max_length=500, blank=True, verbose_name="정규화 텍스트")
+    span_text = models.CharField(max_length=500, verbose_name="태그된 텍스트")
+    start_offset = models.IntegerField(verbose_name="시작 오프셋")
+    end_offset = models.IntegerField(verbose_name="끝 오프셋")
+    category = models.CharField(max_length=50, verbose_name="카테고리")
+    identifier_type = models.CharField(max_length=100, blank=True, verbose_name="식별자 유형")
+    expected = models.CharField(max_length=500, blank=True, verbose_name="제안")
+    message = models.CharField(max_length=500, verbose_name="설명")
+    support = models.PositiveIntegerField(default=1, verbose_name="근거 태그 수")
+    score = models.FloatField(default=0.0, verbose_name="우선순위")
+    dismissed = models.BooleanField(default=False, verbose_name="무시")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="생성일")
+
+    class Meta:
+        verbose_name = "검토 항목"
+        verbose_name_plural = "검토 항목들"
+        ordering = ['-score', 'id']
+        indexes = [
+            models.Index(fields=['dismissed', '-score'], name='reviewitem_queue_idx'),
+            models.Index(fields=['kind', 'key'], name='reviewitem_kind_key_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()}: {self.span_text}'
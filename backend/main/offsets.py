@@ -0,0 +1,144 @@
+"""
+오프셋 단위 변환 (코드 포인트 / UTF-16 / UTF-8 바이트)
+
+DB 의 start_offset/end_offset 은 Python 문자열 인덱스(코드 포인트)입니다. 브라우저는 JavaScript
+문자열 인덱스(UTF-16 코드 유닛)를, 외부 도구는 흔히 UTF-8 바이트 오프셋을 쓰므로 이모지 같은
+보조 평면 문자나 한글이 섞이면 단위가 어긋납니다.
+
+본문마다 "같은 너비(코드 유닛 수)의 문자가 이어지는 구간" 목록을 두 배열(구간 시작 코드 포인트,
+구간 시작 코드 유닛)로 한 번 만들어 DocumentBody 에 저장하고, 변환은 이 배열의 이진 탐색으로
+O(log n) 에 합니다. 문자열을 span 마다 다시 인코딩하지 않습니다.
+
+한 가지 너비로만 이루어진 본문(ASCII 전용 본문의 UTF-8, 보조 평면 문자가 없는 본문의 UTF-16)은
+빈 바이트열로 저장하며 변환은 항등입니다.
+"""
+
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+CODEPOINT = 'codepoint'
+UTF16 = 'utf16'
+UTF8 = 'utf8'
+OFFSET_UNITS = (CODEPOINT, UTF16, UTF8)
+
+# 코드 유닛 너비별 문자 구간 (그룹 번호 = 너비)
+_UTF16_RUNS = re.compile('([\x00-\uffff]+)|([\U00010000-\U0010ffff]+)')
+_UTF8_RUNS = re.compile('([\x00-\x7f]+)|([\x80-\u07ff]+)|([\u0800-\uffff]+)|([\U00010000-\U0010ffff]+)')
+_HEADER = struct.Struct('<III')
+
+
+class UnitMap:
+    """코드 포인트 <-> 코드 유닛 변환 구간 배열 (같은 너비의 문자 구간마다 시작 위치 두 개)"""
+
+    def __init__(self, starts=None, unit_starts=None, length=0, units=0):
+        self.starts = starts if starts is not None else array('I')
+        self.unit_starts = unit_starts if unit_starts is not None else array('I')
+        self.length = length
+        self.units = units
+
+    @classmethod
+    def build(cls, text, pattern):
+        starts = array('I')
+        unit_starts = array('I')
+        units = 0
+        for match in pattern.finditer(text):
+            starts.append(match.start())
+            unit_starts.append(units)
+            units += (match.end() - match.start()) * match.lastindex
+        if len(starts) <= 1 and units == len(text):
+            # 한 가지 너비(1)뿐이면 항등 변환
+            return cls(length=len(text), units=units)
+        return cls(starts, unit_starts, len(text), units)
+
+    @property
+    def is_identity(self):
+        return not self.starts
+
+    def to_bytes(self):
+        """저장용 직렬화 (항등 변환이면 빈 바이트열)"""
+        if self.is_identity:
+            return b''
+        starts, unit_starts = array('I', self.starts), array('I', self.unit_starts)
+        if sys.byteorder == 'big':
+            starts.byteswap()
+            unit_starts.byteswap()
+        return _HEADER.pack(len(starts), self.length, self.units) + starts.tobytes() + unit_starts.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        if not data:
+            return cls()
+        count, length, units = _HEADER.unpack_from(data)
+        size = count * 4
+        starts = array('I', bytes(data[_HEADER.size:_HEADER.size + size]))
+        unit_starts = array('I', bytes(data[_HEADER.size + size:_HEADER.size + size * 2]))
+        if sys.byteorder == 'big':
+            starts.byteswap()
+            unit_starts.byteswap()
+        return cls(starts, unit_starts, length, units)
+
+    def _width(self, index):
+        end = self.starts[index + 1] if index + 1 < len(self.starts) else self.length
+        unit_end = self.unit_starts[index + 1] if index + 1 < len(self.unit_starts) else self.units
+        return (unit_end - self.unit_starts[index]) // (end - self.starts[index])
+
+    def to_units(self, offset):
+        """코드 포인트 오프셋 -> 코드 유닛 오프셋"""
+        if self.is_identity:
+            return offset
+        index = bisect_right(self.starts, offset) - 1
+        if index < 0:
+            return offset
+        return self.unit_starts[index] + (offset - self.starts[index]) * self._width(index)
+
+    def from_units(self, offset):
+        """코드 유닛 오프셋 -> 코드 포인트 오프셋 (문자 중간을 가리키면 ValueError)"""
+        if self.is_identity:
+            return offset
+        index = bisect_right(self.unit_starts, offset) - 1
+        if index < 0:
+            return offset
+        count, remainder = divmod(offset - self.unit_starts[index], self._width(index))
+        if remainder:
+            raise ValueError(f'오프셋 {offset} 이(가) 문자 중간을 가리킵니다.')
+        return self.starts[index] + count
+
+
+class OffsetMap:
+    """본문 하나의 UTF-16/UTF-8 오프셋 변환기"""
+
+    def __init__(self, utf16, utf8):
+        self.units = {UTF16: utf16, UTF8: utf8}
+
+    @classmethod
+    def build(cls, text):
+        return cls(UnitMap.build(text, _UTF16_RUNS), UnitMap.build(text, _UTF8_RUNS))
+
+    @classmethod
+    def from_bytes(cls, utf16=b'', utf8=b''):
+        return cls(UnitMap.from_bytes(utf16), UnitMap.from_bytes(utf8))
+
+    def to_bytes(self):
+        """저장용 (UTF-16 맵, UTF-8 맵) 바이트열"""
+        return self.units[UTF16].to_bytes(), self.units[UTF8].to_bytes()
+
+    def to_unit(self, offset, unit):
+        """코드 포인트 오프셋을 unit 으로"""
+        if unit == CODEPOINT:
+            return offset
+        return self.units[unit].to_units(offset)
+
+    def from_unit(self, offset, unit):
+        """unit 오프셋을 코드 포인트로"""
+        if unit == CODEPOINT:
+            return offset
+        return self.units[unit].from_units(offset)
+
+
+def validate_unit(unit):
+    if unit not in OFFSET_UNITS:
+        raise ValueError(f"알 수 없는 오프셋 단위입니다: {unit} ({', '.join(OFFSET_UNITS)} 중 하나)")
+    return unit
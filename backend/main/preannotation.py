@@ -0,0 +1,295 @@
+"""
+자동 사전 태깅(pre-annotation) 엔진
+
+정규식 탐지기(주민등록번호, 전화번호, 이메일 등 구조화된 식별자)와
+Aho-Corasick 사전 탐지기(이름, 장소 등)를 Document.text 에 실행하여
+confidence 가 채워진 제안 PIITag 를 생성합니다.
+
+탐지기는 settings.PREANNOTATION_DETECTORS 의 dotted path 목록으로 교체/추가할 수 있으며
+``detect(text)`` 가 Suggestion 을 돌려주는 객체면 됩니다.
+"""
+
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from .models import Document, PIICategory, PIITag
+from .spans import AhoCorasick, SpanIndex
+
+DEFAULT_DETECTORS = [
+    'main.preannotation.RegexDetector',
+    'main.preannotation.DictionaryDetector',
+]
+
+# 탐지 종류(kind) -> PIICategory.value (tag.json 기준, KDPII 등은 settings 에서 교체)
+DEFAULT_CATEGORY_MAP = {
+    'resident_number': 'CODE',
+    'alien_number': 'CODE',
+    'mobile': 'CODE',
+    'phone': 'CODE',
+    'email': 'CODE',
+    'card_number': 'CODE',
+    'passport_number': 'CODE',
+    'plate_number': 'CODE',
+    'ip': 'CODE',
+    'url': 'CODE',
+}
+
+DEFAULT_DIRECT_CATEGORIES = ['PERSON', 'CODE']
+DEFAULT_ANNOTATOR = 'auto'
+
+
+class Suggestion(NamedTuple):
+    """탐지 결과 (문자 단위 offset, end 는 미포함)"""
+    start: int
+    end: int
+    text: str
+    kind: str
+    confidence: float
+
+
+def _rrn_checksum_valid(digits):
+    weights = (2, 3, 4, 5, 6, 7, 8, 9, 2, 3, 4, 5)
+    total = sum(int(d) * w for d, w in zip(digits, weights))
+    return (11 - total % 11) % 10 == int(digits[12])
+
+
+def _luhn_valid(digits):
+    total = 0
+    for index, char in enumerate(reversed(digits)):
+        value = int(char)
+        if index % 2 == 1:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return total % 10 == 0
+
+
+class RegexDetector:
+    """정규식 기반 구조화 식별자 탐지기"""
+
+    # (kind, pattern, confidence)
+    RULES = [
+        ('email', r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}', 0.99),
+        ('resident_number', r'(?<!\d)\d{2}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])[- ]?[1-4]\d{6}(?!\d)', 0.9),
+        ('alien_number', r'(?<!\d)\d{2}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])[- ]?[5-8]\d{6}(?!\d)', 0.9),
+        ('mobile', r'(?<!\d)01[016789][- .]?\d{3,4}[- .]?\d{4}(?!\d)', 0.95),
+        ('phone', r'(?<!\d)0(?:2|[3-6][1-5]|70)[- .)]?\d{3,4}[- .]?\d{4}(?!\d)', 0.9),
+        ('card_number', r'(?<!\d)\d{4}[- ]?\d{4}[- ]?\d{4}[- ]?\d{4}(?!\d)', 0.9),
+        ('passport_number', r'(?<![A-Za-z0-9])[MSRODG](?:\d{8}|\d{3}[A-Z]\d{4})(?![A-Za-z0-9])', 0.7),
+        ('plate_number', r'(?<![\w])\d{2,3}[가-힣] ?\d{4}(?!\d)', 0.8),
+        ('ip', r'(?<![\d.])(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)(?![\d.])', 0.9),
+        ('url', r'https?://[^\s<>"\']+', 0.9),
+    ]
+
+    def __init__(self, rules=None):
+        self.rules = [
+            (kind, re.compile(pattern), confidence)
+            for kind, pattern, confidence in (rules or self.RULES)
+        ]
+
+    def detect(self, text):
+        for kind, pattern, confidence in self.rules:
+            for match in pattern.finditer(text):
+                value = match.group()
+                digits = re.sub(r'\D', '', value)
+                if kind in ('resident_number', 'alien_number'):
+                    # 2020년 10월 이후 발급분은 검증번호가 없으므로 실패해도 낮은 신뢰도로 유지
+                    confidence_value = 0.99 if _rrn_checksum_valid(digits) else confidence - 0.2
+                elif kind == 'card_number':
+                    if not _luhn_valid(digits):
+                        continue
+                    confidence_value = confidence
+                else:
+                    confidence_value = confidence
+                yield Suggestion(match.start(), match.end(), value, kind, confidence_value)
+
+
+class DictionaryDetector:
+    """사전 기반 이름/장소 탐지기 (Aho-Corasick)
+
+    entries 는 {kind: [용어, ...]} 형태이며, 생략하면
+    settings.PREANNOTATION_DICTIONARY_PATH 의 JSON 파일을 읽는다.
+    """
+
+    def __init__(self, entries=None, confidence=None, min_length=2):
+        if entries is None:
+            entries = load_dictionary(getattr(settings, 'PREANNOTATION_DICTIONARY_PATH', ''))
+        self.confidence = confidence if confidence is not None else getattr(
+            settings, 'PREANNOTATION_DICTIONARY_CONFIDENCE', 0.7)
+        self.automaton = AhoCorasick()
+        for kind, terms in entries.items():
+            for term in terms:
+                term = term.strip()
+                if len(term) >= min_length:
+                    self.automaton.add(term, kind)
+        self.automaton.build()
+
+    def detect(self, text):
+        if not len(self.automaton):
+            return
+        for start, end, kind in self.automaton.finditer(text):
+            yield Suggestion(start, end, text[start:end], kind, self.confidence)
+
+
+def load_dictionary(path):
+    """{category: [terms]} JSON 사전 파일 로드 (경로가 없으면 빈 사전)"""
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_detectors(paths=None):
+    """settings.PREANNOTATION_DETECTORS 에 등록된 탐지기 인스턴스 목록"""
+    paths = paths or getattr(settings, 'PREANNOTATION_DETECTORS', DEFAULT_DETECTORS)
+    return [import_string(path)() for path in paths]
+
+
+def resolve_overlaps(suggestions):
+    """겹치는 제안 중 더 길고 신뢰도 높은 것만 남김 (가이드라인의 겹침 방지 규칙)"""
+    ordered = sorted(suggestions, key=lambda s: (-(s.end - s.start), -s.confidence, s.start))
+    taken = SpanIndex()
+    for suggestion in ordered:
+        if not taken.overlaps(suggestion.start, suggestion.end):
+            taken.add(suggestion.start, suggestion.end)
+            yield suggestion
+
+
+def detect_pii(text, detectors):
+    """모든 탐지기를 실행하여 겹치지 않는 제안 목록을 offset 순으로 반환"""
+    found = []
+    for detector in detectors:
+        found.extend(detector.detect(text))
+    return sorted(resolve_overlaps(found), key=lambda s: s.start)
+
+
+# --- 프로세스 풀 작업자 ---
+
+_worker_detectors = None
+
+
+def _init_worker(paths):
+    global _worker_detectors
+    import django
+    django.setup()
+    _worker_detectors = build_detectors(paths)
+
+
+def _detect_batch(batch):
+    return [(document_id, detect_pii(text, _worker_detectors)) for document_id, text in batch]
+
+
+def _iter_batches(documents, batch_size):
+    batch = []
+    for item in documents.values_list('id', 'body__text').iterator(chunk_size=batch_size):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _iter_detected(documents, workers, batch_size, paths):
+    if workers <= 1:
+        detectors = build_detectors(paths)
+        for batch in _iter_batches(documents, batch_size):
+            yield [(document_id, detect_pii(text, detectors)) for document_id, text in batch]
+        return
+
+    # fork 된 작업자가 부모의 DB 연결을 물려받지 않도록 연결을 닫고,
+    # 배치를 읽는 쿼리가 연결을 다시 열기 전에 작업자 프로세스를 미리 띄운다
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(paths,)) as executor:
+        executor.submit(len, ()).result()
+        pending = set()
+        for batch in _iter_batches(documents, batch_size):
+            pending.add(executor.submit(_detect_batch, batch))
+            # 메모리 사용량을 제한하기 위해 진행 중인 배치 수를 제한
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+def preannotate_documents(documents, user, workers=1, batch_size=200, detector_paths=None, return_tags=False):
+    """문서 QuerySet 에 탐지기를 실행하여 제안 PIITag 를 일괄 생성
+
+    기존 태그와 겹치는 제안은 건너뛰고, span_id 는 문서별 최대 숫자 span_id 다음부터 부여한다.
+    생성된 태그는 annotator=PREANNOTATION_ANNOTATOR, confidence=탐지 신뢰도를 가진다.
+    return_tags=True 이면 생성된 PIITag 객체를 summary['tags'] 로 함께 돌려준다 (단건 처리용).
+    """
+    category_map = {**DEFAULT_CATEGORY_MAP, **getattr(settings, 'PREANNOTATION_CATEGORY_MAP', {})}
+    direct_categories = set(getattr(settings, 'PREANNOTATION_DIRECT_CATEGORIES', DEFAULT_DIRECT_CATEGORIES))
+    annotator = getattr(settings, 'PREANNOTATION_ANNOTATOR', DEFAULT_ANNOTATOR)
+    categories = {category.value: category for category in PIICategory.objects.all()}
+    max_span_length = PIITag._meta.get_field('span_text').max_length
+
+    summary = {'documents': 0, 'suggested': 0, 'created': 0, 'skipped_overlap': 0, 'skipped_category': 0}
+    if return_tags:
+        summary['tags'] = []
+    for results in _iter_detected(documents, workers, batch_size, detector_paths):
+        document_ids = [document_id for document_id, _ in results]
+        existing = {}
+        for document_id, start, end, span_id in PIITag.objects.filter(
+            document_id__in=document_ids
+        ).values_list('document_id', 'start_offset', 'end_offset', 'span_id'):
+            spans, max_span_id = existing.get(document_id, (SpanIndex(), 0))
+            spans.add(start, end)
+            if str(span_id).isdigit():
+                max_span_id = max(max_span_id, int(span_id))
+            existing[document_id] = (spans, max_span_id)
+
+        new_tags = []
+        touched = []
+        for document_id, suggestions in results:
+            summary['documents'] += 1
+            summary['suggested'] += len(suggestions)
+            spans, next_span_id = existing.get(document_id, (SpanIndex(), 0))
+            created_here = 0
+            for suggestion in suggestions:
+                category_value = category_map.get(suggestion.kind, suggestion.kind)
+                category = categories.get(category_value)
+                if category is None or suggestion.end - suggestion.start > max_span_length:
+                    summary['skipped_category'] += 1
+                    continue
+                if spans.overlaps(suggestion.start, suggestion.end):
+                    summary['skipped_overlap'] += 1
+                    continue
+                next_span_id += 1
+                spans.add(suggestion.start, suggestion.end)
+                new_tags.append(PIITag(
+                    document_id=document_id,
+                    pii_category=category,
+                    span_text=suggestion.text,
+                    start_offset=suggestion.start,
+                    end_offset=suggestion.end,
+                    span_id=str(next_span_id),
+                    entity_id=str(next_span_id),
+                    annotator=annotator,
+                    identifier_type='DIRECT' if category_value in direct_categories else 'QUASI',
+                    confidence=suggestion.confidence,
+                    created_by=user,
+                ))
+                created_here += 1
+            if created_here:
+                touched.append(document_id)
+
+        PIITag.objects.bulk_create(new_tags, batch_size=1000)
+        if return_tags:
+            summary['tags'].extend(new_tags)
+        if touched:
+            Document.objects.filter(id__in=touched).recount_tags()
+            Document.objects.filter(id__in=touched).sync_entities()
+        summary['created'] += len(new_tags)
+
+    return summary
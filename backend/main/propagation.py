@@ -0,0 +1,181 @@
+"""
+라벨 전파 (propagate-label)
+
+태그된 스팬과 같은 텍스트의 다른 출현 위치를 문서 또는 사용자 코퍼스 전체에서 찾아
+같은 카테고리/entity_id 로 일괄 태깅합니다. 여러 스팬을 Aho-Corasick 오토마톤 하나로
+만들어 문서 텍스트를 한 번만 순회하며, 기존 태그와 겹치는 출현 위치는 건너뜁니다.
+다른 단어의 일부인 출현 위치(앞에 글자/숫자가 붙었거나 뒤에 한글이 아닌 글자/숫자가 붙은 경우)는
+태깅하지 않고, whole_word=True 이면 뒤에 한글이 붙은 경우(조사, 합성어)도 제외합니다.
+"""
+
+import unicodedata
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from .models import Document, PIITag
+from .spans import AhoCorasick, SpanIndex
+
+
+def normalize_text(text):
+    """정규화된 텍스트와 정규화 문자별 원본 위치 목록 반환
+
+    NFKC 정규화, casefold, 연속 공백 축약을 문자 단위로 적용하므로
+    정규화 텍스트에서 찾은 위치를 원본 offset 으로 되돌릴 수 있다.
+    """
+    chars = []
+    origins = []
+    previous_space = False
+    for index, char in enumerate(text):
+        if char.isspace():
+            if previous_space:
+                continue
+            previous_space = True
+            chars.append(' ')
+            origins.append(index)
+            continue
+        previous_space = False
+        for normalized in unicodedata.normalize('NFKC', char).casefold():
+            chars.append(normalized)
+            origins.append(index)
+    return ''.join(chars), origins
+
+
+def _is_hangul(char):
+    return '\uac00' <= char <= '\ud7a3'
+
+
+def is_word_boundary(text, start, end, whole_word=False):
+    """text[start:end] 가 앞뒤 단어에 이어지지 않는지
+
+    앞에 글자/숫자가 붙으면 항상 경계가 아니다. 뒤에 붙은 한글은 조사일 수 있으므로
+    whole_word=True 일 때만 경계가 아닌 것으로 본다 ('홍길동은' 은 허용, '홍길동전' 은 whole_word 로 제외).
+    """
+    if start > 0 and text[start].isalnum() and text[start - 1].isalnum():
+        return False
+    if end < len(text) and text[end - 1].isalnum():
+        following = text[end]
+        if following.isalnum() and (whole_word or not _is_hangul(following)):
+            return False
+    return True
+
+
+def find_occurrences(text, automaton, normalize=False, whole_word=False):
+    """오토마톤의 패턴 출현 위치 (start, end, payload) 를 단어 경계에 맞는 것만 원본 offset 으로 반환"""
+    if normalize:
+        normalized, origins = normalize_text(text)
+        occurrences = (
+            (origins[start], origins[end - 1] + 1, payload)
+            for start, end, payload in automaton.finditer(normalized)
+        )
+    else:
+        occurrences = automaton.finditer(text)
+    return [
+        (start, end, payload)
+        for start, end, payload in occurrences
+        if is_word_boundary(text, start, end, whole_word)
+    ]
+
+
+def propagate_tags(source_tags, documents, user, normalize=False, whole_word=False, batch_size=500):
+    """source_tags 의 span_text 출현 위치를 documents 에서 찾아 PIITag 를 일괄 생성
+
+    - 원본 태그가 있는 문서에서는 원본 태그의 entity_id 를 그대로 사용한다.
+    - 다른 문서에서는 같은 텍스트/카테고리 태그가 이미 있으면 그 entity_id 에 연결하고,
+      없으면 처음 생성되는 태그를 대표(entity_id = span_id)로 삼는다.
+    - 기존 태그 또는 먼저 선택된 출현 위치와 겹치면 건너뛰며, 긴 스팬을 우선한다.
+    - 다른 단어의 일부인 출현 위치는 건너뛴다 (is_word_boundary 참고).
+
+    생성된 PIITag 목록을 반환한다.
+    """
+    sources = [tag for tag in source_tags if tag.span_text]
+    if not sources:
+        return []
+
+    automaton = AhoCorasick()
+    source_keys = []
+    for index, tag in enumerate(sources):
+        pattern = normalize_text(tag.span_text)[0] if normalize else tag.span_text
+        automaton.add(pattern, index)
+        source_keys.append(pattern)
+    automaton.build()
+
+    # 정확 일치일 때는 DB 에서 후보 문서를 먼저 거른다
+    if not normalize:
+        documents = documents.filter(reduce(or_, (Q(body__text__contains=tag.span_text) for tag in sources)))
+
+    created = []
+    batch = []
+    for item in documents.values_list('id', 'body__text').iterator(chunk_size=batch_size):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            created.extend(_propagate_batch(batch, sources, source_keys, automaton, user, normalize, whole_word))
+            batch = []
+    if batch:
+        created.extend(_propagate_batch(batch, sources, source_keys, automaton, user, normalize, whole_word))
+    return created
+
+
+def _propagate_batch(batch, sources, source_keys, automaton, user, normalize, whole_word):
+    document_ids = [document_id for document_id, _ in batch]
+    spans = {document_id: SpanIndex() for document_id in document_ids}
+    max_span_ids = dict.fromkeys(document_ids, 0)
+    # (document_id, 정규화 텍스트, category_id) -> entity_id
+    entity_ids = {}
+    for document_id, start, end, span_id, entity_id, span_text, category_id in PIITag.objects.filter(
+        document_id__in=document_ids
+    ).order_by('start_offset').values_list(
+        'document_id', 'start_offset', 'end_offset', 'span_id', 'entity_id', 'span_text', 'pii_category_id'
+    ):
+        spans[document_id].add(start, end)
+        if str(span_id).isdigit():
+            max_span_ids[document_id] = max(max_span_ids[document_id], int(span_id))
+        key = normalize_text(span_text)[0] if normalize else span_text
+        entity_ids.setdefault((document_id, key, category_id), entity_id)
+    for tag in sources:
+        key = normalize_text(tag.span_text)[0] if normalize else tag.span_text
+        entity_ids[(tag.document_id, key, tag.pii_category_id)] = tag.entity_id
+
+    new_tags = []
+    for document_id, text in batch:
+        occurrences = sorted(
+            find_occurrences(text, automaton, normalize, whole_word),
+            key=lambda item: (item[0] - item[1], item[0]),
+        )
+        taken = spans[document_id]
+        selected = []
+        for start, end, index in occurrences:
+            if not taken.overlaps(start, end):
+                taken.add(start, end)
+                selected.append((start, end, index))
+        # span_id 와 대표 태그는 문서 내 위치 순서로 정한다
+        for start, end, index in sorted(selected):
+            source = sources[index]
+            max_span_ids[document_id] += 1
+            span_id = str(max_span_ids[document_id])
+            entity_id = entity_ids.setdefault(
+                (document_id, source_keys[index], source.pii_category_id), span_id
+            )
+            new_tags.append(PIITag(
+                document_id=document_id,
+                pii_category=source.pii_category,
+                span_text=text[start:end],
+                start_offset=start,
+                end_offset=end,
+                span_id=span_id,
+                entity_id=entity_id,
+                annotator=user.username,
+                identifier_type=source.identifier_type,
+                created_by=user,
+            ))
+
+    PIITag.objects.bulk_create(new_tags, batch_size=1000)
+    return new_tags
+
+
+def propagation_scope(source_tags, user, scope):
+    """전파 대상 문서 QuerySet (document: 원본 태그의 문서, corpus: 사용자의 전체 문서)"""
+    if scope == 'corpus':
+        return Document.objects.filter(created_by=user)
+    return Document.objects.filter(id__in={tag.document_id for tag in source_tags}, created_by=user)
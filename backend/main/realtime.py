@@ -0,0 +1,202 @@
+"""
+문서별 실시간 태그 동기화 (ASGI WebSocket)
+
+``/ws/documents/<id>/`` 에 접속한 클라이언트는 같은 문서의 태그 추가/수정/삭제 이벤트를 받아
+페이지 전체를 다시 불러오지 않고 변경분만 반영합니다.
+
+이벤트의 태그 오프셋은 에디터 단위(UTF-16, JavaScript 문자열 인덱스)입니다.
+이벤트는 태그 API 뷰에서 트랜잭션 커밋 후 broadcast_tag_event() 로 발행하며,
+그룹 전달은 단일 프로세스용 InMemoryChannelLayer 가 담당합니다.
+여러 프로세스/노드로 확장할 때는 같은 인터페이스(group_add/group_discard/group_send)를
+가진 외부 브로커 기반 레이어로 교체해야 합니다.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import threading
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import transaction
+from django.http.request import split_domain_port, validate_host
+
+from .models import Document
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_PATH = re.compile(r'^/ws/documents/(?P<document_id>\d+)/$')
+
+# 연결별 대기 이벤트 수 상한 (넘치면 버리고 클라이언트에 전체 재동기화를 요청)
+QUEUE_SIZE = 256
+
+
+class Channel:
+    """구독 연결 하나의 이벤트 큐와 그 큐를 소유한 이벤트 루프"""
+
+    def __init__(self, capacity):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(capacity)
+
+
+class InMemoryChannelLayer:
+    """단일 프로세스용 그룹 브로드캐스트
+
+    group_send 는 요청을 처리하는 동기 뷰 스레드에서도 호출되므로,
+    각 구독 큐에는 해당 이벤트 루프의 call_soon_threadsafe 로 넣는다.
+    """
+
+    def __init__(self, capacity=QUEUE_SIZE):
+        self.capacity = capacity
+        self.groups = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def group_add(self, group):
+        channel = Channel(self.capacity)
+        with self.lock:
+            self.groups[group].add(channel)
+        return channel
+
+    def group_discard(self, group, channel):
+        with self.lock:
+            self.groups[group].discard(channel)
+            if not self.groups[group]:
+                del self.groups[group]
+
+    def group_size(self, group):
+        with self.lock:
+            return len(self.groups.get(group, ()))
+
+    def group_send(self, group, message):
+        with self.lock:
+            channels = list(self.groups.get(group, ()))
+        for channel in channels:
+            try:
+                channel.loop.call_soon_threadsafe(self._deliver, channel.queue, message)
+            except RuntimeError:
+                # 이벤트 루프가 이미 종료된 연결
+                self.group_discard(group, channel)
+
+    @staticmethod
+    def _deliver(queue, message):
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            message = {'event': 'resync'}
+        queue.put_nowait(message)
+
+
+channel_layer = InMemoryChannelLayer()
+
+
+def document_group(document_id):
+    return f'document.{document_id}'
+
+
+def _tag_event(document_id, event, tags=None, deleted_ids=None, document_info=None, user=None):
+    message = {'event': event, 'document_id': document_id}
+    if tags is not None:
+        message['tags'] = tags
+    if deleted_ids is not None:
+        message['deleted_ids'] = deleted_ids
+    if document_info is not None:
+        message['document_info'] = document_info
+    if user is not None:
+        message['user'] = user.username
+    return message
+
+
+def broadcast_tag_event(document_id, event, **kwargs):
+    """문서 구독자에게 태그 변경 이벤트 발행 (현재 트랜잭션이 커밋된 뒤 전송)"""
+    message = _tag_event(document_id, event, **kwargs)
+    transaction.on_commit(lambda: channel_layer.group_send(document_group(document_id), message))
+
+
+async def abroadcast_tag_event(document_id, event, **kwargs):
+    """async 뷰용 이벤트 발행 (async ORM 호출은 각각 autocommit 으로 끝나므로 바로 전송)"""
+    channel_layer.group_send(document_group(document_id), _tag_event(document_id, event, **kwargs))
+
+
+# --- ASGI WebSocket 애플리케이션 ---
+
+def _headers(scope):
+    return {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope.get('headers', [])}
+
+
+def _origin_allowed(headers):
+    """다른 사이트에서 연 WebSocket 연결 차단 (Origin 호스트를 ALLOWED_HOSTS 로 검사)"""
+    origin = headers.get('origin')
+    if not origin:
+        return True
+    host, _ = split_domain_port(urlparse(origin).netloc)
+    allowed_hosts = settings.ALLOWED_HOSTS or (['.localhost', '127.0.0.1', '[::1]'] if settings.DEBUG else [])
+    return bool(host) and validate_host(host, allowed_hosts)
+
+
+def _authorize(headers, document_id):
+    """세션 쿠키의 사용자가 문서를 볼 수 있는지 확인 (작성자 또는 staff)"""
+    cookie = SimpleCookie()
+    cookie.load(headers.get('cookie', ''))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    user = get_user(SimpleNamespace(session=session))
+    if not user.is_authenticated:
+        return None
+    documents = Document.objects.filter(id=document_id)
+    if not user.is_staff:
+        documents = documents.filter(created_by=user)
+    return user if documents.exists() else None
+
+
+async def websocket_application(scope, receive, send):
+    """문서 태그 이벤트 구독 WebSocket"""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    match = DOCUMENT_PATH.match(scope['path'])
+    if not match:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    headers = _headers(scope)
+    document_id = int(match.group('document_id'))
+    if not _origin_allowed(headers):
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+    user = await sync_to_async(_authorize)(headers, document_id)
+    if user is None:
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    group = document_group(document_id)
+    channel = channel_layer.group_add(group)
+    await send({'type': 'websocket.accept'})
+    receiving = asyncio.ensure_future(receive())
+    forwarding = asyncio.ensure_future(channel.queue.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({receiving, forwarding}, return_when=asyncio.FIRST_COMPLETED)
+            if forwarding in done:
+                await send({'type': 'websocket.send', 'text': json.dumps(forwarding.result(), ensure_ascii=False)})
+                forwarding = asyncio.ensure_future(channel.queue.get())
+            if receiving in done:
+                incoming = receiving.result()
+                if incoming['type'] == 'websocket.disconnect':
+                    break
+                if incoming.get('text') == 'ping':
+                    await send({'type': 'websocket.send', 'text': 'pong'})
+                receiving = asyncio.ensure_future(receive())
+    finally:
+        receiving.cancel()
+        forwarding.cancel()
+        channel_layer.group_discard(group, channel)
+        logger.debug('문서 %s 구독 종료 (%s)', document_id, user.username)
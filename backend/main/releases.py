@@ -0,0 +1,164 @@
+"""
+변경되지 않는 데이터셋 릴리스
+
+필터링한 문서 집합을 한 트랜잭션 스냅샷에서 읽어(PostgreSQL 은 REPEATABLE READ, READ ONLY)
+RELEASE_ROOT/<name>/ 아래에 다음을 기록합니다.
+
+- part-00000.jsonl.gz ...: download_jsonl 과 같은 형식의 문서 줄을 문서 id 순으로 shard_size 개씩 (gzip/zstd 압축)
+- manifest.json: 샤드별 문서/태그 수, 바이트 수, SHA-256 과 전체 합계, 필터, 압축 형식
+
+파일은 임시 디렉터리에 모두 쓴 뒤 읽기 전용으로 바꾸고 이름을 바꾸어 한 번에 공개하므로, 완료된
+릴리스 디렉터리는 내용이 바뀌지 않습니다. 내려받기는 release_file 뷰가 권한을 확인한 뒤
+X-Accel-Redirect 로 nginx 에 넘겨 sendfile 로 전송합니다 (RELEASE_ACCEL_REDIRECT 가 비면 FileResponse).
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import stat
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from . import export
+from .export import COMPRESSIONS, GZIP, ZSTD, ShardWriter, read_chunks
+from .models import DatasetRelease
+
+NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,99}$')
+FORMAT = 'jsonl'
+
+# 릴리스 줄의 entities 항목 (download_jsonl 과 같은 키, 오프셋은 코드 포인트)
+ENTITY_FIELDS = (
+    ('span_text', 'span_text'),
+    ('entity_type', 'pii_category__value'),
+    ('start_offset', 'start_offset'),
+    ('end_offset', 'end_offset'),
+    ('span_id', 'span_id'),
+    ('entity_id', 'entity_id'),
+    ('annotator', 'annotator'),
+    ('identifier_type', 'identifier_type'),
+)
+SPAN_FIELDS = tuple(field for _, field in ENTITY_FIELDS)
+
+READ_ONLY_FILE = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+READ_ONLY_DIRECTORY = READ_ONLY_FILE | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+
+
+def validate_name(name):
+    """릴리스 이름 검사 (경로로 쓰이므로 영문/숫자/.-_ 만 허용, 잘못된 값은 ValueError)"""
+    if not name or not NAME_PATTERN.match(name):
+        raise ValueError('릴리스 이름은 영문/숫자로 시작하고 영문, 숫자, ".", "-", "_" 만 쓸 수 있습니다 (100자 이하).')
+    return name
+
+
+def release_directory(name):
+    return os.path.join(settings.RELEASE_ROOT, name)
+
+
+@contextmanager
+def snapshot():
+    """블록 안의 읽기가 모두 같은 시점의 데이터를 보도록 트랜잭션 하나로 묶음"""
+    with transaction.atomic():
+        if connection.vendor == 'postgresql' and len(connection.atomic_blocks) == 1:
+            # 트랜잭션의 첫 문장이어야 한다 (바깥 트랜잭션 안이면 그 트랜잭션의 격리 수준을 따른다)
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        yield
+
+
+def release_line(metadata, text, spans):
+    return json.dumps({
+        'metadata': metadata,
+        'text': text,
+        'entities': [{key: value for (key, _), value in zip(ENTITY_FIELDS, span)} for span in spans],
+    }, ensure_ascii=False) + '\n'
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_shards(directory, documents, compression, shard_size):
+    """스냅샷에서 문서를 읽어 샤드로 기록하고 샤드 목록 반환"""
+    writer = ShardWriter(directory, FORMAT, shard_size, compression)
+    try:
+        with snapshot():
+            for rows in read_chunks(documents, settings.EXPORT_CHUNK_SIZE, SPAN_FIELDS):
+                for metadata, text, spans in rows:
+                    writer.write(release_line(metadata, text, spans), tags=len(spans))
+    finally:
+        writer.close()
+    for shard in writer.shards:
+        path = os.path.join(directory, shard['file'])
+        shard['bytes'] = os.path.getsize(path)
+        shard['sha256'] = _file_digest(path)
+    return writer.shards
+
+
+def build_release(name, user, documents, filters=None, compression=GZIP, shard_size=None):
+    """documents 를 릴리스 name 으로 기록하고 완료된 DatasetRelease 반환
+
+    이름이 잘못되었거나 이미 있으면 ValueError. 기록 중 오류가 나면 릴리스를 실패로 남기고 예외를 다시 던진다.
+    """
+    validate_name(name)
+    if compression not in (None, *COMPRESSIONS):
+        raise ValueError(f"알 수 없는 압축 형식입니다: {compression} ({', '.join(COMPRESSIONS)} 중 하나)")
+    if compression == ZSTD and export.zstandard is None:
+        raise ValueError('zstd 압축에는 zstandard 패키지가 필요합니다.')
+    shard_size = shard_size or settings.RELEASE_SHARD_SIZE
+    if shard_size <= 0:
+        raise ValueError('샤드 크기는 1 이상이어야 합니다.')
+
+    directory = release_directory(name)
+    if os.path.exists(directory):
+        raise ValueError(f"'{name}' 릴리스 디렉터리가 이미 있습니다.")
+    try:
+        release = DatasetRelease.objects.create(
+            name=name, created_by=user, compression=compression or '', filters=filters or {},
+        )
+    except IntegrityError:
+        raise ValueError(f"'{name}' 릴리스가 이미 있습니다.")
+
+    os.makedirs(settings.RELEASE_ROOT, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f'.{name}-', dir=settings.RELEASE_ROOT)
+    try:
+        shards = _write_shards(staging, documents, compression, shard_size)
+        manifest = {
+            'name': name,
+            'created_at': release.created_at.isoformat(),
+            'created_by': user.username,
+            'filters': release.filters,
+            'format': FORMAT,
+            'compression': compression,
+            'offset_unit': 'codepoint',
+            'document_count': sum(shard['documents'] for shard in shards),
+            'tag_count': sum(shard['tags'] for shard in shards),
+            'shards': shards,
+        }
+        with open(os.path.join(staging, DatasetRelease.MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        for filename in os.listdir(staging):
+            os.chmod(os.path.join(staging, filename), READ_ONLY_FILE)
+        os.chmod(staging, READ_ONLY_DIRECTORY)
+        os.rename(staging, directory)
+    except Exception as e:
+        if os.path.isdir(staging):
+            os.chmod(staging, stat.S_IRWXU)
+            shutil.rmtree(staging, ignore_errors=True)
+        DatasetRelease.objects.filter(id=release.id).update(status=DatasetRelease.FAILED, message=str(e))
+        raise
+
+    release.status = DatasetRelease.READY
+    release.manifest = manifest
+    release.document_count = manifest['document_count']
+    release.tag_count = manifest['tag_count']
+    release.save(update_fields=['status', 'manifest', 'document_count', 'tag_count'])
+    return release
@@ -0,0 +1,126 @@
+"""
+문서 본문/태그 스팬 검색
+
+PostgreSQL 에서는 pg_trgm GIN 인덱스(부분 문자열 ILIKE)와 tsvector GIN 인덱스(단어 검색)를,
+로컬 SQLite 에서는 FTS5(trigram 토크나이저) 가상 테이블을 사용합니다.
+인덱스가 없는 환경에서는 일반 icontains 검색으로 동작합니다.
+
+Django 의 icontains 는 PostgreSQL 에서 ``UPPER(col::text) LIKE UPPER(%s)`` 로 컴파일되어 컬럼에 만든
+gin_trgm_ops 인덱스를 쓰지 못하므로, 부분 문자열 검색은 ``col ILIKE %s`` 를 내는 trigram_icontains 를 쓴다.
+
+문서 본문은 main_documentbody 에 있으므로 본문 인덱스도 그 테이블에 만들고 문서는 body_id 로 거릅니다.
+인덱스는 마이그레이션(태그: 0004_search_indexes, 본문: 0014_documentbody_search_indexes)이 만들며,
+SQLite 에서 테이블을 재생성하는 이후 마이그레이션은 FTS 트리거를 직접 다시 만들어야 합니다
+(마이그레이션은 이 모듈을 import 하지 않고 그 시점의 SQL 을 그대로 담습니다).
+"""
+
+from django.db import connection as default_connection
+from django.db.models import CharField, Q, TextField
+from django.db.models.expressions import RawSQL
+from django.db.models.lookups import IContains
+
+# FTS5 trigram 토크나이저는 3글자 미만 질의를 찾지 못한다
+FTS_MIN_QUERY_LENGTH = 3
+
+# (FTS 테이블, 원본 테이블, 컬럼)
+SQLITE_FTS_TABLES = [
+    ('main_documentbody_fts', 'main_documentbody', 'text'),
+    ('main_piitag_fts', 'main_piitag', 'span_text'),
+]
+
+
+_sqlite_fts_cache = {}
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class TrigramContains(IContains):
+    """pg_trgm 인덱스를 타는 대소문자 무시 부분 문자열 검색 (PostgreSQL 외에는 icontains 와 같다)"""
+
+    lookup_name = 'trigram_icontains'
+
+    def as_sql(self, compiler, connection):
+        return IContains(self.lhs, self.rhs).as_sql(compiler, connection)
+
+    def as_postgresql(self, compiler, connection):
+        if not self.rhs_is_direct_value():
+            return self.as_sql(compiler, connection)
+        # lookup_name 이 icontains 가 아니므로 lhs 에 UPPER(...::text) 가 붙지 않는다
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', (*lhs_params, *rhs_params)
+
+
+def search_backend(connection=default_connection):
+    """현재 DB 의 검색 방식 ('postgresql', 'fts5', 'basic')"""
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        key = connection.settings_dict['NAME']
+        if key not in _sqlite_fts_cache:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (%s, %s)",
+                    [name for name, _, _ in SQLITE_FTS_TABLES],
+                )
+                _sqlite_fts_cache[key] = cursor.fetchone()[0] == len(SQLITE_FTS_TABLES)
+        if _sqlite_fts_cache[key]:
+            return 'fts5'
+    return 'basic'
+
+
+def _fts_phrase(query):
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _fts_filter(fts_table, query, field='id'):
+    return Q(**{f'{field}__in': RawSQL(
+        f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s', (_fts_phrase(query),)
+    )})
+
+
+def filter_documents_by_text(documents, query):
+    """본문에 query 가 부분 문자열로 포함된 문서"""
+    if search_backend() == 'fts5' and len(query) >= FTS_MIN_QUERY_LENGTH:
+        return documents.filter(_fts_filter('main_documentbody_fts', query, field='body_id'))
+    # PostgreSQL 에서는 ILIKE 를 0014 의 pg_trgm 인덱스가 처리한다
+    return documents.filter(body__text__trigram_icontains=query)
+
+
+def filter_documents_by_words(documents, query):
+    """본문에 query 의 모든 단어가 포함된 문서 (PostgreSQL 은 tsvector 인덱스 사용)"""
+    backend = search_backend()
+    if backend == 'postgresql':
+        return documents.filter(body_id__in=RawSQL(
+            "SELECT id FROM main_documentbody WHERE to_tsvector('simple', text) @@ plainto_tsquery('simple', %s)",
+            (query,),
+        ))
+    condition = Q()
+    for word in query.split():
+        if backend == 'fts5' and len(word) >= FTS_MIN_QUERY_LENGTH:
+            condition &= _fts_filter('main_documentbody_fts', word, field='body_id')
+        else:
+            condition &= Q(body__text__trigram_icontains=word)
+    return documents.filter(condition)
+
+
+def filter_tags_by_span(tags, query, exact=False):
+    """span_text 로 태그 검색 (exact=True 이면 완전 일치)"""
+    if exact:
+        return tags.filter(span_text=query)
+    if search_backend() == 'fts5' and len(query) >= FTS_MIN_QUERY_LENGTH:
+        return tags.filter(_fts_filter('main_piitag_fts', query))
+    return tags.filter(span_text__trigram_icontains=query)
+
+
+def make_snippet(text, query, width=40):
+    """query 주변 문맥 미리보기"""
+    position = text.casefold().find(query.casefold()) if query else -1
+    if position < 0:
+        first_word = query.split()[0] if query.split() else ''
+        position = text.casefold().find(first_word.casefold()) if first_word else -1
+    if position < 0:
+        return text[:width * 2]
+    start = max(position - width, 0)
+    end = min(position + len(query) + width, len(text))
+    return ('…' if start else '') + text[start:end] + ('…' if end < len(text) else '')
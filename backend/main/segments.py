@@ -0,0 +1,75 @@
+"""
+긴 문서의 구간(segment) 분할
+
+본문을 문단 경계 중심으로 일정 크기의 구간으로 나누어, 에디터가 화면에 보이는 구간만
+/api/documents/<id>/window/ 로 불러와 렌더링하게 합니다. 오프셋은 항상 문서 전체 기준입니다.
+
+구간 경계는 본문에만 의존하므로 본문 digest 별로 Django 캐시에 저장합니다.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULT_SEGMENT_SIZE = 2000
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _find_boundary(text, start, size):
+    """start 이후 size 글자 근처의 구간 끝 (문단 > 문장 > 공백 > 강제 절단 순으로 선호)"""
+    target = start + size
+    low = start + size // 2
+    high = min(start + size * 2, len(text))
+    for separator in ('\n', '. ', ' '):
+        # 목표 위치 앞쪽에서 가장 가까운 경계, 없으면 뒤쪽에서 가장 가까운 경계
+        position = text.rfind(separator, low, target)
+        if position < 0:
+            position = text.find(separator, target, high)
+        if position >= 0:
+            return position + len(separator)
+    return target
+
+
+def split_segments(text, size=DEFAULT_SEGMENT_SIZE):
+    """본문을 [(start, end), ...] 구간으로 분할"""
+    segments = []
+    start = 0
+    while start < len(text):
+        if len(text) - start <= size:
+            end = len(text)
+        else:
+            end = _find_boundary(text, start, size)
+        segments.append((start, end))
+        start = end
+    return segments
+
+
+def segment_size():
+    return getattr(settings, 'DOCUMENT_SEGMENT_SIZE', DEFAULT_SEGMENT_SIZE)
+
+
+def document_segments(document):
+    """문서 본문의 구간 목록 (본문 digest 기준 캐시)"""
+    size = segment_size()
+    key = f'segments:{document.body.digest}:{size}'
+    segments = cache.get(key)
+    if segments is None:
+        segments = split_segments(document.text, size)
+        cache.set(key, segments, CACHE_TIMEOUT)
+    return segments
+
+
+def is_segmented(document):
+    """화면에 본문 전체를 그리지 않고 구간 단위로 불러올 문서인지"""
+    threshold = getattr(settings, 'DOCUMENT_SEGMENT_THRESHOLD', DEFAULT_SEGMENT_SIZE * 10)
+    return len(document.text) > threshold
+
+
+def count_tags_per_segment(segments, tag_starts):
+    """정렬된 태그 시작 오프셋 목록으로 구간별 태그 수 계산"""
+    counts = [0] * len(segments)
+    index = 0
+    for start in tag_starts:
+        while index < len(segments) - 1 and start >= segments[index][1]:
+            index += 1
+        counts[index] += 1
+    return counts
@@ -0,0 +1,99 @@
+"""
+스팬/텍스트 검색 유틸리티
+
+- AhoCorasick: 여러 패턴을 텍스트 한 번 순회로 찾는 오토마톤
+- SpanIndex: 겹침 검사용 정렬 구간 집합
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+
+class AhoCorasick:
+    """여러 패턴을 텍스트 한 번 순회로 찾는 Aho-Corasick 오토마톤
+
+    add() 로 패턴을 등록하고 build() 후 finditer() 로 (start, end, payload) 를 얻는다.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._built = False
+
+    def add(self, pattern, payload=None):
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append((len(pattern), pattern if payload is None else payload))
+        self._built = False
+
+    def build(self):
+        goto, fail, output = self._goto, self._fail, self._output
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                if state:
+                    fallback = fail[state]
+                    while fallback and char not in goto[fallback]:
+                        fallback = fail[fallback]
+                    fail[next_state] = goto[fallback].get(char, 0)
+                output[next_state] = output[next_state] + output[fail[next_state]]
+        self._built = True
+        return self
+
+    def __len__(self):
+        return len(self._goto) - 1
+
+    def finditer(self, text):
+        if not self._built:
+            self.build()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in output[state]:
+                yield index + 1 - length, index + 1, payload
+
+
+class SpanIndex:
+    """겹침 검사용 정렬 구간 집합
+
+    [start, end) 반개구간을 보관하며, 서로 겹치는 구간은 병합해 두므로
+    overlaps() 는 이분 탐색 한 번으로 판정된다.
+    """
+
+    def __init__(self, spans=()):
+        self._starts = []
+        self._ends = []
+        for start, end in spans:
+            self.add(start, end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def overlaps(self, start, end):
+        index = bisect_left(self._starts, end)
+        return index > 0 and self._ends[index - 1] > start
+
+    def add(self, start, end):
+        low = bisect_left(self._ends, start)
+        high = bisect_right(self._starts, end)
+        if low < high:
+            start = min(start, self._starts[low])
+            end = max(end, self._ends[high - 1])
+        self._starts[low:high] = [start]
+        self._ends[low:high] = [end]
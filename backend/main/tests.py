@@ -1,3 +1,1306 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import stat
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection, transaction
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .adjudication import adjudicate_corpus, merge_annotations
+from .agreement import align_partial, compute_agreement
+from .conll import align_labels, conll_chunk, get_tokenizer
+from .consistency import analyze_document, check_consistency, validate_rules
+from .db_router import REPLICA_PIN_COOKIE, ReplicaRouter, is_pinned, read_replica, use_read_replica
+from .deidentify import DEFAULT_RULES, KEEP, REDACT, deidentify_text
+from .middleware import QueryProfilingMiddleware, _profile_buffer, fingerprint_sql, get_recent_profiles
+from .importer import OVERWRITE, SKIP, UPSERT, ImportRejected, import_documents
+from .models import (
+    DatasetRelease, Document, DocumentBody, DocumentQuerySet, Entity, LabelCount, PIICategory, PIITag, ReviewItem,
+)
+from .offsets import UTF8, UTF16, OffsetMap
+from .releases import build_release
+from .realtime import channel_layer, document_group, websocket_application
+from .search import filter_documents_by_text, filter_tags_by_span
+from .propagation import normalize_text, propagate_tags
+from .segments import split_segments
+from .preannotation import DictionaryDetector, RegexDetector, detect_pii, preannotate_documents
+from .spans import AhoCorasick, SpanIndex
+
+
+def create_user(username='annotator', **fields):
+    return User.objects.create_user(username, **fields)
+
+
+def create_category(value='PERSON'):
+    return PIICategory.objects.create(value=value, background_color='#000000')
+
+
+def create_document(user, data_id, text, **fields):
+    """메타데이터를 기본값으로 채운 테스트 문서"""
+    fields.setdefault('provenance', {})
+    return Document.objects.create(data_id=data_id, number_of_subjects='1', text=text, created_by=user, **fields)
+
+
+class QueryCountTests(TestCase):
+    """뷰 쿼리 수가 문서/태그 수에 비례해 늘어나지 않는지 확인"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(password='password')
+        cls.categories = [create_category(value) for value in ('PERSON', 'LOC', 'CODE')]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _create_document(self, data_id, tag_count):
+        document = create_document(self.user, data_id, '가나다라 ' * (tag_count + 1))
+        PIITag.objects.bulk_create([
+            PIITag(
+                document=document,
+                pii_category=self.categories[index % len(self.categories)],
+                span_text='가나다라',
+                start_offset=index * 5,
+                end_offset=index * 5 + 4,
+                span_id=str(index + 1),
+                entity_id=str(index + 1),
+                created_by=self.user,
+            )
+            for index in range(tag_count)
+        ])
+        return document
+
+    def _count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_document_detail_queries_independent_of_tag_count(self):
+        small = self._create_document('small', 1)
+        large = self._create_document('large', 30)
+        small_queries = self._count_queries('get', reverse('document_detail', args=[small.pk]))
+        large_queries = self._count_queries('get', reverse('document_detail', args=[large.pk]))
+        self.assertEqual(small_queries, large_queries)
+        self.assertLessEqual(large_queries, 10)
+
+    def test_document_list_queries_independent_of_document_count(self):
+        self._create_document('doc-1', 3)
+        few_queries = self._count_queries('get', reverse('document_list'))
+        for index in range(2, 12):
+            self._create_document(f'doc-{index}', 3)
+        many_queries = self._count_queries('get', reverse('document_list'))
+        self.assertEqual(few_queries, many_queries)
+
+    def test_download_jsonl_queries_independent_of_document_count(self):
+        few = [self._create_document('doc-1', 3).pk]
+        few_queries = self._count_queries('post', reverse('download_jsonl'), {'document_ids': few})
+        many = few + [self._create_document(f'doc-{index}', 5).pk for index in range(2, 12)]
+        many_queries = self._count_queries('post', reverse('download_jsonl'), {'document_ids': many})
+        self.assertEqual(few_queries, many_queries)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """요청 프로파일링 미들웨어 (쿼리 기록, 링버퍼, Server-Timing, 임계값 경고)"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        _profile_buffer.clear()
+
+    def _view(self, query_count):
+        def view(request):
+            for _ in range(query_count):
+                User.objects.filter(username='nobody').exists()
+            return HttpResponse('ok')
+        return view
+
+    def test_fingerprint_groups_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint_sql("SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s, %s) LIMIT 21"),
+            'SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?',
+        )
+
+    @override_settings(QUERY_PROFILING_THRESHOLD=2)
+    def test_records_profile_and_server_timing(self):
+        response = QueryProfilingMiddleware(self._view(3))(self.factory.get('/documents/'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="3 queries"', response['Server-Timing'])
+        self.assertIn('dup;desc="3 duplicated queries"', response['Server-Timing'])
+        self.assertNotIn('mem;', response['Server-Timing'])
+        [profile] = get_recent_profiles()
+        self.assertEqual((profile['path'], profile['query_count']), ('/documents/', 3))
+        self.assertEqual(profile['duplicate_queries'][0]['count'], 3)
+        self.assertIsNone(profile['peak_memory_kb'])
+
+    @override_settings(QUERY_PROFILING_THRESHOLD=2)
+    def test_threshold_logs_warning(self):
+        middleware = QueryProfilingMiddleware(self._view(2))
+        with self.assertNoLogs('main.middleware', level='WARNING'):
+            middleware(self.factory.get('/few/'))
+        middleware = QueryProfilingMiddleware(self._view(3))
+        with self.assertLogs('main.middleware', level='WARNING') as logs:
+            middleware(self.factory.get('/many/'))
+        self.assertIn('/many/', logs.output[0])
+
+    def test_excluded_paths_are_not_profiled(self):
+        response = QueryProfilingMiddleware(self._view(1))(self.factory.get('/static/app.css'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(get_recent_profiles(), [])
+
+    def test_ring_buffer_keeps_latest_profiles(self):
+        middleware = QueryProfilingMiddleware(self._view(0))
+        for index in range(_profile_buffer.maxlen + 5):
+            middleware(self.factory.get(f'/page/{index}/'))
+        profiles = get_recent_profiles()
+        self.assertEqual(len(profiles), _profile_buffer.maxlen)
+        self.assertEqual(profiles[-1]['path'], f'/page/{_profile_buffer.maxlen + 4}/')
+
+    @override_settings(QUERY_PROFILING_TRACE_MEMORY=True)
+    def test_memory_tracing_is_scoped_to_the_request(self):
+        self.assertFalse(tracemalloc.is_tracing())
+        response = QueryProfilingMiddleware(self._view(0))(self.factory.get('/documents/'))
+        self.assertIn('mem;desc="peak', response['Server-Timing'])
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+class PreannotationTests(TestCase):
+    """정규식/사전 탐지기와 제안 태그 생성"""
+
+    TEXT = '김민준(010-1234-5678, minjun@example.com)은 서울특별시 강남구에 산다.'
+
+    def test_aho_corasick_finds_overlapping_patterns(self):
+        automaton = AhoCorasick()
+        for word in ('he', 'she', 'his', 'hers'):
+            automaton.add(word)
+        self.assertEqual(
+            sorted(automaton.finditer('ushers')),
+            [(1, 4, 'she'), (2, 4, 'he'), (2, 6, 'hers')],
+        )
+
+    def test_span_index_merges_overlapping_spans(self):
+        index = SpanIndex([(0, 5), (10, 15), (4, 8)])
+        self.assertTrue(index.overlaps(7, 9))
+        self.assertFalse(index.overlaps(8, 10))
+        self.assertFalse(index.overlaps(15, 20))
+
+    def test_detect_pii_resolves_overlaps(self):
+        detectors = [RegexDetector(), DictionaryDetector({'PERSON': ['김민준', '민준'], 'LOC': ['서울특별시 강남구']})]
+        found = [(s.text, s.kind) for s in detect_pii(self.TEXT, detectors)]
+        self.assertEqual(found, [
+            ('김민준', 'PERSON'),
+            ('010-1234-5678', 'mobile'),
+            ('minjun@example.com', 'email'),
+            ('서울특별시 강남구', 'LOC'),
+        ])
+
+    def test_preannotate_documents_skips_existing_tags(self):
+        user = create_user()
+        code = create_category('CODE')
+        document = create_document(user, 'doc', self.TEXT)
+        PIITag.objects.create(
+            document=document, pii_category=code, span_text='010-1234-5678',
+            start_offset=4, end_offset=17, span_id='1', entity_id='1', created_by=user,
+        )
+        summary = preannotate_documents(Document.objects.all(), user)
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual(summary['skipped_overlap'], 1)
+        tag = PIITag.objects.get(span_text='minjun@example.com')
+        self.assertEqual(tag.span_id, '2')
+        self.assertEqual(tag.identifier_type, 'DIRECT')
+        self.assertGreater(tag.confidence, 0)
+
+
+class PropagationTests(TestCase):
+    """태그 전파 (같은 텍스트의 다른 출현 위치 일괄 태깅)"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.person = create_category()
+
+    def test_normalize_text_maps_back_to_original_offsets(self):
+        normalized, origins = normalize_text('ＨＯＮＧ  Gil')
+        self.assertEqual(normalized, 'hong gil')
+        self.assertEqual(origins[5], 6)
+
+    def test_propagate_tags_across_corpus(self):
+        source_document = create_document(self.user, 'a', '홍길동은 홍길동이다.')
+        other_document = create_document(self.user, 'b', '어제 홍길동과 홍길동을 만났다')
+        source = PIITag.objects.create(
+            document=source_document, pii_category=self.person, span_text='홍길동',
+            start_offset=0, end_offset=3, span_id='1', entity_id='1', created_by=self.user,
+        )
+        created = propagate_tags([source], Document.objects.filter(created_by=self.user), self.user)
+        self.assertEqual(len(created), 3)
+        same_document = [tag for tag in created if tag.document_id == source_document.id]
+        self.assertEqual([(tag.start_offset, tag.entity_id) for tag in same_document], [(5, '1')])
+        other = sorted(
+            (tag for tag in created if tag.document_id == other_document.id), key=lambda tag: tag.start_offset
+        )
+        self.assertEqual([(tag.span_id, tag.entity_id) for tag in other], [('1', '1'), ('2', '1')])
+        # 다시 전파하면 기존 태그와 겹치므로 생성되지 않는다
+        self.assertEqual(propagate_tags([source], Document.objects.all(), self.user), [])
+
+    def test_propagate_tags_respects_word_boundaries(self):
+        document = create_document(self.user, 'a', '홍길동 김홍길동 홍길동은 홍길동전 Kim Kimberly 홍길동2')
+        source = PIITag.objects.create(
+            document=document, pii_category=self.person, span_text='홍길동',
+            start_offset=0, end_offset=3, span_id='1', entity_id='1', created_by=self.user,
+        )
+        latin = PIITag.objects.create(
+            document=document, pii_category=self.person, span_text='Kim',
+            start_offset=19, end_offset=22, span_id='2', entity_id='2', created_by=self.user,
+        )
+        created = propagate_tags([source, latin], Document.objects.all(), self.user)
+        # 앞에 글자가 붙은 '김홍길동', 라틴 문자/숫자가 이어지는 'Kimberly', '홍길동2' 는 제외하고
+        # 뒤에 붙은 한글('홍길동은', '홍길동전')은 기본적으로 허용한다
+        self.assertEqual(sorted((tag.start_offset, tag.span_text) for tag in created), [(9, '홍길동'), (14, '홍길동')])
+
+        PIITag.objects.filter(id__in=[tag.id for tag in created]).delete()
+        # whole_word 이면 조사와 합성어도 제외한다
+        self.assertEqual(propagate_tags([source], Document.objects.all(), self.user, whole_word=True), [])
+
+
+class SearchTests(TestCase):
+    """검색 API (SQLite 에서는 FTS5 인덱스 사용)"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_login(self.user)
+        person = create_category()
+        self.document = create_document(self.user, 'doc', '어제 홍길동 님과 서울에서 만났다.')
+        create_document(self.user, 'other', '관련 없는 문서')
+        PIITag.objects.create(
+            document=self.document, pii_category=person, span_text='홍길동',
+            start_offset=3, end_offset=6, span_id='1', entity_id='1', created_by=self.user,
+        )
+
+    def _search(self, **params):
+        response = self.client.get(reverse('search'), params)
+        self.assertTrue(response.json()['success'])
+        return response.json()['results']
+
+    def test_search_document_text(self):
+        results = self._search(q='홍길동 님과')
+        self.assertEqual([result['data_id'] for result in results], ['doc'])
+        self.assertIn('홍길동', results[0]['snippet'])
+
+    def test_search_updated_text_is_reindexed(self):
+        self.document.text = '새로운 본문 내용'
+        self.document.save(update_fields=['body'])
+        self.assertEqual(self._search(q='홍길동 님과'), [])
+        self.assertEqual(len(self._search(q='새로운 본문')), 1)
+
+    def test_search_by_category_and_value(self):
+        results = self._search(mode='category', category='PERSON', q='홍길동', exact='1')
+        self.assertEqual([(result['data_id'], result['start']) for result in results], [('doc', 3)])
+        self.assertEqual(self._search(mode='category', category='LOC', q='홍길동'), [])
+
+    def test_substring_search_uses_ilike_on_postgresql(self):
+        # icontains 의 UPPER(col::text) LIKE 는 gin_trgm_ops 인덱스를 쓰지 못한다
+        postgresql = PostgresDatabaseWrapper(
+            dict(connection.settings_dict, ENGINE='django.db.backends.postgresql'), alias='postgresql',
+        )
+        for queryset, column in (
+            (filter_documents_by_text(Document.objects.all(), '길동'), '"main_documentbody"."text"'),
+            (filter_tags_by_span(PIITag.objects.all(), '길동'), '"main_piitag"."span_text"'),
+        ):
+            sql, params = queryset.query.get_compiler(connection=postgresql).as_sql()
+            self.assertIn(f'{column} ILIKE %s', sql)
+            self.assertNotIn('UPPER', sql)
+            self.assertEqual(params[-1], '%길동%')
+        self.assertEqual(list(filter_documents_by_text(Document.objects.all(), '길동')), [self.document])
+        self.assertEqual(filter_tags_by_span(PIITag.objects.all(), '50%').count(), 0)
+
+
+class AgreementTests(TestCase):
+    """data_id 를 공유하는 주석자 간 일치도"""
+
+    def setUp(self):
+        self.person = create_category()
+        self.loc = create_category('LOC')
+
+    def _annotate(self, username, spans):
+        user = create_user(username)
+        document = create_document(user, 'shared', '가' * 20)
+        for start, end, category in spans:
+            PIITag.objects.create(
+                document=document, pii_category=category, span_text='가' * (end - start),
+                start_offset=start, end_offset=end, created_by=user,
+            )
+
+    def test_align_partial_matches_overlapping_spans_once(self):
+        spans_a = [(0, 3, 'PERSON'), (5, 8, 'LOC')]
+        spans_b = [(1, 3, 'PERSON'), (2, 4, 'PERSON'), (6, 9, 'LOC')]
+        self.assertEqual(
+            align_partial(spans_a, spans_b),
+            [((0, 3, 'PERSON'), (1, 3, 'PERSON')), ((5, 8, 'LOC'), (6, 9, 'LOC'))],
+        )
+
+    def test_align_partial_is_not_blocked_by_other_categories(self):
+        # 다른 카테고리의 긴 스팬 (0, 8, LOC) 때문에 PERSON 쌍을 놓치지 않는다
+        spans_a = [(0, 5, 'PERSON'), (6, 10, 'LOC')]
+        spans_b = [(0, 8, 'LOC'), (2, 4, 'PERSON')]
+        self.assertEqual(
+            align_partial(spans_a, spans_b),
+            [((0, 5, 'PERSON'), (2, 4, 'PERSON')), ((6, 10, 'LOC'), (0, 8, 'LOC'))],
+        )
+
+    def test_compute_agreement_per_category(self):
+        self._annotate('alice', [(0, 3, self.person), (5, 8, self.loc)])
+        self._annotate('bob', [(0, 3, self.person), (5, 9, self.loc)])
+        result = compute_agreement(Document.objects.all())
+        self.assertEqual(result['documents'], 1)
+        self.assertEqual(result['pairs'], 1)
+        self.assertEqual(result['categories']['PERSON']['exact']['f1'], 1.0)
+        self.assertEqual(result['categories']['PERSON']['kappa'], 1.0)
+        self.assertEqual(result['categories']['LOC']['exact']['f1'], 0.0)
+        self.assertEqual(result['categories']['LOC']['partial']['f1'], 1.0)
+        self.assertLess(result['categories']['LOC']['kappa'], 1.0)
+
+    def test_agreement_api_requires_staff(self):
+        self._annotate('alice', [(0, 3, self.person)])
+        self.client.force_login(User.objects.get(username='alice'))
+        self.assertEqual(self.client.get(reverse('agreement')).status_code, 403)
+
+
+class AdjudicationTests(TestCase):
+    """투표 병합과 gold 문서 생성"""
+
+    def test_merge_annotations_strategies(self):
+        annotations = [
+            [(0, 3, 1, '1', 'DIRECT'), (5, 8, 2, '2', 'QUASI'), (10, 13, 1, '1', 'DIRECT')],
+            [(0, 3, 1, '1', 'DIRECT'), (5, 9, 2, '2', 'QUASI'), (10, 13, 1, '1', 'DIRECT')],
+            [(0, 3, 1, '1', 'DIRECT'), (5, 8, 2, '2', 'QUASI'), (10, 13, 1, '3', 'DIRECT')],
+        ]
+        majority = merge_annotations(annotations, 'majority')
+        self.assertEqual(
+            [(s.start, s.end, s.span_id, s.entity_id, s.votes) for s in majority],
+            [(0, 3, '1', '1', 3), (5, 8, '2', '2', 2), (10, 13, '3', '1', 3)],
+        )
+        intersection = merge_annotations(annotations, 'intersection')
+        self.assertEqual([(s.start, s.entity_id) for s in intersection], [(0, '1'), (10, '2')])
+        union = merge_annotations(annotations, 'union')
+        self.assertEqual([(s.start, s.end) for s in union], [(0, 3), (5, 8), (10, 13)])
+
+    def test_adjudicate_corpus_writes_gold_document(self):
+        person = create_category()
+        for username, spans in (('alice', [(0, 3), (4, 7)]), ('bob', [(0, 3)])):
+            user = create_user(username)
+            document = create_document(user, 'shared', '홍길동 김철수')
+            for start, end in spans:
+                PIITag.objects.create(
+                    document=document, pii_category=person, span_text=document.text[start:end],
+                    start_offset=start, end_offset=end, created_by=user,
+                )
+        summary = adjudicate_corpus(Document.objects.all(), strategy='majority')
+        self.assertEqual((summary['documents'], summary['created'], summary['tags']), (1, 1, 1))
+        gold = Document.objects.get(data_id='shared', created_by__username='gold')
+        self.assertEqual([(tag.span_text, tag.confidence) for tag in gold.pii_tags.all()], [('홍길동', 1.0)])
+
+        # 다시 판정하면 기존 gold 문서의 태그를 교체한다
+        summary = adjudicate_corpus(Document.objects.all(), strategy='union')
+        self.assertEqual((summary['created'], summary['updated'], summary['tags']), (0, 1, 2))
+        self.assertEqual(gold.pii_tags.count(), 2)
+
+    def test_adjudicate_corpus_skips_groups_left_with_too_few_annotators(self):
+        person = create_category()
+        for username, text in (('alice', '홍길동 김철수'), ('bob', '홍길동 김영희')):
+            user = create_user(username)
+            document = create_document(user, 'shared', text)
+            PIITag.objects.create(
+                document=document, pii_category=person, span_text='홍길동', start_offset=0, end_offset=3, created_by=user,
+            )
+        summary = adjudicate_corpus(Document.objects.all(), strategy='majority')
+        self.assertEqual((summary['documents'], summary['skipped_documents'], summary['skipped_text_mismatch']), (0, 1, 2))
+        self.assertFalse(Document.objects.filter(created_by__username='gold').exists())
+
+
+class RealtimeTests(TestCase):
+    """문서 WebSocket 구독과 태그 이벤트 전달"""
+
+    def setUp(self):
+        self.user = create_user()
+        create_category()
+        self.document = create_document(self.user, 'doc', '홍길동이 왔다')
+        self.async_client.force_login(self.user)
+
+    def _scope(self, document_id):
+        cookie = f'sessionid={self.async_client.cookies["sessionid"].value}'
+        return {
+            'type': 'websocket',
+            'path': f'/ws/documents/{document_id}/',
+            'headers': [(b'cookie', cookie.encode()), (b'origin', b'http://testserver')],
+        }
+
+    async def _connect(self, document_id):
+        incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+        await incoming.put({'type': 'websocket.connect'})
+        task = asyncio.ensure_future(websocket_application(self._scope(document_id), incoming.get, outgoing.put))
+        return task, incoming, outgoing
+
+    async def test_tag_events_are_pushed_to_subscribers(self):
+        task, incoming, outgoing = await self._connect(self.document.id)
+        self.assertEqual((await outgoing.get())['type'], 'websocket.accept')
+        self.assertEqual(channel_layer.group_size(document_group(self.document.id)), 1)
+
+        response = await self.async_client.post(reverse('add_pii_tag'), {
+            'document_id': self.document.id, 'pii_category_value': 'PERSON',
+            'span_text': '홍길동', 'start_offset': 0, 'end_offset': 3,
+        })
+        self.assertTrue(response.json()['success'])
+        message = json.loads((await asyncio.wait_for(outgoing.get(), 1))['text'])
+        self.assertEqual(message['event'], 'tags_added')
+        self.assertEqual(message['tags'][0]['text'], '홍길동')
+
+        await incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(channel_layer.group_size(document_group(self.document.id)), 0)
+
+    async def test_other_users_document_is_rejected(self):
+        other = await User.objects.acreate(username='other')
+        document = await Document.objects.acreate(
+            data_id='other', number_of_subjects='1', provenance={}, text='본문', created_by=other,
+        )
+        task, _, outgoing = await self._connect(document.id)
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(await outgoing.get(), {'type': 'websocket.close', 'code': 4403})
+
+
+class AsyncTagViewTests(TestCase):
+    """async 태그 API"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.person = create_category()
+        self.document = create_document(self.user, 'doc', '홍길동과 홍길동')
+        self.async_client.force_login(self.user)
+
+    async def test_login_required(self):
+        response = await AsyncClient().post(reverse('add_pii_tag'), {'document_id': self.document.id})
+        self.assertEqual(response.status_code, 302)
+
+    async def test_add_then_delete_parent_reassigns_children(self):
+        for start in (0, 5):
+            response = await self.async_client.post(reverse('add_pii_tag'), {
+                'document_id': self.document.id, 'pii_category_value': 'PERSON',
+                'span_text': '홍길동', 'start_offset': start, 'end_offset': start + 3, 'entity_id': '1' if start else '',
+            })
+            self.assertTrue(response.json()['success'])
+        self.assertEqual(response.json()['tag']['span_id'], '2')
+        self.assertEqual(response.json()['document_info']['pii_count'], 2)
+
+        parent = await PIITag.objects.aget(span_id='1')
+        response = await self.async_client.post(reverse('delete_pii_tag'), {'tag_id': parent.id})
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual([(tag['span_id'], tag['entity_id']) for tag in data['updated_tags']], [('2', '2')])
+        self.assertEqual(data['document_info']['pii_count'], 1)
+        entity = await Entity.objects.aget(document=self.document)
+        self.assertEqual(entity.representative_span_id, '2')
+
+    async def test_failed_mutation_rolls_back_entity_and_tag(self):
+        with mock.patch.object(DocumentQuerySet, 'touch', side_effect=RuntimeError('touch failed')):
+            response = await self.async_client.post(reverse('add_pii_tag'), {
+                'document_id': self.document.id, 'pii_category_value': 'PERSON',
+                'span_text': '홍길동', 'start_offset': 0, 'end_offset': 3,
+            })
+        self.assertEqual(response.json(), {'success': False, 'message': 'touch failed'})
+        self.assertFalse(await PIITag.objects.aexists())
+        self.assertFalse(await Entity.objects.aexists())
+        document = await Document.objects.aget(id=self.document.id)
+        self.assertEqual(document.tag_count, 0)
+
+    def test_middleware_chain_stays_async(self):
+        # sync 전용 미들웨어가 있으면 Django 가 핸들러를 변환하며 django.request 에 DEBUG 로그를 남긴다
+        middleware = {'append': ['main.middleware.QueryProfilingMiddleware', 'main.db_router.ReplicaPinMiddleware']}
+        with self.modify_settings(MIDDLEWARE=middleware), override_settings(DEBUG=True):
+            with self.assertNoLogs('django.request', level='DEBUG'):
+                ASGIHandler().load_middleware(is_async=True)
+
+    @override_settings(READ_REPLICA_ALIAS='')
+    async def test_project_middlewares_run_on_async_path(self):
+        middleware = {'append': ['main.middleware.QueryProfilingMiddleware', 'main.db_router.ReplicaPinMiddleware']}
+        with self.modify_settings(MIDDLEWARE=middleware):
+            response = await self.async_client.post(reverse('add_pii_tag'), {
+                'document_id': self.document.id, 'pii_category_value': 'PERSON',
+                'span_text': '홍길동', 'start_offset': 0, 'end_offset': 3,
+            })
+        self.assertTrue(response.json()['success'])
+        self.assertGreater(get_recent_profiles()[-1]['query_count'], 0)
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+
+class TagCountTests(TestCase):
+    """Document.tag_count 비정규화"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.person = create_category()
+        self.document = create_document(self.user, 'doc', '홍길동과 홍길동')
+        self.async_client.force_login(self.user)
+
+    def test_touch_updates_only_small_columns(self):
+        documents = Document.objects.filter(id=self.document.id)
+        with CaptureQueriesContext(connection) as queries:
+            documents.touch(tag_delta=2)
+            documents.touch(tag_delta=-1)
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"text"', queries[0]['sql'])
+        self.assertEqual(documents.get().tag_count, 1)
+
+    def test_recount_tags(self):
+        PIITag.objects.create(
+            document=self.document, pii_category=self.person, span_text='홍길동', start_offset=0, end_offset=3,
+            span_id='1', entity_id='1', created_by=self.user,
+        )
+        Document.objects.filter(id=self.document.id).recount_tags()
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.tag_count, 1)
+
+    async def test_tag_api_keeps_count_in_sync(self):
+        response = await self.async_client.post(reverse('add_pii_tag'), {
+            'document_id': self.document.id, 'pii_category_value': 'PERSON',
+            'span_text': '홍길동', 'start_offset': 0, 'end_offset': 3,
+        })
+        tag_id = response.json()['tag']['id']
+        self.assertEqual((await Document.objects.aget(id=self.document.id)).tag_count, 1)
+
+        response = await self.async_client.post(reverse('update_pii_tag'), {
+            'tag_id': tag_id, 'pii_category_value': 'PERSON', 'identifier_type': 'DIRECT', 'entity_id': '',
+        })
+        self.assertEqual(response.json()['document_info']['pii_count'], 1)
+
+        await self.async_client.post(reverse('delete_pii_tag'), {'tag_id': tag_id})
+        self.assertEqual((await Document.objects.aget(id=self.document.id)).tag_count, 0)
+
+
+class DocumentBodyTests(TestCase):
+    """본문 분리 저장"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.other = create_user('other')
+
+    def test_identical_texts_share_one_body(self):
+        first = create_document(self.user, 'doc', '홍길동이 왔다')
+        second = create_document(self.other, 'doc', '홍길동이 왔다')
+        create_document(self.other, 'doc-2', '다른 본문')
+        self.assertEqual(first.body_id, second.body_id)
+        self.assertEqual(DocumentBody.objects.count(), 2)
+        self.assertEqual(Document.objects.get(id=second.id).text, '홍길동이 왔다')
+
+    def test_list_does_not_load_bodies(self):
+        create_document(self.user, 'doc', '본문 ' * 1000)
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('document_list'))
+        document_queries = [query['sql'] for query in queries if 'FROM "main_document"' in query['sql']]
+        self.assertTrue(document_queries)
+        self.assertFalse(any('"main_documentbody"."text"' in sql and 'SUBSTR' not in sql for sql in document_queries))
+
+    def test_orphaned_body_removed_with_last_document(self):
+        first = create_document(self.user, 'doc', '공유 본문')
+        create_document(self.other, 'doc', '공유 본문')
+        self.client.force_login(self.user)
+        self.client.post(reverse('bulk_delete_documents'), {'document_ids': [first.id]})
+        self.assertEqual(DocumentBody.objects.count(), 1)
+        Document.objects.filter(created_by=self.other).delete()
+        DocumentBody.objects.orphaned().delete()
+        self.assertFalse(DocumentBody.objects.exists())
+
+
+@override_settings(DOCUMENT_SEGMENT_SIZE=100, DOCUMENT_SEGMENT_THRESHOLD=500)
+class SegmentTests(TestCase):
+    """긴 문서 구간 API"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.person = create_category()
+        paragraph = '홍길동은 서울에 산다. ' * 6 + '\n'
+        self.text = paragraph * 20
+        self.document = create_document(self.user, 'long', self.text)
+        self.client.force_login(self.user)
+
+    def test_split_segments_covers_text_on_paragraph_boundaries(self):
+        segments = split_segments(self.text, 100)
+        self.assertEqual(segments[0][0], 0)
+        self.assertEqual(segments[-1][1], len(self.text))
+        self.assertTrue(all(first[1] == second[0] for first, second in zip(segments, segments[1:])))
+        self.assertTrue(all(self.text[end - 1] == '\n' for _, end in segments))
+
+    def test_window_returns_slice_and_overlapping_tags(self):
+        start = self.text.index('홍길동', 150)
+        PIITag.objects.create(
+            document=self.document, pii_category=self.person, span_text='홍길동',
+            start_offset=start, end_offset=start + 3, span_id='1', entity_id='1', created_by=self.user,
+        )
+        response = self.client.get(reverse('document_window', args=[self.document.id]), {'start': start + 1, 'end': 300})
+        data = response.json()
+        self.assertEqual(data['text'], self.text[start + 1:300])
+        self.assertEqual(data['length'], len(self.text))
+        self.assertEqual([(tag['start'], tag['end']) for tag in data['tags']], [(start, start + 3)])
+
+        segments = self.client.get(reverse('document_segments', args=[self.document.id])).json()['segments']
+        self.assertEqual(sum(segment['tag_count'] for segment in segments), 1)
+
+    def test_long_document_page_does_not_embed_text(self):
+        response = self.client.get(reverse('document_detail', args=[self.document.id]))
+        self.assertContains(response, 'data-segmented="1"')
+        self.assertNotContains(response, self.text[:200])
+
+
+class ImportTests(TestCase):
+    """여러 파일/아카이브 가져오기"""
+
+    def setUp(self):
+        self.report_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.report_root, ignore_errors=True)
+        settings_override = override_settings(IMPORT_REPORT_ROOT=self.report_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = create_user()
+        create_category()
+
+    @staticmethod
+    def shard(*data_ids):
+        return '\n'.join(json.dumps({
+            'metadata': {'data_id': data_id, 'number_of_subjects': '1', 'provenance': {}},
+            'text': f'{data_id} 홍길동',
+            'entities': [{'entity_type': 'PERSON', 'span_text': ' 홍길동', 'start_offset': len(data_id), 'end_offset': len(data_id) + 4}],
+        }, ensure_ascii=False) for data_id in data_ids).encode('utf-8')
+
+    def zip_file(self, **members):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for name, payload in members.items():
+                archive.writestr(name, payload)
+        buffer.seek(0)
+        return buffer
+
+    def test_imports_gzip_and_zip_shards(self):
+        files = [
+            ('a.jsonl.gz', io.BytesIO(gzip.compress(self.shard('a-1', 'a-2')))),
+            ('b.zip', self.zip_file(**{'b1.jsonl': self.shard('b-1'), 'b2.jsonl.gz': gzip.compress(self.shard('b-2'))})),
+        ]
+        report = import_documents(files, self.user)
+        self.assertEqual([shard['shard'] for shard in report['shards']], ['a.jsonl.gz', 'b.zip/b1.jsonl', 'b.zip/b2.jsonl.gz'])
+        self.assertEqual(report['documents'], 4)
+        tag = PIITag.objects.get(document__data_id='b-2')
+        # 앞 공백을 잘라 오프셋 보정
+        self.assertEqual((tag.span_text, tag.start_offset, tag.end_offset, tag.span_id), ('홍길동', 4, 7, '1'))
+        self.assertEqual(Document.objects.get(data_id='a-1').tag_count, 1)
+
+    def test_cross_shard_duplicate_rolls_back(self):
+        files = [('a.jsonl', io.BytesIO(self.shard('x', 'y'))), ('b.jsonl', io.BytesIO(self.shard('z', 'x')))]
+        with self.assertRaises(ImportRejected) as raised:
+            import_documents(files, self.user, batch_size=1)
+        self.assertEqual([shard['duplicates'] for shard in raised.exception.report['shards']], [[], ['x']])
+        self.assertEqual(raised.exception.report['rejections'], [('b.jsonl', 2, 'x', 'duplicate', '업로드 안에서 중복된 data_id')])
+        self.assertFalse(Document.objects.exists())
+        self.assertFalse(DocumentBody.objects.exists())
+
+    def test_skip_policy_keeps_valid_lines(self):
+        import_documents([('a.jsonl', io.BytesIO(self.shard('a')))], self.user)
+        payload = self.shard('a', 'b', 'b') + b'\n{broken'
+        report = import_documents([('again.jsonl', io.BytesIO(payload))], self.user, policy=SKIP)
+        self.assertEqual(report['documents'], 1)
+        self.assertEqual([(line, reason) for _, line, _, reason, _ in report['rejections']], [(4, 'invalid'), (1, 'exists'), (3, 'duplicate')])
+        self.assertEqual(Document.objects.count(), 2)
+
+    def test_overwrite_policy_replaces_body_and_tags_in_place(self):
+        import_documents([('a.jsonl', io.BytesIO(self.shard('a')))], self.user)
+        document = Document.objects.get()
+        corrected = json.dumps({'metadata': {'data_id': 'a'}, 'text': '수정된 본문', 'entities': []}).encode('utf-8')
+        report = import_documents([('fixed.jsonl', io.BytesIO(corrected))], self.user, policy=OVERWRITE)
+        self.assertEqual((report['documents'], report['overwritten']), (0, 1))
+        document.refresh_from_db()
+        self.assertEqual((document.text, document.tag_count), ('수정된 본문', 0))
+        self.assertFalse(PIITag.objects.exists())
+        # 이전 본문은 더 이상 참조되지 않으므로 삭제
+        self.assertEqual(DocumentBody.objects.count(), 1)
+
+    def test_upsert_policy_diffs_tags_and_keeps_ids(self):
+        def line(entities):
+            return json.dumps({
+                'metadata': {'data_id': 'a'}, 'text': '홍길동과 김철수',
+                'entities': [
+                    {'entity_type': 'PERSON', 'span_text': text, 'start_offset': start, 'end_offset': start + 3, 'entity_id': entity_id}
+                    for text, start, entity_id in entities
+                ],
+            }, ensure_ascii=False).encode('utf-8')
+
+        import_documents([('a.jsonl', io.BytesIO(line([('홍길동', 0, '1'), ('김철수', 5, '2')])))], self.user)
+        kept = PIITag.objects.get(start_offset=0)
+        removed = PIITag.objects.get(start_offset=5)
+        # 홍길동은 entity_id 만 수정, 김철수 삭제, 새 스팬 추가
+        corrected = line([('홍길동', 0, '9'), ('길동과', 1, '3')])
+        report = import_documents([('fixed.jsonl', io.BytesIO(corrected))], self.user, policy=UPSERT)
+        self.assertEqual((report['tags'], report['tags_updated'], report['tags_deleted']), (1, 1, 1))
+        kept.refresh_from_db()
+        self.assertEqual(kept.entity_id, '9')
+        self.assertFalse(PIITag.objects.filter(id=removed.id).exists())
+        self.assertEqual(Document.objects.get().tag_count, 2)
+
+    def test_upload_view_reports_existing_data_id(self):
+        self.client.force_login(self.user)
+        import_documents([('a.jsonl', io.BytesIO(self.shard('a')))], self.user)
+        upload = io.BytesIO(self.shard('a', 'b'))
+        upload.name = 'again.jsonl'
+        response = self.client.post(reverse('document_create'), {'jsonl_file': [upload]}, follow=True)
+        self.assertContains(response, 'again.jsonl: 중복 data_id')
+        self.assertEqual(Document.objects.count(), 1)
+        report = self.client.get(reverse('download_import_report'))
+        self.assertIn('again.jsonl,1,a,exists', b''.join(report.streaming_content).decode('utf-8-sig'))
+        # 세션에는 보고서 파일 이름만 두고, 다음 업로드가 이전 보고서 파일을 지운다
+        self.assertNotIn('import_rejections', self.client.session)
+        self.assertEqual(os.listdir(self.report_root), [self.client.session['import_report']])
+        upload = io.BytesIO(self.shard('c'))
+        upload.name = 'new.jsonl'
+        self.client.post(reverse('document_create'), {'jsonl_file': [upload]})
+        self.assertEqual(os.listdir(self.report_root), [])
+
+    def test_streams_shard_lines_in_chunks(self):
+        payload = self.shard(*(f'd-{index}' for index in range(5)))
+        files = [('big.zip', self.zip_file(**{'big.jsonl.gz': gzip.compress(payload)}))]
+        report = import_documents(files, self.user, batch_size=2)
+        self.assertEqual(report['shards'][0]['rows'], 5)
+        self.assertEqual(report['documents'], 5)
+        self.assertEqual(Document.objects.count(), 5)
+
+
+@override_settings(BULK_DELETE_CHUNK_SIZE=2)
+class BulkDeleteTests(TestCase):
+    """묶음 단위 문서 삭제"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.other = create_user('other')
+        self.person = create_category()
+        self.documents = [self.create(self.user, f'doc-{index}') for index in range(5)]
+        self.client.force_login(self.user)
+
+    def create(self, user, data_id):
+        document = create_document(user, data_id, f'{data_id} 홍길동')
+        PIITag.objects.create(
+            document=document, pii_category=self.person, span_text='홍길동', start_offset=len(data_id) + 1,
+            end_offset=len(data_id) + 4, span_id='1', entity_id='1', created_by=user,
+        )
+        return document
+
+    def test_delete_in_chunks_reports_progress(self):
+        progress = [(len(ids), deleted, total) for ids, deleted, total in Document.objects.all().delete_in_chunks(2)]
+        self.assertEqual(progress, [(2, 2, 5), (2, 4, 5), (1, 5, 5)])
+        self.assertFalse(PIITag.objects.exists())
+        self.assertFalse(DocumentBody.objects.exists())
+
+    def test_delete_in_chunks_removes_review_items(self):
+        tag = PIITag.objects.get(document=self.documents[0])
+        ReviewItem.objects.create(
+            document=self.documents[0], tag_id=tag.id, kind=ReviewItem.PERSON_SUFFIX, span_text=tag.span_text,
+            start_offset=tag.start_offset, end_offset=tag.end_offset, category='PERSON', message='호칭 포함',
+        )
+        list(Document.objects.filter(id=self.documents[0].id).delete_in_chunks())
+        self.assertFalse(ReviewItem.objects.exists())
+        self.assertEqual(Document.objects.count(), 4)
+
+    def test_bulk_delete_only_removes_callers_documents(self):
+        foreign = self.create(self.other, 'foreign')
+        ids = [document.id for document in self.documents[:3]] + [foreign.id]
+        response = self.client.post(reverse('bulk_delete_documents'), {'document_ids': ids})
+        self.assertEqual(response.json(), {'success': True, 'deleted_count': 3})
+        self.assertTrue(Document.objects.filter(id=foreign.id).exists())
+        self.assertEqual(PIITag.objects.count(), 3)
+
+
+class EntityTests(TestCase):
+    """Entity 대표 교체/병합/분리"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.person = create_category()
+        self.document = create_document(self.user, 'doc', '홍길동 홍길동 김철수 김철수')
+        for span_id, entity_id, start in (('1', '1', 0), ('2', '1', 4), ('3', '3', 8), ('4', '3', 12)):
+            PIITag.objects.create(
+                document=self.document, pii_category=self.person, span_text=self.document.text[start:start + 3],
+                start_offset=start, end_offset=start + 3, span_id=span_id, entity_id=entity_id, created_by=self.user,
+            )
+        Document.objects.filter(id=self.document.id).sync_entities()
+
+    def entity(self, key):
+        return Entity.objects.get(document=self.document, representative_span_id=key)
+
+    def test_sync_entities_links_tags(self):
+        self.assertEqual(Entity.objects.count(), 2)
+        self.assertEqual(sorted(self.entity('3').tags.values_list('span_id', flat=True)), ['3', '4'])
+
+    def test_merge_and_split_update_entity_ids(self):
+        merged = self.entity('3').merge_into(self.entity('1'))
+        self.assertEqual(Entity.objects.count(), 1)
+        self.assertEqual(set(PIITag.objects.values_list('entity_id', flat=True)), {'1'})
+
+        split = merged.split(PIITag.objects.filter(span_id__in=['1', '4']).values_list('id', flat=True))
+        self.assertEqual(split.representative_span_id, '1')
+        # 대표(span 1)를 잃은 원래 entity 는 남은 가장 작은 span 2 를 대표로
+        self.assertEqual(
+            dict(PIITag.objects.values_list('span_id', 'entity_id')), {'1': '1', '2': '2', '3': '2', '4': '1'}
+        )
+        self.assertEqual(Entity.objects.count(), 2)
+
+
+class AdminTests(TestCase):
+    """대용량 관리자 목록"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.person = create_category()
+        self.client.force_login(self.user)
+
+    def add_tags(self, count):
+        for index in range(count):
+            document = create_document(self.user, f'doc-{PIITag.objects.count()}', '홍길동')
+            PIITag.objects.create(
+                document=document, pii_category=self.person, span_text='홍길동', start_offset=0, end_offset=3,
+                span_id='1', entity_id='1', annotator=f'annotator-{index}', created_by=self.user,
+            )
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:main_piitag_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_tag_changelist_queries_do_not_grow_with_rows(self):
+        self.add_tags(1)
+        self.changelist_queries()
+        first = self.changelist_queries()
+        self.add_tags(10)
+        cache.clear()
+        self.changelist_queries()
+        self.assertEqual(self.changelist_queries(), first)
+
+    def test_filter_choices_are_cached(self):
+        self.add_tags(2)
+        self.changelist_queries()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('admin:main_piitag_changelist'))
+        self.assertFalse(any('DISTINCT' in query['sql'] for query in queries))
+
+    def test_search_uses_exact_ids_and_span_text(self):
+        self.add_tags(2)
+        response = self.client.get(reverse('admin:main_piitag_changelist'), {'q': 'doc-1'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class DeidentifyTests(TestCase):
+    """비식별화 출력"""
+
+    def test_rules_by_identifier_type_and_consistent_pseudonyms(self):
+        text = '홍길동은 서울에 산다. 홍길동은 김철수를 만났다.'
+        spans = [
+            (0, 3, 'PERSON', 'DIRECT', '1'),
+            (5, 7, 'LOC', 'QUASI', '2'),
+            (13, 16, 'PERSON', 'DIRECT', '1'),
+            (18, 21, 'PERSON', 'DIRECT', '3'),
+            (0, 2, 'PERSON', 'DIRECT', '4'),  # 앞선 span 에 덮여서 건너뜀
+        ]
+        deidentified, replacements = deidentify_text(text, spans, DEFAULT_RULES)
+        self.assertEqual(deidentified, '[PERSON_1]은 [LOC]에 산다. [PERSON_1]은 [PERSON_2]를 만났다.')
+        self.assertEqual(len(replacements), 4)
+        self.assertEqual(
+            [deidentified[r['start_offset']:r['end_offset']] for r in replacements],
+            ['[PERSON_1]', '[LOC]', '[PERSON_1]', '[PERSON_2]'],
+        )
+
+        rules = dict(DEFAULT_RULES, DIRECT=REDACT, QUASI=KEEP)
+        deidentified, _ = deidentify_text(text, spans, rules)
+        self.assertEqual(deidentified, '***은 서울에 산다. ***은 ***를 만났다.')
+
+    def test_partial_overlap_replaces_uncovered_remainder(self):
+        text = '홍길동 서울시 강남구 거주'
+        spans = [(0, 3, 'PERSON', 'DIRECT', '1'), (2, 10, 'LOC', 'QUASI', '2')]
+        deidentified, replacements = deidentify_text(text, spans, DEFAULT_RULES)
+        self.assertEqual(deidentified, '[PERSON_1][LOC]구 거주')
+        self.assertEqual(
+            [deidentified[r['start_offset']:r['end_offset']] for r in replacements], ['[PERSON_1]', '[LOC]'],
+        )
+        deidentified, _ = deidentify_text(text, spans, dict(DEFAULT_RULES, DIRECT=REDACT, QUASI=REDACT))
+        self.assertEqual(deidentified, '**********구 거주')
+
+    def test_download_streams_callers_documents_only(self):
+        user = create_user()
+        other = create_user('other')
+        person = create_category()
+        documents = []
+        for owner in (user, other):
+            document = create_document(owner, f'{owner.username}-doc', '홍길동 씨')
+            PIITag.objects.create(
+                document=document, pii_category=person, span_text='홍길동', start_offset=0, end_offset=3,
+                span_id='1', entity_id='1', identifier_type='DIRECT', created_by=owner,
+            )
+            documents.append(document)
+        self.client.force_login(user)
+
+        response = self.client.post(reverse('download_deidentified'), {
+            'document_ids': [document.id for document in documents], 'direct_rule': 'placeholder',
+        })
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['metadata']['data_id'], 'annotator-doc')
+        self.assertEqual(lines[0]['text'], '[PERSON] 씨')
+
+        response = self.client.post(reverse('download_deidentified'), {'document_ids': [documents[0].id], 'direct_rule': 'x'})
+        self.assertFalse(response.json()['success'])
+
+
+class OffsetMapTests(TestCase):
+    """코드 포인트 / UTF-16 / UTF-8 오프셋 변환"""
+
+    TEXT = 'a😀 홍길동 é𝒳b'
+
+    def setUp(self):
+        self.user = create_user()
+        create_category()
+        self.async_client.force_login(self.user)
+
+    def test_conversions_match_encoding(self):
+        body = DocumentBody.objects.intern(self.TEXT)
+        offset_map = DocumentBody.objects.get(id=body.id).offset_map()
+        for index in range(len(self.TEXT) + 1):
+            utf16 = len(self.TEXT[:index].encode('utf-16-le')) // 2
+            utf8 = len(self.TEXT[:index].encode('utf-8'))
+            self.assertEqual(offset_map.to_unit(index, UTF16), utf16)
+            self.assertEqual(offset_map.to_unit(index, UTF8), utf8)
+            self.assertEqual(offset_map.from_unit(utf16, UTF16), index)
+            self.assertEqual(offset_map.from_unit(utf8, UTF8), index)
+        with self.assertRaises(ValueError):
+            offset_map.from_unit(2, UTF16)  # 이모지의 서로게이트 쌍 중간
+        self.assertEqual(OffsetMap.build('plain ascii').to_bytes(), (b'', b''))
+
+    async def test_editor_utf16_offsets_are_stored_as_code_points(self):
+        document = await Document.objects.acreate(
+            data_id='doc', number_of_subjects='1', provenance={}, text=self.TEXT, created_by=self.user,
+        )
+        response = await self.async_client.post(reverse('add_pii_tag'), {
+            'document_id': document.id, 'pii_category_value': 'PERSON', 'span_text': '홍길동',
+            'start_offset': 4, 'end_offset': 7, 'offset_unit': 'utf16',
+        })
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual((data['tag']['start'], data['tag']['end']), (4, 7))
+        tag = await PIITag.objects.aget(document=document)
+        self.assertEqual(self.TEXT[tag.start_offset:tag.end_offset], '홍길동')
+
+    def test_import_and_export_in_utf8_bytes(self):
+        start = len(self.TEXT.split('홍')[0].encode('utf-8'))
+        shard = json.dumps({
+            'metadata': {'data_id': 'doc', 'number_of_subjects': '1', 'provenance': {}},
+            'text': self.TEXT,
+            'entities': [{'entity_type': 'PERSON', 'span_text': '홍길동', 'start_offset': start, 'end_offset': start + 9}],
+        }, ensure_ascii=False).encode('utf-8')
+        import_documents([('a.jsonl', io.BytesIO(shard))], self.user, offset_unit=UTF8)
+        tag = PIITag.objects.get()
+        self.assertEqual(self.TEXT[tag.start_offset:tag.end_offset], '홍길동')
+
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('download_jsonl'), {'document_ids': [tag.document_id], 'offset_unit': 'utf8'})
+        entity = json.loads(response.content)['entities'][0]
+        self.assertEqual((entity['start_offset'], entity['end_offset']), (start, start + 9))
+
+
+class ConllExportTests(TestCase):
+    """토큰 단위 BIO/CoNLL 내보내기"""
+
+    TEXT = '홍길동은 서울에서 010-1234-5678로 연락했다.\n김철수는 왔다.'
+    SPANS = [(0, 3, 'PERSON'), (5, 7, 'LOC'), (10, 23, 'CODE'), (31, 34, 'PERSON')]
+
+    def test_tokenizers_and_linear_alignment(self):
+        tokens = get_tokenizer('korean')(self.TEXT)
+        labels = align_labels(tokens, self.SPANS)
+        pairs = [(self.TEXT[start:end], label) for (start, end), label in zip(tokens, labels)]
+        self.assertEqual(pairs[:5], [('홍길동', 'B-PERSON'), ('은', 'O'), ('서울', 'B-LOC'), ('에서', 'O'), ('010', 'B-CODE')])
+        self.assertEqual(pairs[5:9], [('-', 'I-CODE'), ('1234', 'I-CODE'), ('-', 'I-CODE'), ('5678', 'I-CODE')])
+
+        tokens = get_tokenizer('whitespace')(self.TEXT)
+        self.assertEqual(align_labels(tokens, self.SPANS), ['B-PERSON', 'B-LOC', 'B-CODE', 'O', 'B-PERSON', 'O'])
+        with self.assertRaises(ValueError):
+            get_tokenizer('regex', '(')
+
+    def test_conll_blocks_split_sentences_on_newlines(self):
+        block = conll_chunk([({'data_id': 'doc'}, self.TEXT, self.SPANS)], 'whitespace')[0]
+        self.assertEqual(
+            block,
+            '-DOCSTART-\tO\n\n홍길동은\tB-PERSON\n서울에서\tB-LOC\n010-1234-5678로\tB-CODE\n연락했다.\tO\n\n'
+            '김철수는\tB-PERSON\n왔다.\tO\n\n',
+        )
+
+    def test_regex_tokenizer_drops_empty_matches_and_splits_on_whitespace(self):
+        block = conll_chunk([({'data_id': 'doc'}, '홍길동 서울', [(0, 3, 'PERSON')])], 'regex', r'\w*')[0]
+        self.assertEqual(block, '-DOCSTART-\tO\n\n홍길동\tB-PERSON\n서울\tO\n\n')
+
+        text = '홍길동\t서울 x'
+        tokens = get_tokenizer('regex', r'[^ ]+')(text)
+        self.assertEqual([text[start:end] for start, end in tokens], ['홍길동', '서울', 'x'])
+        block = conll_chunk([({'data_id': 'doc'}, text, [(0, 3, 'PERSON')])], 'regex', r'[^ ]+')[0]
+        self.assertEqual(block, '-DOCSTART-\tO\n\n홍길동\tB-PERSON\n서울\tO\nx\tO\n\n')
+
+    def test_download_streams_callers_documents(self):
+        user = create_user()
+        person = create_category()
+        document = create_document(user, 'doc', '홍길동 씨')
+        PIITag.objects.create(
+            document=document, pii_category=person, span_text='홍길동', start_offset=0, end_offset=3,
+            span_id='1', entity_id='1', created_by=user,
+        )
+        self.client.force_login(user)
+        response = self.client.post(reverse('download_conll'), {'document_ids': [document.id], 'format': 'jsonl'})
+        line = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(line, {'data_id': 'doc', 'tokens': ['홍길동', '씨'], 'labels': ['B-PERSON', 'O']})
+
+
+@override_settings(DATABASE_ROUTERS=['main.db_router.ReplicaRouter'], READ_REPLICA_ALIAS='replica')
+class ReplicaRoutingTests(TransactionTestCase):
+    """읽기 전용 복제본 라우팅과 read-your-writes 고정"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def test_reads_use_replica_only_inside_opt_in_block(self):
+        self.assertIsNone(self.router.db_for_read(Document))
+        with read_replica() as alias:
+            self.assertEqual(alias, 'replica')
+            self.assertEqual(self.router.db_for_read(Document), 'replica')
+            self.assertEqual(self.router.db_for_write(Document), 'default')
+            with transaction.atomic():
+                self.assertIsNone(self.router.db_for_read(Document))
+        self.assertIsNone(self.router.db_for_read(Document))
+
+        pinned = self.factory.get('/', HTTP_COOKIE=f'{REPLICA_PIN_COOKIE}={time.time() + 60}')
+        with read_replica(pinned) as alias:
+            self.assertEqual(alias, 'default')
+            self.assertIsNone(self.router.db_for_read(Document))
+        with override_settings(READ_REPLICA_ALIAS=''), read_replica() as alias:
+            self.assertEqual(alias, 'default')
+
+    def test_streaming_response_is_read_from_replica_after_view_returns(self):
+        def view(request):
+            return StreamingHttpResponse(str(self.router.db_for_read(Document)) for _ in range(2))
+
+        response = use_read_replica(view)(self.factory.get('/'))
+        self.assertIsNone(self.router.db_for_read(Document))
+        self.assertEqual(b''.join(response.streaming_content), b'replicareplica')
+
+    @override_settings(READ_REPLICA_ALIAS='')
+    def test_writes_pin_reads_to_primary(self):
+        user = create_user()
+        document = create_document(user, 'doc', '본문')
+        self.client.force_login(user)
+        with self.modify_settings(MIDDLEWARE={'append': 'main.db_router.ReplicaPinMiddleware'}):
+            response = self.client.get(reverse('document_list'))
+            self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+            response = self.client.post(reverse('bulk_delete_documents'), {'document_ids': [document.id]})
+            self.assertTrue(response.json()['success'])
+            self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+        self.assertTrue(is_pinned(self.factory.get('/', HTTP_COOKIE=f'{REPLICA_PIN_COOKIE}={response.cookies[REPLICA_PIN_COOKIE].value}')))
+
+
+class TagPartitionTests(TestCase):
+    """태그 API 가 document_id 로 태그 조회를 문서 하나(PostgreSQL 파티션 하나)로 한정하는지"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.person = create_category()
+        create_category('LOC')
+        self.document = create_document(self.user, 'doc', '홍길동 서울')
+        self.other = create_document(self.user, 'other', '김철수')
+        self.entity = Entity.objects.create(document=self.document, representative_span_id='1')
+        self.tag = PIITag.objects.create(
+            document=self.document, pii_category=self.person, span_text='홍길동', start_offset=0, end_offset=3,
+            span_id='1', entity_id='1', entity_ref=self.entity, created_by=self.user,
+        )
+        Document.objects.filter(id=self.document.id).recount_tags()
+        self.client.force_login(self.user)
+
+    def test_in_document_scopes_tag_lookups(self):
+        self.assertEqual(list(PIITag.objects.in_document(self.document.id)), [self.tag])
+        self.assertEqual(list(PIITag.objects.in_document(self.other.id)), [])
+        self.assertEqual(list(PIITag.objects.in_document(None)), [self.tag])
+        self.assertEqual(list(self.entity.document_tags), [self.tag])
+        empty = Entity.objects.create(document=self.other, representative_span_id='1')
+        self.assertEqual(list(Entity.objects.empty()), [empty])
+
+    def test_update_and_delete_with_document_id(self):
+        response = self.client.post(reverse('update_pii_tag'), {
+            'tag_id': self.tag.id, 'document_id': self.other.id, 'pii_category_value': 'LOC',
+        })
+        self.assertFalse(response.json()['success'])
+
+        response = self.client.post(reverse('update_pii_tag'), {
+            'tag_id': self.tag.id, 'document_id': self.document.id, 'pii_category_value': 'LOC',
+            'identifier_type': 'DIRECT', 'entity_id': '1',
+        })
+        self.assertTrue(response.json()['success'])
+        self.tag.refresh_from_db()
+        self.assertEqual((self.tag.pii_category.value, self.tag.identifier_type, self.tag.annotator), ('LOC', 'DIRECT', 'annotator'))
+
+        response = self.client.post(reverse('delete_pii_tag'), {'tag_id': self.tag.id, 'document_id': self.document.id})
+        self.assertTrue(response.json()['success'])
+        self.assertFalse(PIITag.objects.exists())
+        self.assertFalse(Entity.objects.exists())
+
+
+class ReleaseTests(TestCase):
+    """변경되지 않는 데이터셋 릴리스 (샤드 + manifest, 파일 전송 권한)"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        settings_override = override_settings(RELEASE_ROOT=self.root, RELEASE_ACCEL_REDIRECT='')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = create_user()
+        person = create_category()
+        for index in range(3):
+            document = create_document(self.user, f'doc{index}', '홍길동 씨')
+            PIITag.objects.create(
+                document=document, pii_category=person, span_text='홍길동', start_offset=0, end_offset=3,
+                span_id='1', entity_id='1', annotator='a', identifier_type='DIRECT', created_by=self.user,
+            )
+
+    def tearDown(self):
+        for directory, _, _ in os.walk(self.root):
+            os.chmod(directory, stat.S_IRWXU)
+        shutil.rmtree(self.root)
+
+    def test_build_writes_read_only_shards_and_manifest(self):
+        documents = Document.objects.filter(created_by=self.user)
+        release = build_release('v1', self.user, documents, shard_size=2)
+        self.assertEqual((release.status, release.document_count, release.tag_count), (DatasetRelease.READY, 3, 3))
+        self.assertEqual(release.files, ['manifest.json', 'part-00000.jsonl.gz', 'part-00001.jsonl.gz'])
+
+        directory = os.path.join(self.root, 'v1')
+        with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest, release.manifest)
+        self.assertEqual([shard['documents'] for shard in manifest['shards']], [2, 1])
+        for shard in manifest['shards']:
+            with open(os.path.join(directory, shard['file']), 'rb') as f:
+                self.assertEqual(hashlib.sha256(f.read()).hexdigest(), shard['sha256'])
+            self.assertFalse(os.stat(os.path.join(directory, shard['file'])).st_mode & stat.S_IWUSR)
+
+        with gzip.open(os.path.join(directory, 'part-00000.jsonl.gz'), 'rt', encoding='utf-8') as f:
+            line = json.loads(f.readline())
+        self.assertEqual(line['metadata']['data_id'], 'doc0')
+        self.assertEqual(line['entities'], [{
+            'span_text': '홍길동', 'entity_type': 'PERSON', 'start_offset': 0, 'end_offset': 3,
+            'span_id': '1', 'entity_id': '1', 'annotator': 'a', 'identifier_type': 'DIRECT',
+        }])
+
+        with self.assertRaises(ValueError):
+            build_release('v1', self.user, documents)
+        with self.assertRaises(ValueError):
+            build_release('../v2', self.user, documents)
+
+    def test_files_are_served_only_to_visible_users(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('create_release'), {'name': 'v1', 'compression': ''})
+        self.assertEqual(response.json()['files'], ['manifest.json', 'part-00000.jsonl'])
+
+        response = self.client.get(reverse('release_file', args=['v1', 'part-00000.jsonl']))
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('release_file', args=['v1', 'other.txt'])).status_code, 404)
+
+        with override_settings(RELEASE_ACCEL_REDIRECT='/protected-releases/'):
+            response = self.client.get(reverse('release_file', args=['v1', 'manifest.json']))
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-releases/v1/manifest.json')
+
+        self.client.force_login(create_user('other'))
+        self.assertEqual(self.client.get(reverse('release_file', args=['v1', 'manifest.json'])).status_code, 404)
+
+
+class ConsistencyTests(TestCase):
+    """코퍼스 라벨 일관성 검사 (가이드라인 규칙, 이상치, 증분 재검사)"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.person = create_category()
+        self.org = create_category('ORG')
+        self.tags = []
+        for index, category in enumerate((self.person, self.person, self.person, self.org)):
+            document = create_document(self.user, f'doc{index}', '홍길동 씨')
+            self.tags.append(PIITag.objects.create(
+                document=document, pii_category=category, span_text='홍길동', start_offset=0, end_offset=3,
+                span_id='1', entity_id='1', identifier_type='DIRECT' if category == self.person else 'QUASI',
+                created_by=self.user,
+            ))
+
+    def test_guideline_rules_and_entity_mixing(self):
+        rules = validate_rules({})
+        tags = [
+            (1, 0, 4, '김철수씨', 'PERSON', 'QUASI', '1'),
+            (2, 2, 6, '철수씨 ', 'PERSON', 'DIRECT', '1'),
+            (3, 10, 13, '서울시', 'LOC', 'QUASI', '1'),
+        ]
+        occurrences, findings = analyze_document(tags, rules)
+        self.assertEqual(len(occurrences), 3)
+        kinds = {(finding[0], finding[1][0]) for finding in findings}
+        self.assertEqual(kinds, {
+            (ReviewItem.IDENTIFIER_RULE, 1), (ReviewItem.PERSON_SUFFIX, 1), (ReviewItem.SPAN_BOUNDARY, 2),
+            (ReviewItem.OVERLAP, 2), (ReviewItem.ENTITY_MIXED, 3),
+        })
+        with self.assertRaises(ValueError):
+            validate_rules({'min_support': 1})
+
+    def test_incremental_outliers_keep_dismissals(self):
+        summary = check_consistency()
+        self.assertEqual((summary['documents'], summary['outliers']), (4, 1))
+        item = ReviewItem.objects.get(kind=ReviewItem.CATEGORY_OUTLIER)
+        self.assertEqual((item.tag_id, item.expected, item.support), (self.tags[3].id, 'PERSON', 4))
+        self.assertEqual(check_consistency()['documents'], 0)
+
+        # 다른 문서가 바뀌어 같은 텍스트를 다시 계산해도 무시 상태는 유지
+        ReviewItem.objects.filter(id=item.id).update(dismissed=True)
+        Document.objects.filter(id=self.tags[0].document_id).touch()
+        summary = check_consistency()
+        self.assertEqual(summary['documents'], 1)
+        self.assertTrue(ReviewItem.objects.get(kind=ReviewItem.CATEGORY_OUTLIER).dismissed)
+
+        # 라벨을 고치면 바뀐 문서만 다시 읽고 이상치가 사라진다
+        PIITag.objects.filter(id=self.tags[3].id).update(pii_category=self.person, identifier_type='DIRECT')
+        Document.objects.filter(id=self.tags[3].document_id).touch()
+        self.assertEqual(check_consistency()['documents'], 1)
+        self.assertFalse(ReviewItem.objects.filter(kind=ReviewItem.CATEGORY_OUTLIER).exists())
+        self.assertEqual(LabelCount.objects.get(key='홍길동').count, 4)
+
+        Document.objects.filter(id=self.tags[0].document_id).delete()
+        self.assertEqual(check_consistency()['removed'], 1)
+        self.assertEqual(LabelCount.objects.get(key='홍길동').count, 3)
+
+    def test_review_queue_is_staff_only(self):
+        check_consistency()
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('review_queue')).status_code, 403)
+
+        staff = create_user('reviewer', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('review_queue'), {'kind': ReviewItem.CATEGORY_OUTLIER})
+        self.assertEqual([item['data_id'] for item in response.json()['items']], ['doc3'])
+        item_id = response.json()['items'][0]['id']
+        self.assertTrue(self.client.post(reverse('dismiss_review_item'), {'item_id': item_id}).json()['success'])
+        self.assertEqual(self.client.get(reverse('review_queue')).json()['total'], 0)
@@ -5,12 +5,29 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('documents/', views.document_list, name='document_list'),
     path('documents/create/', views.document_create, name='document_create'),
+    path('documents/create/report/', views.download_import_report, name='download_import_report'),
     path('documents/<int:pk>/', views.document_detail, name='document_detail'),
+    path('api/documents/<int:pk>/segments/', views.document_segments_api, name='document_segments'),
+    path('api/documents/<int:pk>/window/', views.document_window, name='document_window'),
     path('documents/download/jsonl/', views.download_jsonl, name='download_jsonl'),
+    path('documents/download/deidentified/', views.download_deidentified, name='download_deidentified'),
+    path('documents/download/conll/', views.download_conll, name='download_conll'),
+    path('releases/', views.release_list, name='release_list'),
+    path('releases/<str:name>/<str:filename>', views.release_file, name='release_file'),
+    path('api/create-release/', views.create_release, name='create_release'),
     path('api/add-pii-tag/', views.add_pii_tag, name='add_pii_tag'),
+    path('api/preannotate-document/', views.preannotate_document, name='preannotate_document'),
+    path('api/propagate-pii-tag/', views.propagate_pii_tag, name='propagate_pii_tag'),
     path('api/delete-pii-tag/', views.delete_pii_tag, name='delete_pii_tag'),
     path('api/update-pii-tag/', views.update_pii_tag, name='update_pii_tag'),
     path('api/delete-document/', views.delete_document, name='delete_document'),
     path('api/bulk-delete-documents/', views.bulk_delete_documents, name='bulk_delete_documents'),
+    path('api/search/', views.search, name='search'),
+    path('api/agreement/', views.agreement, name='agreement'),
+    path('api/adjudicate/', views.adjudicate, name='adjudicate'),
+    path('api/review-queue/', views.review_queue, name='review_queue'),
+    path('api/check-consistency/', views.check_consistency, name='check_consistency'),
+    path('api/dismiss-review-item/', views.dismiss_review_item, name='dismiss_review_item'),
+    path('api/profiling/', views.profiling_data, name='profiling_data'),
     path('register/', views.register, name='register'),
 ]
@@ -2,16 +2,113 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch
+from django.db.models.functions import Length, Substr
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from django.utils.html import escape
+from django.conf import settings
+from asgiref.sync import sync_to_async
 import json
+import logging
 import os
-from .models import Document, PIICategory, PIITag
-from datetime import datetime
+from .models import DatasetRelease, Document, DocumentBody, Entity, PIICategory, PIITag, ReviewItem
+from .adjudication import STRATEGIES, adjudicate_corpus, get_gold_user
+from .agreement import cached_agreement
+from .conll import CONLL, JSONL as CONLL_JSONL, iter_conll
+from .consistency import check_consistency as run_consistency_check, load_rules, review_item_to_dict
+from .db_router import use_read_replica
+from .deidentify import DEFAULT_RULES, RULE_LABELS, iter_deidentified, validate_rules
+from .middleware import get_recent_profiles
+from .offsets import CODEPOINT, UTF8, UTF16, OffsetMap, validate_unit
+from .importer import (
+    FAIL as IMPORT_FAIL,
+    ImportRejected,
+    import_documents,
+    is_supported,
+    rejection_report_path,
+    save_rejection_report,
+    write_rejection_report,
+)
+from .preannotation import preannotate_documents
+from .releases import build_release, release_directory
+from .propagation import propagate_tags, propagation_scope
+from .decorators import aget_object_or_404, async_csrf_exempt, async_login_required
+from .realtime import abroadcast_tag_event, broadcast_tag_event
+from .segments import count_tags_per_segment, document_segments, is_segmented, segment_size
+from .search import (
+    filter_documents_by_text,
+    filter_documents_by_words,
+    filter_tags_by_span,
+    make_snippet,
+    search_backend,
+)
+
+logger = logging.getLogger(__name__)
+
+# 문서 목록에서 본문 대신 읽는 미리보기 길이
+LIST_PREVIEW_LENGTH = 200
+# document_window 한 번에 요청할 수 있는 최대 구간 수
+MAX_WINDOW_SEGMENTS = 10
+
+def _tag_to_dict(tag, offset_map=None, unit=CODEPOINT):
+    """에디터에서 사용하는 태그 JSON 표현 (오프셋은 unit 단위)"""
+    start, end = tag.start_offset, tag.end_offset
+    if unit != CODEPOINT:
+        start, end = offset_map.to_unit(start, unit), offset_map.to_unit(end, unit)
+    return {
+        'id': tag.id,
+        'start': start,
+        'end': end,
+        'text': escape(tag.span_text),
+        'color': tag.pii_category.background_color,
+        'category': tag.pii_category.value,
+        'span_id': tag.span_id,
+        'entity_id': tag.entity_id,
+        'annotator': escape(tag.annotator),
+        'identifier_type': tag.identifier_type
+    }
+
+
+def _offset_unit(request):
+    """요청의 오프셋 단위 (에디터는 JavaScript 문자열 인덱스인 utf16, 기본은 코드 포인트)"""
+    return validate_unit(request.POST.get('offset_unit') or request.GET.get('offset_unit') or CODEPOINT)
+
+
+def _annotate_offset_maps(queryset, unit, body='body'):
+    """오프셋 맵을 같은 쿼리로 읽도록 annotate (UTF-16 은 WebSocket 이벤트용으로 항상, UTF-8 은 요청한 경우만)"""
+    fields = {'utf16_offsets': F(f'{body}__utf16_offsets')}
+    if unit == UTF8:
+        fields['utf8_offsets'] = F(f'{body}__utf8_offsets')
+    return queryset.annotate(**fields)
+
+
+def _annotated_offset_map(obj):
+    return OffsetMap.from_bytes(obj.utf16_offsets, getattr(obj, 'utf8_offsets', b''))
+
+
+def _format_document_info(updated_at, tag_count):
+    return {
+        'updated_at': timezone.localtime(updated_at).strftime('%Y-%m-%d %H:%M'),
+        'pii_count': tag_count
+    }
+
+
+def _document_info(document_id):
+    """에디터 상단의 수정 시각/태그 수 (비정규화 컬럼만 조회)"""
+    return _format_document_info(
+        *Document.objects.filter(id=document_id).values_list('updated_at', 'tag_count').get()
+    )
+
+
+async def _adocument_info(document_id):
+    return _format_document_info(
+        *await Document.objects.filter(id=document_id).values_list('updated_at', 'tag_count').aget()
+    )
+
 
 def index(request):
     """메인 페이지"""
@@ -26,175 +123,209 @@ def index(request):
 
 
 @login_required
+@use_read_replica
 def document_list(request):
     """문서 목록 페이지"""
-    documents = Document.objects.filter(created_by=request.user).order_by('created_at')
-    return render(request, 'main/document_list.html', {'documents': documents})
+    documents = (
+        Document.objects.filter(created_by=request.user)
+        .annotate(text_preview=Substr('body__text', 1, LIST_PREVIEW_LENGTH))
+        .order_by('created_at')
+    )
+    return render(request, 'main/document_list.html', {
+        'documents': documents,
+        'deidentify_defaults': DEFAULT_RULES.items(),
+        'deidentify_rules': RULE_LABELS.items(),
+    })
 
 
 @login_required
 def document_detail(request, pk):
     """문서 상세 페이지"""
-    document = get_object_or_404(Document, pk=pk, created_by=request.user)
-    pii_tags = PIITag.objects.filter(document=document).order_by('start_offset')
+    document = get_object_or_404(Document.objects.select_related('body'), pk=pk, created_by=request.user)
     pii_categories = PIICategory.objects.all().order_by('created_at')
     
     # 이전/다음 문서 찾기 (현재 사용자의 문서만)
-    prev_document = Document.objects.filter(pk__lt=pk, created_by=request.user).order_by('-pk').first()
-    next_document = Document.objects.filter(pk__gt=pk, created_by=request.user).order_by('pk').first()
+    prev_document = Document.objects.filter(pk__lt=pk, created_by=request.user).order_by('-pk').only('pk').first()
+    next_document = Document.objects.filter(pk__gt=pk, created_by=request.user).order_by('pk').only('pk').first()
     
-    # PII 태그들을 JSON 형태로 변환
-    pii_tags_json = []
-    for tag in pii_tags:
-        pii_tags_json.append({
-            'id': tag.id,
-            'start': tag.start_offset,
-            'end': tag.end_offset,
-            'text': escape(tag.span_text),
-            'color': tag.pii_category.background_color,
-            'category': tag.pii_category.value,
-            'span_id': tag.span_id,
-            'entity_id': tag.entity_id,
-            'annotator': escape(tag.annotator),
-            'identifier_type': tag.identifier_type
-        })
+    # 에디터의 오프셋은 JavaScript 문자열 인덱스(UTF-16)
+    offset_map = document.body.offset_map()
+    # 긴 문서는 본문/태그를 페이지에 넣지 않고 에디터가 보이는 구간만 document_window 로 불러온다
+    segments = document_segments(document) if is_segmented(document) else None
+    if segments:
+        segments = [(offset_map.to_unit(start, UTF16), offset_map.to_unit(end, UTF16)) for start, end in segments]
+        pii_tags_json = []
+    else:
+        pii_tags = PIITag.objects.filter(document=document).select_related('pii_category').order_by('start_offset')
+        # PII 태그들을 JSON 형태로 변환
+        pii_tags_json = [_tag_to_dict(tag, offset_map, UTF16) for tag in pii_tags]
     
     return render(request, 'main/document_detail.html', {
         'document': document,
-        'pii_tags': pii_tags,
+        'segments': segments,
         'pii_tags_json': json.dumps(pii_tags_json),
+        'provenance_json': json.dumps(document.provenance, ensure_ascii=False),
         'pii_categories': pii_categories,
         'prev_document': prev_document,
         'next_document': next_document,
     })
 
 
+@login_required
+def document_segments_api(request, pk):
+    """문서 구간 목록과 구간별 태그 수 (긴 문서 에디터용, 오프셋은 offset_unit 단위)"""
+    try:
+        unit = _offset_unit(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+    document = get_object_or_404(Document.objects.select_related('body'), pk=pk, created_by=request.user)
+    offset_map = document.body.offset_map()
+    segments = document_segments(document)
+    tag_starts = PIITag.objects.filter(document=document).order_by('start_offset').values_list('start_offset', flat=True)
+    return JsonResponse({
+        'success': True,
+        'length': offset_map.to_unit(len(document.text), unit),
+        'segments': [
+            {'start': offset_map.to_unit(start, unit), 'end': offset_map.to_unit(end, unit), 'tag_count': tag_count}
+            for (start, end), tag_count in zip(segments, count_tags_per_segment(segments, tag_starts))
+        ],
+    })
+
+
+@login_required
+def document_window(request, pk):
+    """문서 본문의 [start, end) 구간과 그 구간에 걸친 태그
+
+    본문은 DB 에서 필요한 부분만 잘라 읽으며 오프셋은 문서 전체 기준(offset_unit 단위)이다.
+    """
+    try:
+        unit = _offset_unit(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+    try:
+        start = int(request.GET.get('start', 0))
+        end = int(request.GET.get('end', start + segment_size()))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'start, end는 정수여야 합니다.'})
+
+    documents = Document.objects.filter(created_by=request.user)
+    offset_map = OffsetMap.from_bytes()
+    if unit != CODEPOINT:
+        offset_map = _annotated_offset_map(get_object_or_404(_annotate_offset_maps(documents.only('id'), unit), pk=pk))
+        try:
+            start, end = offset_map.from_unit(start, unit), offset_map.from_unit(end, unit)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+    if start < 0 or end <= start:
+        return JsonResponse({'success': False, 'message': '잘못된 구간입니다.'})
+    if end - start > segment_size() * MAX_WINDOW_SEGMENTS:
+        return JsonResponse({'success': False, 'message': '요청한 구간이 너무 깁니다.'})
+
+    document = get_object_or_404(
+        documents.annotate(window_text=Substr('body__text', start + 1, end - start), text_length=Length('body__text'))
+        .only('id'),
+        pk=pk,
+    )
+    tags = (
+        PIITag.objects.filter(document_id=document.id, start_offset__lt=end, end_offset__gt=start)
+        .select_related('pii_category')
+        .order_by('start_offset')
+    )
+    return JsonResponse({
+        'success': True,
+        'start': offset_map.to_unit(start, unit),
+        'end': offset_map.to_unit(start + len(document.window_text), unit),
+        'length': offset_map.to_unit(document.text_length, unit),
+        'text': document.window_text,
+        'tags': [_tag_to_dict(tag, offset_map, unit) for tag in tags],
+    })
+
+
 @login_required
 def document_create(request):
-    """문서 생성 페이지"""
+    """문서 생성 페이지 (여러 JSONL 파일과 .jsonl.gz/zip/tar 아카이브 업로드)"""
     if request.method == 'POST':
-        if 'jsonl_file' in request.FILES:
-            # JSONL 파일 처리
-            jsonl_file = request.FILES['jsonl_file']
-            if jsonl_file.name.endswith('.jsonl'):
+        uploads = request.FILES.getlist('jsonl_file')
+        policy = request.POST.get('duplicate_policy', IMPORT_FAIL)
+        if uploads:
+            if all(is_supported(upload.name) for upload in uploads):
                 try:
-                    content = jsonl_file.read().decode('utf-8')
-                    lines = [line for line in content.strip().split('\n') if line.strip()]
-
-                    # 1) 파싱하여 업로드 대상 data_id 수집
-                    parsed_rows = []
-                    upload_data_ids = []
-                    for line in lines:
-                        data = json.loads(line)
-                        metadata = data.get('metadata', {})
-                        data_id_value = metadata.get('data_id', '')
-                        parsed_rows.append((data, metadata, data_id_value))
-                        upload_data_ids.append(data_id_value)
-
-                    # 2) 파일 내부 data_id 중복 검사
-                    duplicate_in_file = {x for x in upload_data_ids if upload_data_ids.count(x) > 1}
-                    if duplicate_in_file:
-                        messages.error(
-                            request,
-                            f"업로드 파일 내 중복 data_id가 발견되어 업로드를 중단했습니다: {', '.join(sorted(duplicate_in_file))}"
-                        )
-                        return render(request, 'main/document_create.html')
-
-                    # 3) DB 중복 검사 (사용자 기준)
-                    existing = set(
-                        Document.objects.filter(
-                            data_id__in=upload_data_ids,
-                            created_by=request.user
-                        ).values_list('data_id', flat=True)
+                    report = import_documents(
+                        [(upload.name, upload) for upload in uploads],
+                        request.user,
+                        workers=settings.IMPORT_WORKERS,
+                        policy=policy,
+                        offset_unit=request.POST.get('offset_unit') or CODEPOINT,
                     )
-                    if existing:
-                        messages.error(
+
+                    if request.POST.get('preannotate'):
+                        summary = preannotate_documents(
+                            Document.objects.filter(id__in=report['document_ids']),
+                            request.user,
+                        )
+                        messages.info(request, f"자동 태깅으로 {summary['created']}개의 태그가 제안되었습니다.")
+
+                    for shard in report['shards']:
+                        messages.info(
                             request,
-                            f"이미 존재하는 data_id가 있어 업로드를 중단했습니다: {', '.join(sorted(existing))}"
+                            f"{shard['shard']}: 문서 {shard['documents']}개 생성, {shard['overwritten']}개 갱신, "
+                            f"태그 {shard['tags']}개 추가/{shard['tags_updated']}개 수정/{shard['tags_deleted']}개 삭제, "
+                            f"건너뛴 줄 {shard['rejected']}개"
                         )
-                        return render(request, 'main/document_create.html')
-
-                    # 4) 트랜잭션으로 일괄 생성. 중간 오류 시 전체 롤백
-                    with transaction.atomic():
-                        for data, metadata, data_id_value in parsed_rows:
-                            document = Document.objects.create(
-                                data_id=data_id_value,
-                                number_of_subjects=metadata.get('number_of_subjects', 0),
-                                provenance=json.dumps(metadata.get('provenance', {}), ensure_ascii=False),
-                                text=data.get('text', ''),
-                                created_by=request.user
-                            )
+                    messages.success(
+                        request,
+                        f"{len(report['shards'])}개 샤드에서 문서 {report['documents'] + report['overwritten']}개를 업로드했습니다."
+                    )
+                    # 건너뛴 줄이 있으면 보고서를 내려받을 수 있도록 업로드 화면에 머문다
+                    _store_import_rejections(request, report['rejections'])
+                    if not report['rejections']:
+                        return redirect('document_list')
 
-                            # 엔티티 처리
-                            entities = data.get('entities', [])
-                            for entity in entities:
-                                pii_category = PIICategory.objects.filter(
-                                    value=entity.get('entity_type', '')
-                                ).first()
-
-                                if pii_category:
-                                    span_id = entity.get('span_id', '')
-                                    entity_id = entity.get('entity_id', '')
-                                    annotator = entity.get('annotator', 'Anonymous')
-                                    identifier_type = entity.get('identifier_type', 'QUASI').upper()
-                                    if not span_id:
-                                        span_id = PIITag.objects.filter(document=document).count()+1
-                                    if not entity_id:
-                                        entity_id = PIITag.objects.filter(document=document).count()+1
-                                    if not annotator:
-                                        annotator = 'Anonymous'
-                                    if not identifier_type:
-                                        identifier_type = 'QUASI'
-                                    # if identifier_type == 'no_mask':
-                                    #     if pii_category == "PERSON" or pii_category == "CODE":
-                                    #         identifier_type = 'DIRECT'
-                                    #     else:
-                                    #         identifier_type = 'QUASI'
-                                    # 공백 트림 처리
-                                    original_span_text = entity.get('span_text', '')
-                                    trimmed_span_text = original_span_text.strip()
-                                    start_offset = entity.get('start_offset', 0)
-                                    end_offset = entity.get('end_offset', 0)
-                                    
-                                    # 트림된 텍스트가 원본과 다르면 offset 조정
-                                    if trimmed_span_text != original_span_text:
-                                        left_trim_count = len(original_span_text) - len(original_span_text.lstrip())
-                                        right_trim_count = len(original_span_text) - len(original_span_text.rstrip())
-                                        
-                                        # offset 조정
-                                        start_offset = start_offset + left_trim_count
-                                        end_offset = end_offset - right_trim_count
-                                        
-                                        # end_offset이 start_offset보다 작아지지 않도록 보정
-                                        if end_offset <= start_offset:
-                                            end_offset = start_offset + len(trimmed_span_text)
-                                    if pii_category == "MASK":
-                                        pii_category = "MISC"
-                                    if trimmed_span_text == "" or end_offset == 0:
-                                        continue
-                                    PIITag.objects.create(
-                                        document=document,
-                                        pii_category=pii_category,
-                                        span_text=trimmed_span_text,
-                                        start_offset=start_offset,
-                                        end_offset=end_offset,
-                                        span_id=span_id,
-                                        entity_id=entity_id,
-                                        annotator=annotator,
-                                        identifier_type=identifier_type,
-                                        created_by=request.user
-                                    )
-
-                    messages.success(request, 'JSONL 파일이 성공적으로 업로드되었습니다.')
-                    return redirect('document_list')
-                    
+                except ImportRejected as e:
+                    _store_import_rejections(request, e.report['rejections'])
+                    for shard in e.report['shards']:
+                        if shard['duplicates']:
+                            messages.error(
+                                request,
+                                f"{shard['shard']}: 중복 data_id가 발견되어 업로드를 중단했습니다: {', '.join(shard['duplicates'][:10])}"
+                                + (' 등' if shard['rejected'] > 10 else '')
+                            )
+                        for line, error in shard['errors'][:10]:
+                            messages.error(request, f"{shard['shard']} {line}번째 줄: {error}")
                 except Exception as e:
                     messages.error(request, f'파일 처리 중 오류가 발생했습니다: {str(e)}')
             else:
-                messages.error(request, 'JSONL 파일만 업로드할 수 있습니다.')
-    
-    return render(request, 'main/document_create.html')
+                messages.error(request, 'JSONL(.jsonl, .jsonl.gz) 파일 또는 zip/tar 아카이브만 업로드할 수 있습니다.')
+
+    return render(request, 'main/document_create.html', {
+        'rejection_count': request.session.get('import_rejection_count', 0),
+    })
+
 
+def _store_import_rejections(request, rejections):
+    """거부 보고서는 파일로 저장하고 세션에는 파일 이름과 건수만 둔다 (이전 보고서 파일은 삭제)"""
+    previous = rejection_report_path(request.session.pop('import_report', None), settings.IMPORT_REPORT_ROOT)
+    if previous and os.path.exists(previous):
+        os.remove(previous)
+    request.session['import_rejection_count'] = len(rejections)
+    if rejections:
+        request.session['import_report'] = save_rejection_report(rejections, settings.IMPORT_REPORT_ROOT)
+
+
+@login_required
+def download_import_report(request):
+    """마지막 업로드의 거부 보고서 CSV 다운로드"""
+    path = rejection_report_path(request.session.get('import_report'), settings.IMPORT_REPORT_ROOT)
+    if path and os.path.exists(path):
+        return FileResponse(
+            open(path, 'rb'), as_attachment=True, filename='import_rejections.csv', content_type='text/csv; charset=utf-8',
+        )
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="import_rejections.csv"'
+    # 엑셀에서 한글이 깨지지 않도록 BOM 추가
+    response.write('\ufeff')
+    write_rejection_report([], response)
+    return response
 
 def register(request):
     """사용자 등록"""
@@ -213,15 +344,70 @@ def register(request):
     return render(request, 'main/register.html', {'form': form})
 
 
-@csrf_exempt
-@login_required
-def add_pii_tag(request):
+@transaction.atomic
+def _create_tag(document_id, **fields):
+    """태그 생성, Entity 연결, 문서 tag_count 증가를 한 트랜잭션으로 (async 뷰는 sync_to_async 로 호출)"""
+    fields['entity_ref'], _ = Entity.objects.get_or_create(
+        document_id=document_id, representative_span_id=fields['entity_id']
+    )
+    tag = PIITag.objects.create(document_id=document_id, **fields)
+    Document.objects.filter(id=document_id).touch(tag_delta=1)
+    return tag
+
+
+@transaction.atomic
+def _update_tag(tag, entity_id):
+    """태그 수정과 Entity 교체/정리, 문서 수정 시각 갱신을 한 트랜잭션으로"""
+    previous_entity_id = tag.entity_ref_id
+    if entity_id != tag.entity_id:
+        tag.entity_id = entity_id
+        tag.entity_ref = None
+        if entity_id:
+            tag.entity_ref, _ = Entity.objects.get_or_create(
+                document_id=tag.document_id, representative_span_id=entity_id
+            )
+    # save() 는 id 만으로 UPDATE 하므로 document_id 를 함께 걸러 파티션 하나만 갱신
+    PIITag.objects.filter(id=tag.id, document_id=tag.document_id).update(
+        pii_category=tag.pii_category, identifier_type=tag.identifier_type, entity_id=tag.entity_id,
+        entity_ref_id=tag.entity_ref_id, annotator=tag.annotator,
+    )
+    if previous_entity_id != tag.entity_ref_id:
+        Entity.objects.filter(id=previous_entity_id).empty().delete()
+    Document.objects.filter(id=tag.document_id).touch()
+
+
+@transaction.atomic
+def _delete_tag(tag):
+    """태그 삭제, Entity 대표 교체/정리, 문서 tag_count 감소를 한 트랜잭션으로 (남은 Entity 반환)"""
+    entity = tag.entity_ref
+    PIITag.objects.filter(id=tag.id, document_id=tag.document_id).delete()
+    # 부모(대표) 태그를 삭제하면 남은 태그 중 가장 작은 숫자 span_id 가 새 대표가 된다 (entity 단위 UPDATE)
+    if entity is not None and tag.span_id == entity.representative_span_id:
+        entity = entity.reparent()
+    elif entity is not None:
+        Entity.objects.filter(id=entity.id).empty().delete()
+        entity = None
+    Document.objects.filter(id=tag.document_id).touch(tag_delta=-1)
+    return entity
+
+
+@transaction.atomic
+def _delete_document(document):
+    """문서와 더 이상 참조되지 않는 본문을 한 트랜잭션으로 삭제"""
+    document.delete()
+    DocumentBody.objects.filter(id=document.body_id).orphaned().delete()
+
+
+@async_csrf_exempt
+@async_login_required
+async def add_pii_tag(request):
     """PII 태그 추가"""
     if request.method == 'POST':
         try:
             document_id = request.POST.get('document_id')
             pii_category_value = request.POST.get('pii_category_value')
             span_text = request.POST.get('span_text')
+            offset_unit = _offset_unit(request)
             start_offset = int(request.POST.get('start_offset', 0))
             end_offset = int(request.POST.get('end_offset', 0))
             span_id = request.POST.get('span_id', '')
@@ -229,8 +415,15 @@ def add_pii_tag(request):
             annotator = request.POST.get('annotator', 'Anonymous')
             identifier_type = request.POST.get('identifier_type', 'QUASI')
             
-            document = get_object_or_404(Document, id=document_id)
-            pii_category = get_object_or_404(PIICategory, value=pii_category_value)
+            document = await aget_object_or_404(
+                _annotate_offset_maps(Document.objects.only('id'), offset_unit), id=document_id
+            )
+            pii_category = await aget_object_or_404(PIICategory, value=pii_category_value)
+            
+            # 요청 단위의 오프셋을 저장 단위(코드 포인트)로 변환
+            offset_map = _annotated_offset_map(document)
+            start_offset = offset_map.from_unit(start_offset, offset_unit)
+            end_offset = offset_map.from_unit(end_offset, offset_unit)
             
             # 공백 트림 처리
             original_span_text = span_text
@@ -255,41 +448,27 @@ def add_pii_tag(request):
                 end_offset = adjusted_end_offset
             
             # 중복 태그 확인 (조정된 offset으로)
-            existing_tag = PIITag.objects.filter(
+            if await PIITag.objects.filter(
                 document=document,
                 start_offset=start_offset,
                 end_offset=end_offset
-            ).first()
-            
-            if existing_tag:
+            ).aexists():
                 return JsonResponse({'success': False, 'message': '이미 해당 위치에 태그가 있습니다.'})
             
-            # 자동 ID 생성
+            # 자동 ID 생성: 해당 문서의 숫자 span_id 중 가장 높은 값 다음
             if not span_id:
-                # 해당 문서의 모든 태그에서 가장 높은 span_id 찾기
-                existing_tags = PIITag.objects.filter(document=document)
-                if existing_tags.exists():
-                    # 숫자인 span_id들만 필터링해서 가장 높은 값 찾기
-                    numeric_span_ids = []
-                    for tag in existing_tags:
-                        try:
-                            numeric_span_ids.append(int(tag.span_id))
-                        except (ValueError, TypeError):
-                            continue
-                    
-                    if numeric_span_ids:
-                        max_span_id = max(numeric_span_ids)
-                        span_id = str(max_span_id + 1)
-                    else:
-                        span_id = "1"
-                else:
-                    span_id = "1"
+                numeric_span_ids = [
+                    int(value)
+                    async for value in PIITag.objects.filter(document=document).values_list('span_id', flat=True)
+                    if value.isdigit()
+                ]
+                span_id = str(max(numeric_span_ids) + 1) if numeric_span_ids else "1"
             
             if not entity_id:
                 entity_id = span_id
             
-            new_tag = PIITag.objects.create(
-                document=document,
+            new_tag = await sync_to_async(_create_tag)(
+                document.id,
                 pii_category=pii_category,
                 span_text=span_text,
                 start_offset=start_offset,
@@ -301,28 +480,17 @@ def add_pii_tag(request):
                 created_by=request.user
             )
             
-            document.updated_at = datetime.now()
-            document.save()
-            
-            # 새로 생성된 태그의 모든 정보를 반환
+            # 새로 생성된 태그의 모든 정보를 반환 (WebSocket 이벤트의 오프셋은 에디터 단위인 UTF-16)
+            tag_data = _tag_to_dict(new_tag, offset_map, offset_unit)
+            document_info = await _adocument_info(document.id)
+            await abroadcast_tag_event(
+                document.id, 'tags_added', tags=[_tag_to_dict(new_tag, offset_map, UTF16)],
+                document_info=document_info, user=request.user
+            )
             return JsonResponse({
                 'success': True,
-                'tag': {
-                    'id': new_tag.id,
-                    'start': new_tag.start_offset,
-                    'end': new_tag.end_offset,
-                    'text': escape(new_tag.span_text),
-                    'color': new_tag.pii_category.background_color,
-                    'category': new_tag.pii_category.value,
-                    'span_id': new_tag.span_id,
-                    'entity_id': new_tag.entity_id,
-                    'annotator': escape(new_tag.annotator),
-                    'identifier_type': new_tag.identifier_type
-                },
-                'document_info': {
-                    'updated_at': document.updated_at.astimezone(timezone.get_current_timezone()).strftime('%Y-%m-%d %H:%M'),
-                    'pii_count': document.pii_tags.count()
-                }
+                'tag': tag_data,
+                'document_info': document_info
             })
             
         except Exception as e:
@@ -333,66 +501,137 @@ def add_pii_tag(request):
 
 @csrf_exempt
 @login_required
-def delete_pii_tag(request):
-    """PII 태그 삭제"""
+def preannotate_document(request):
+    """문서 자동 태깅 (정규식/사전 탐지기 제안 태그 생성)"""
+    if request.method == 'POST':
+        try:
+            document_id = request.POST.get('document_id')
+            offset_unit = _offset_unit(request)
+            document = get_object_or_404(
+                _annotate_offset_maps(Document.objects.only('id'), offset_unit), id=document_id, created_by=request.user
+            )
+            offset_map = _annotated_offset_map(document)
+            summary = preannotate_documents(
+                Document.objects.filter(id=document.id),
+                request.user,
+                return_tags=True
+            )
+            tags = summary.pop('tags')
+            created_tags = [_tag_to_dict(tag, offset_map, offset_unit) for tag in tags]
+            document_info = _document_info(document.id)
+            if created_tags:
+                broadcast_tag_event(
+                    document.id, 'tags_added', tags=[_tag_to_dict(tag, offset_map, UTF16) for tag in tags],
+                    document_info=document_info, user=request.user
+                )
+            return JsonResponse({
+                'success': True,
+                'summary': summary,
+                'tags': created_tags,
+                'document_info': document_info
+            })
+        except Exception as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+
+    return JsonResponse({'success': False, 'message': 'POST 요청만 허용됩니다.'})
+
+
+@csrf_exempt
+@login_required
+def propagate_pii_tag(request):
+    """태그된 스팬의 다른 출현 위치를 문서/코퍼스 전체에서 일괄 태깅"""
+    if request.method == 'POST':
+        try:
+            tag_ids = request.POST.getlist('tag_ids') or [request.POST.get('tag_id')]
+            offset_unit = _offset_unit(request)
+            scope = request.POST.get('scope', 'document')
+            normalize = request.POST.get('normalize') in ('1', 'true', 'True')
+            whole_word = request.POST.get('whole_word') in ('1', 'true', 'True')
+            if scope not in ('document', 'corpus'):
+                return JsonResponse({'success': False, 'message': 'scope는 document 또는 corpus 여야 합니다.'})
+
+            source_tags = list(PIITag.objects.in_document(request.POST.get('document_id')).filter(
+                id__in=tag_ids,
+                document__created_by=request.user
+            ).select_related('pii_category'))
+            if not source_tags:
+                return JsonResponse({'success': False, 'message': '전파할 태그를 찾을 수 없습니다.'})
+
+            with transaction.atomic():
+                created_tags = propagate_tags(
+                    source_tags,
+                    propagation_scope(source_tags, request.user, scope),
+                    request.user,
+                    normalize=normalize,
+                    whole_word=whole_word
+                )
+                touched_ids = {tag.document_id for tag in created_tags}
+                Document.objects.filter(id__in=touched_ids).recount_tags()
+                Document.objects.filter(id__in=touched_ids).sync_entities()
+                offset_maps = {
+                    document.id: _annotated_offset_map(document)
+                    for document in _annotate_offset_maps(Document.objects.filter(id__in=touched_ids).only('id'), offset_unit)
+                }
+                tags_by_document = {}
+                for tag in created_tags:
+                    tags_by_document.setdefault(tag.document_id, []).append(
+                        _tag_to_dict(tag, offset_maps[tag.document_id], UTF16)
+                    )
+                for document_id, tags in tags_by_document.items():
+                    broadcast_tag_event(document_id, 'tags_added', tags=tags, user=request.user)
+
+            response = {
+                'success': True,
+                'created_count': len(created_tags),
+                'document_count': len(touched_ids),
+                'tags': [
+                    dict(_tag_to_dict(tag, offset_maps[tag.document_id], offset_unit), document_id=tag.document_id)
+                    for tag in created_tags
+                ],
+            }
+            if len(source_tags) == 1:
+                response['document_info'] = _document_info(source_tags[0].document_id)
+            return JsonResponse(response)
+        except Exception as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+
+    return JsonResponse({'success': False, 'message': 'POST 요청만 허용됩니다.'})
+
+
+@async_csrf_exempt
+@async_login_required
+async def delete_pii_tag(request):
+    """PII 태그 삭제 (document_id 를 함께 보내면 태그 파티션 하나만 읽음)"""
     if request.method == 'POST':
         try:
             tag_id = request.POST.get('tag_id')
-            tag = get_object_or_404(PIITag, id=tag_id)
-            
-            # 삭제할 태그의 정보 저장
-            document = tag.document
-            deleted_entity_id = tag.entity_id
-            deleted_span_id = tag.span_id
-            
-            # 삭제될 태그가 부모 태그인지 확인 (span_id == entity_id)
-            is_parent_tag = str(deleted_span_id) == str(deleted_entity_id)
-            
-            # 부모 태그 삭제 시 자식 태그들 처리
-            updated_tags = []
-            if is_parent_tag:
-                # 같은 entity_id를 가진 모든 자식 태그들 찾기
-                child_tags = PIITag.objects.filter(
-                    document=document,
-                    entity_id=deleted_entity_id
-                ).exclude(id=tag_id).order_by('span_id')
-                
-                if child_tags.exists():
-                    # 다음으로 가장 낮은 span_id 찾기 (새로운 부모)
-                    new_parent_span_id = min(int(child.span_id) for child in child_tags if child.span_id.isdigit())
-                    new_parent_entity_id = str(new_parent_span_id)
-                    
-                    # 모든 자식 태그들의 entity_id를 새로운 부모로 변경
-                    for child_tag in child_tags:
-                        child_tag.entity_id = new_parent_entity_id
-                        child_tag.save()
-                        
-                        # 업데이트된 태그 정보 저장
-                        updated_tags.append({
-                            'id': child_tag.id,
-                            'start': child_tag.start_offset,
-                            'end': child_tag.end_offset,
-                            'text': child_tag.span_text,
-                            'color': child_tag.pii_category.background_color,
-                            'category': child_tag.pii_category.value,
-                            'span_id': child_tag.span_id,
-                            'entity_id': child_tag.entity_id,
-                            'annotator': child_tag.annotator,
-                            'identifier_type': child_tag.identifier_type
-                        })
-            
-            # 태그 삭제
-            tag.delete()
-            document.updated_at = datetime.now()
-            document.save()
+            offset_unit = _offset_unit(request)
+            tag = await aget_object_or_404(
+                _annotate_offset_maps(
+                    PIITag.objects.in_document(request.POST.get('document_id')).select_related('entity_ref'),
+                    offset_unit, body='document__body',
+                ),
+                id=tag_id
+            )
+            offset_map = _annotated_offset_map(tag)
+            document_id = tag.document_id
+            # 대표 태그를 지웠으면 새 대표로 바뀐 Entity 의 남은 태그를 에디터에 다시 보낸다
+            entity = await sync_to_async(_delete_tag)(tag)
+            child_tags = []
+            if entity is not None:
+                child_tags = [
+                    child_tag async for child_tag in entity.document_tags.select_related('pii_category').order_by('span_id')
+                ]
+            document_info = await _adocument_info(document_id)
+            await abroadcast_tag_event(
+                document_id, 'tags_deleted', tags=[_tag_to_dict(child_tag, offset_map, UTF16) for child_tag in child_tags],
+                deleted_ids=[int(tag_id)], document_info=document_info, user=request.user
+            )
             return JsonResponse({
                 'success': True,
-                'updated_tags': updated_tags,
+                'updated_tags': [_tag_to_dict(child_tag, offset_map, offset_unit) for child_tag in child_tags],
                 'deleted_tag_id': tag_id,
-                'document_info': {
-                    'updated_at': document.updated_at.astimezone(timezone.get_current_timezone()).strftime('%Y-%m-%d %H:%M'),
-                    'pii_count': document.pii_tags.count()
-                }
+                'document_info': document_info
             })
             
         except Exception as e:
@@ -401,10 +640,10 @@ def delete_pii_tag(request):
     return JsonResponse({'success': False, 'message': 'POST 요청만 허용됩니다.'})
 
 
-@csrf_exempt
-@login_required
-def update_pii_tag(request):
-    """PII 태그 업데이트"""
+@async_csrf_exempt
+@async_login_required
+async def update_pii_tag(request):
+    """PII 태그 업데이트 (document_id 를 함께 보내면 태그 파티션 하나만 읽음)"""
     if request.method == 'POST':
         try:
             tag_id = request.POST.get('tag_id')
@@ -412,27 +651,31 @@ def update_pii_tag(request):
             identifier_type = request.POST.get('identifier_type', 'QUASI')
             entity_id = request.POST.get('entity_id', '')
             
-            tag = get_object_or_404(PIITag, id=tag_id)
+            tag = await aget_object_or_404(
+                _annotate_offset_maps(
+                    PIITag.objects.in_document(request.POST.get('document_id')).select_related('pii_category'),
+                    UTF16, body='document__body',
+                ),
+                id=tag_id
+            )
             
             if pii_category_value:
-                pii_category = get_object_or_404(PIICategory, value=pii_category_value)
+                pii_category = await aget_object_or_404(PIICategory, value=pii_category_value)
                 tag.pii_category = pii_category
             
             tag.identifier_type = identifier_type or 'QUASI'
-            tag.entity_id = entity_id
             tag.annotator = request.user.username
-            tag.save()
-            document = tag.document
-            document.updated_at = datetime.now()
-            document.save()
+            await sync_to_async(_update_tag)(tag, entity_id)
+            document_info = await _adocument_info(tag.document_id)
+            await abroadcast_tag_event(
+                tag.document_id, 'tags_updated', tags=[_tag_to_dict(tag, _annotated_offset_map(tag), UTF16)],
+                document_info=document_info, user=request.user
+            )
             return JsonResponse({
                 'success': True, 
-                'new_color': pii_category.background_color, 
+                'new_color': tag.pii_category.background_color, 
                 'new_category': tag.pii_category.value,
-                'document_info': {
-                    'updated_at': document.updated_at.astimezone(timezone.get_current_timezone()).strftime('%Y-%m-%d %H:%M'),
-                    'pii_count': document.pii_tags.count()
-                }
+                'document_info': document_info
             })
             
         except Exception as e:
@@ -441,15 +684,16 @@ def update_pii_tag(request):
     return JsonResponse({'success': False, 'message': 'POST 요청만 허용됩니다.'})
 
 
-@csrf_exempt
-@login_required
-def delete_document(request):
+@async_csrf_exempt
+@async_login_required
+async def delete_document(request):
     """문서 삭제"""
     if request.method == 'POST':
         try:
             document_id = request.POST.get('document_id')
-            document = get_object_or_404(Document, id=document_id)
-            document.delete()
+            document = await aget_object_or_404(Document.objects.only('id', 'body_id'), id=document_id)
+            await sync_to_async(_delete_document)(document)
+            await abroadcast_tag_event(int(document_id), 'document_deleted', user=request.user)
             return JsonResponse({'success': True})
         except Exception as e:
             return JsonResponse({'success': False, 'message': str(e)})
@@ -464,34 +708,44 @@ def bulk_delete_documents(request):
     if request.method == 'POST':
         try:
             document_ids = request.POST.getlist('document_ids')
-            Document.objects.filter(id__in=document_ids).delete()
-            return JsonResponse({'success': True, 'deleted_count': len(document_ids)})
+            # 자기 문서만 삭제 (묶음마다 커밋하므로 중간에 실패해도 앞 묶음은 삭제된 상태)
+            documents = Document.objects.filter(id__in=document_ids, created_by=request.user)
+            deleted_count = 0
+            for deleted_ids, deleted_count, total in documents.delete_in_chunks(settings.BULK_DELETE_CHUNK_SIZE):
+                logger.info('문서 일괄 삭제 (%s): %d/%d', request.user.username, deleted_count, total)
+                for document_id in deleted_ids:
+                    broadcast_tag_event(document_id, 'document_deleted', user=request.user)
+            return JsonResponse({'success': True, 'deleted_count': deleted_count})
         except Exception as e:
             return JsonResponse({'success': False, 'message': str(e)})
     
     return JsonResponse({'success': False, 'message': 'POST 요청만 허용됩니다.'})
 
 
+@use_read_replica
 def download_jsonl(request):
-    """JSONL 다운로드"""
+    """JSONL 다운로드 (offset_unit 으로 오프셋 단위 선택: codepoint, utf16, utf8)"""
+    try:
+        offset_unit = _offset_unit(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)})
     document_ids = request.POST.getlist('document_ids')
-    documents = Document.objects.filter(id__in=document_ids)
+    documents = Document.objects.filter(id__in=document_ids).select_related('body').prefetch_related(
+        Prefetch('pii_tags', queryset=PIITag.objects.select_related('pii_category'))
+    )
     
     response = HttpResponse(content_type='application/jsonl')
     response['Content-Disposition'] = 'attachment; filename="documents.jsonl"'
     
     for document in documents:
-        pii_tags = PIITag.objects.filter(document=document)
+        pii_tags = document.pii_tags.all()
+        offset_map = document.body.offset_map()
         
         # 메타데이터 구성
-        try:
-            provenance_obj = json.loads(document.provenance) if document.provenance else {}
-        except Exception:
-            provenance_obj = document.provenance or {}
         metadata = {
             'data_id': document.data_id,
             'number_of_subjects': document.number_of_subjects,
-            'provenance': provenance_obj
+            'provenance': document.provenance
         }
         
         # 엔티티 구성
@@ -500,8 +754,8 @@ def download_jsonl(request):
             entities.append({
                 'span_text': tag.span_text,
                 'entity_type': tag.pii_category.value,
-                'start_offset': tag.start_offset,
-                'end_offset': tag.end_offset,
+                'start_offset': offset_map.to_unit(tag.start_offset, offset_unit),
+                'end_offset': offset_map.to_unit(tag.end_offset, offset_unit),
                 'span_id': tag.span_id,
                 'entity_id': tag.entity_id,
                 'annotator': tag.annotator,
@@ -517,4 +771,371 @@ def download_jsonl(request):
         
         response.write(json.dumps(jsonl_data, ensure_ascii=False) + '\n')
     
-    return response
\ No newline at end of file
+    return response
+
+@login_required
+@use_read_replica
+def download_deidentified(request):
+    """비식별화된 JSONL 다운로드 (identifier_type 별 마스킹/가명 규칙, 스트리밍)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'POST 요청만 허용됩니다.'})
+    try:
+        rules = validate_rules({
+            identifier_type: request.POST[f'{identifier_type.lower()}_rule']
+            for identifier_type in DEFAULT_RULES if f'{identifier_type.lower()}_rule' in request.POST
+        })
+        offset_unit = _offset_unit(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+    documents = Document.objects.filter(created_by=request.user, id__in=request.POST.getlist('document_ids'))
+    response = StreamingHttpResponse(
+        iter_deidentified(
+            documents, rules, workers=settings.EXPORT_WORKERS, chunk_size=settings.EXPORT_CHUNK_SIZE,
+            offset_unit=offset_unit,
+        ),
+        content_type='application/jsonl',
+    )
+    response['Content-Disposition'] = 'attachment; filename="documents_deidentified.jsonl"'
+    return response
+
+
+@login_required
+@use_read_replica
+def download_conll(request):
+    """토큰 단위 BIO 학습 데이터 다운로드 (CoNLL 또는 JSONL, 토크나이저 선택, 스트리밍)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'POST 요청만 허용됩니다.'})
+    output_format = request.POST.get('format') or CONLL
+    documents = Document.objects.filter(created_by=request.user, id__in=request.POST.getlist('document_ids'))
+    try:
+        blocks = iter_conll(
+            documents,
+            request.POST.get('tokenizer') or 'whitespace',
+            pattern=request.POST.get('pattern'),
+            output_format=output_format,
+            workers=settings.EXPORT_WORKERS,
+            chunk_size=settings.EXPORT_CHUNK_SIZE,
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+    content_type, extension = ('application/jsonl', 'jsonl') if output_format == CONLL_JSONL else ('text/plain', 'conll')
+    response = StreamingHttpResponse(blocks, content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="documents_bio.{extension}"'
+    return response
+
+
+@login_required
+def profiling_data(request):
+    """최근 요청 프로파일 조회 (staff 전용)"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'message': '권한이 없습니다.'}, status=403)
+
+    profiles = get_recent_profiles()
+    try:
+        min_queries = int(request.GET.get('min_queries', 0))
+    except ValueError:
+        min_queries = 0
+    if min_queries:
+        profiles = [p for p in profiles if p['query_count'] >= min_queries]
+
+    return JsonResponse({
+        'success': True,
+        'enabled': settings.QUERY_PROFILING,
+        'profiles': profiles[::-1],
+    })
+
+
+@login_required
+@use_read_replica
+def search(request):
+    """문서/태그 검색
+
+    mode=text: 본문 부분 문자열, mode=words: 본문 단어, mode=span: 태그된 스팬 값,
+    mode=category: category 와 스팬 값 (exact=1 이면 완전 일치, (category, span_text) 인덱스 사용)
+    """
+    query = request.GET.get('q', '').strip()
+    mode = request.GET.get('mode', 'text')
+    category = request.GET.get('category', '')
+    exact = request.GET.get('exact') in ('1', 'true', 'True')
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 500)
+    except ValueError:
+        limit = 50
+
+    if not query and mode != 'category':
+        return JsonResponse({'success': False, 'message': '검색어(q)를 입력해주세요.'})
+    if mode == 'category' and not category:
+        return JsonResponse({'success': False, 'message': 'category를 지정해주세요.'})
+
+    results = []
+    if mode in ('text', 'words'):
+        documents = Document.objects.filter(created_by=request.user)
+        if mode == 'text':
+            documents = filter_documents_by_text(documents, query)
+        else:
+            documents = filter_documents_by_words(documents, query)
+        documents = list(documents.order_by('id').only('id', 'data_id', 'body__text').select_related('body')[:limit + 1])
+        for document in documents[:limit]:
+            results.append({
+                'document_id': document.id,
+                'data_id': document.data_id,
+                'snippet': make_snippet(document.text, query),
+            })
+        has_more = len(documents) > limit
+    elif mode in ('span', 'category'):
+        tags = PIITag.objects.filter(document__created_by=request.user)
+        if mode == 'category':
+            tags = tags.filter(pii_category__value=category)
+        if query:
+            tags = filter_tags_by_span(tags, query, exact=exact)
+        tags = list(
+            tags.order_by('document_id', 'start_offset')
+            .values(
+                'id', 'document_id', 'document__data_id', 'pii_category__value',
+                'span_text', 'start_offset', 'end_offset', 'entity_id', 'identifier_type'
+            )[:limit + 1]
+        )
+        for tag in tags[:limit]:
+            results.append({
+                'tag_id': tag['id'],
+                'document_id': tag['document_id'],
+                'data_id': tag['document__data_id'],
+                'category': tag['pii_category__value'],
+                'span_text': tag['span_text'],
+                'start': tag['start_offset'],
+                'end': tag['end_offset'],
+                'entity_id': tag['entity_id'],
+                'identifier_type': tag['identifier_type'],
+            })
+        has_more = len(tags) > limit
+    else:
+        return JsonResponse({'success': False, 'message': 'mode는 text, words, span, category 중 하나여야 합니다.'})
+
+    return JsonResponse({
+        'success': True,
+        'mode': mode,
+        'backend': search_backend(),
+        'results': results,
+        'has_more': has_more,
+    })
+
+
+@login_required
+@use_read_replica
+def agreement(request):
+    """주석자 간 일치도 (staff 전용)
+
+    data_id 를 지정하면 해당 문서만, 생략하면 data_id 를 공유하는 코퍼스 전체를 계산한다.
+    users 로 비교할 사용자명을 제한할 수 있고 refresh=1 이면 캐시를 무시한다.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'message': '권한이 없습니다.'}, status=403)
+
+    # gold 문서는 주석자 비교에서 제외
+    documents = Document.objects.exclude(created_by=get_gold_user())
+    data_id = request.GET.get('data_id')
+    usernames = [name for name in request.GET.getlist('users') if name]
+    if data_id:
+        documents = documents.filter(data_id=data_id)
+    if usernames:
+        documents = documents.filter(created_by__username__in=usernames)
+
+    result = cached_agreement(
+        documents,
+        cache_key_parts=(data_id, tuple(sorted(usernames))),
+        refresh=request.GET.get('refresh') in ('1', 'true', 'True'),
+    )
+    return JsonResponse({'success': True, **result})
+
+
+@csrf_exempt
+@login_required
+def adjudicate(request):
+    """data_id 의 여러 주석을 투표로 병합하여 gold 문서 생성 (staff 전용)"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'message': '권한이 없습니다.'}, status=403)
+
+    if request.method == 'POST':
+        try:
+            data_id = request.POST.get('data_id')
+            strategy = request.POST.get('strategy', 'majority')
+            usernames = [name for name in request.POST.getlist('users') if name]
+            if not data_id:
+                return JsonResponse({'success': False, 'message': 'data_id를 지정해주세요.'})
+            if strategy not in STRATEGIES:
+                return JsonResponse({'success': False, 'message': 'strategy는 majority, union, intersection 중 하나여야 합니다.'})
+
+            documents = Document.objects.filter(data_id=data_id)
+            if usernames:
+                documents = documents.filter(created_by__username__in=usernames)
+            gold_user = get_gold_user()
+            summary = adjudicate_corpus(documents, strategy=strategy, gold_user=gold_user)
+            if not summary['documents']:
+                return JsonResponse({'success': False, 'message': '두 명 이상이 라벨링한 문서가 없습니다.'})
+
+            gold_document = Document.objects.get(data_id=data_id, created_by=gold_user)
+            return JsonResponse({
+                'success': True,
+                'summary': summary,
+                'document_id': gold_document.id,
+                'tag_count': gold_document.tag_count,
+            })
+        except Exception as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+
+    return JsonResponse({'success': False, 'message': 'POST 요청만 허용됩니다.'})
+
+
+# 릴리스 파일 확장자별 Content-Type
+RELEASE_CONTENT_TYPES = {
+    '.json': 'application/json',
+    '.jsonl': 'application/jsonl',
+    '.gz': 'application/gzip',
+    '.zst': 'application/zstd',
+}
+
+
+@login_required
+def release_list(request):
+    """데이터셋 릴리스 목록 페이지"""
+    releases = DatasetRelease.objects.visible_to(request.user).select_related('created_by')
+    return render(request, 'main/release_list.html', {'releases': releases})
+
+
+@csrf_exempt
+@login_required
+def create_release(request):
+    """선택한 문서(생략하면 내 문서 전체)로 변경되지 않는 데이터셋 릴리스 생성"""
+    if request.method == 'POST':
+        try:
+            document_ids = [document_id for document_id in request.POST.getlist('document_ids') if document_id]
+            documents = Document.objects.filter(created_by=request.user)
+            filters = {'username': request.user.username}
+            if document_ids:
+                documents = documents.filter(id__in=document_ids)
+                filters['document_ids'] = sorted(int(document_id) for document_id in document_ids)
+            if not documents.exists():
+                return JsonResponse({'success': False, 'message': '릴리스할 문서가 없습니다.'})
+
+            shard_size = request.POST.get('shard_size')
+            release = build_release(
+                request.POST.get('name', '').strip(),
+                request.user,
+                documents,
+                filters=filters,
+                compression=request.POST.get('compression', 'gzip') or None,
+                shard_size=int(shard_size) if shard_size else None,
+            )
+            return JsonResponse({
+                'success': True,
+                'name': release.name,
+                'document_count': release.document_count,
+                'tag_count': release.tag_count,
+                'files': release.files,
+            })
+        except Exception as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+
+    return JsonResponse({'success': False, 'message': 'POST 요청만 허용됩니다.'})
+
+
+@login_required
+def release_file(request, name, filename):
+    """릴리스의 manifest.json 또는 샤드 파일 전송
+
+    권한을 확인한 뒤 RELEASE_ACCEL_REDIRECT 가 있으면 nginx 에 넘기고(X-Accel-Redirect, sendfile),
+    없으면 FileResponse 로 보낸다. 완료된 릴리스 파일은 바뀌지 않으므로 immutable 로 캐시한다.
+    """
+    release = get_object_or_404(
+        DatasetRelease.objects.visible_to(request.user), name=name, status=DatasetRelease.READY
+    )
+    if filename not in release.files:
+        raise Http404('릴리스에 없는 파일입니다.')
+
+    content_type = RELEASE_CONTENT_TYPES.get(os.path.splitext(filename)[1], 'application/octet-stream')
+    if settings.RELEASE_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f'{settings.RELEASE_ACCEL_REDIRECT.rstrip("/")}/{name}/{filename}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    else:
+        path = os.path.join(release_directory(name), filename)
+        if not os.path.isfile(path):
+            raise Http404('릴리스 파일이 없습니다.')
+        response = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type=content_type)
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+
+# 검토 큐 한 번에 돌려주는 최대 항목 수
+MAX_REVIEW_ITEMS = 500
+
+
+@login_required
+@use_read_replica
+def review_queue(request):
+    """라벨 일관성 검토 큐 (우선순위 순, staff 전용)
+
+    kind 로 유형을, data_id 로 문서를 제한하고 dismissed=1 이면 무시한 항목도 포함한다.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'message': '권한이 없습니다.'}, status=403)
+
+    items = ReviewItem.objects.select_related('document')
+    if request.GET.get('dismissed') not in ('1', 'true', 'True'):
+        items = items.filter(dismissed=False)
+    kinds = [kind for kind in request.GET.getlist('kind') if kind]
+    if kinds:
+        items = items.filter(kind__in=kinds)
+    if request.GET.get('data_id'):
+        items = items.filter(document__data_id=request.GET['data_id'])
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), MAX_REVIEW_ITEMS)
+    except ValueError:
+        limit = 50
+    return JsonResponse({
+        'success': True,
+        'total': items.count(),
+        'items': [review_item_to_dict(item) for item in items[:limit]],
+    })
+
+
+@csrf_exempt
+@login_required
+def check_consistency(request):
+    """변경된 문서만 다시 읽어 라벨 일관성 검토 큐 갱신 (staff 전용, full=1 이면 처음부터)"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'message': '권한이 없습니다.'}, status=403)
+
+    if request.method == 'POST':
+        try:
+            summary = run_consistency_check(
+                rules=load_rules(),
+                full=request.POST.get('full') in ('1', 'true', 'True'),
+                chunk_size=settings.EXPORT_CHUNK_SIZE,
+            )
+            return JsonResponse({'success': True, 'summary': summary})
+        except Exception as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+
+    return JsonResponse({'success': False, 'message': 'POST 요청만 허용됩니다.'})
+
+
+@csrf_exempt
+@login_required
+def dismiss_review_item(request):
+    """검토 항목 무시 (문제없는 라벨로 판단, 다시 검사해도 무시 상태 유지, staff 전용)"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'message': '권한이 없습니다.'}, status=403)
+
+    if request.method == 'POST':
+        try:
+            updated = ReviewItem.objects.filter(id=request.POST.get('item_id')).update(dismissed=True)
+            if not updated:
+                return JsonResponse({'success': False, 'message': '검토 항목을 찾을 수 없습니다.'})
+            return JsonResponse({'success': True})
+        except Exception as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+
+    return JsonResponse({'success': False, 'message': 'POST 요청만 허용됩니다.'})
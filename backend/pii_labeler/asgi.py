@@ -2,6 +2,7 @@
 ASGI config for pii_labeler project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP 요청은 Django 로, WebSocket(/ws/documents/<id>/)은 main.realtime 으로 전달합니다.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +14,22 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pii_labeler.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# 앱 로딩(get_asgi_application) 이후에 모델을 사용하는 모듈을 import 한다
+from main.realtime import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        await websocket_application(scope, receive, send)
+    elif scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    else:
+        await django_application(scope, receive, send)
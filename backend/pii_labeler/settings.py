@@ -75,7 +75,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # WhiteNoise 의 async 지원판 (ASGI 에서 async 뷰가 sync 스레드를 거치지 않도록)
+    "main.middleware.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -84,6 +85,14 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# 요청 단위 쿼리/지연 프로파일링 (opt-in)
+QUERY_PROFILING = env.bool('QUERY_PROFILING', default=False)
+QUERY_PROFILING_THRESHOLD = env.int('QUERY_PROFILING_THRESHOLD', default=50)
+QUERY_PROFILING_BUFFER_SIZE = env.int('QUERY_PROFILING_BUFFER_SIZE', default=200)
+QUERY_PROFILING_TRACE_MEMORY = env.bool('QUERY_PROFILING_TRACE_MEMORY', default=False)
+if QUERY_PROFILING:
+    MIDDLEWARE.insert(0, "main.middleware.QueryProfilingMiddleware")
+
 ROOT_URLCONF = "pii_labeler.urls"
 
 TEMPLATES = [
@@ -110,7 +119,7 @@ WSGI_APPLICATION = "pii_labeler.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": env('DB_ENGINE', default="django.db.backends.postgresql"),
         "NAME": env('DB_NAME', default='pii_labeler_db'),
         "USER": env('DB_USER', default='postgres'),
         "PASSWORD": env('DB_PASSWORD', default='postgres'),
@@ -158,3 +167,60 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'  # 로그인 후 메인 페이지로 이동
 LOGOUT_REDIRECT_URL = '/'  # 로그아웃 후 메인 페이지로 이동
+
+# 자동 사전 태깅 (main/preannotation.py)
+PREANNOTATION_DICTIONARY_PATH = env('PREANNOTATION_DICTIONARY_PATH', default='')
+PREANNOTATION_WORKERS = env.int('PREANNOTATION_WORKERS', default=os.cpu_count() or 1)
+
+# 판정 병합 gold 문서 소유 사용자 (main/adjudication.py)
+ADJUDICATION_USERNAME = env('ADJUDICATION_USERNAME', default='gold')
+
+# 긴 문서 구간 렌더링 (main/segments.py): 이 글자 수를 넘는 문서는 구간 단위로 불러온다
+DOCUMENT_SEGMENT_SIZE = env.int('DOCUMENT_SEGMENT_SIZE', default=2000)
+DOCUMENT_SEGMENT_THRESHOLD = env.int('DOCUMENT_SEGMENT_THRESHOLD', default=20000)
+
+# 문서 업로드 (main/importer.py): 업로드 요청에서 샤드를 파싱할 프로세스 수 (1 이면 요청 프로세스에서 파싱)
+IMPORT_WORKERS = env.int('IMPORT_WORKERS', default=1)
+# 업로드 화면의 거부 보고서 CSV 를 저장하는 디렉터리 (세션에는 파일 이름만 저장)
+IMPORT_REPORT_ROOT = env('IMPORT_REPORT_ROOT', default=str(BASE_DIR / 'import_reports'))
+
+# 문서 일괄 삭제를 나누어 커밋하는 묶음 크기 (Document.objects.delete_in_chunks)
+BULK_DELETE_CHUNK_SIZE = env.int('BULK_DELETE_CHUNK_SIZE', default=500)
+
+# 관리자 화면 (main/admin.py): 필터 없는 목록은 이 행 수 이상이면 PostgreSQL 추정치로 페이지 수를 계산
+ADMIN_ESTIMATED_COUNT_THRESHOLD = env.int('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=100000)
+ADMIN_FILTER_CACHE_TIMEOUT = env.int('ADMIN_FILTER_CACHE_TIMEOUT', default=600)
+
+# 내보내기 (main/export.py): 한 번에 읽는 문서 수, 비식별/BIO 다운로드 요청에서 변환할 프로세스 수 (1 이면 요청 프로세스에서 처리)
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=500)
+EXPORT_WORKERS = env.int('EXPORT_WORKERS', default=1)
+
+# 읽기 전용 복제본 (main/db_router.py): DB_REPLICA_HOST 를 지정하면 목록/검색/통계/내보내기 읽기를 복제본에서 하고,
+# 쓰기를 한 브라우저는 REPLICA_PIN_SECONDS 초 동안 primary 에서 읽는다
+DB_REPLICA_HOST = env('DB_REPLICA_HOST', default='')
+READ_REPLICA_ALIAS = 'replica' if DB_REPLICA_HOST else ''
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=15)
+if READ_REPLICA_ALIAS:
+    DATABASES[READ_REPLICA_ALIAS] = {
+        **DATABASES['default'],
+        "HOST": DB_REPLICA_HOST,
+        "PORT": env('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["main.db_router.ReplicaRouter"]
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.contrib.sessions.middleware.SessionMiddleware") + 1,
+        "main.db_router.ReplicaPinMiddleware",
+    )
+
+# PostgreSQL 태그 테이블 해시 파티션 수 (0011 마이그레이션 적용 시에만 쓰임, 0 이면 일반 테이블 유지)
+PIITAG_PARTITIONS = env.int('PIITAG_PARTITIONS', default=16)
+
+# 데이터셋 릴리스 (main/releases.py): 릴리스 디렉터리, 샤드 하나의 문서 수,
+# nginx 가 파일을 보내는 internal location 접두사 (비워 두면 Django 가 FileResponse 로 전송)
+RELEASE_ROOT = env('RELEASE_ROOT', default=str(BASE_DIR / 'releases'))
+RELEASE_SHARD_SIZE = env.int('RELEASE_SHARD_SIZE', default=10000)
+RELEASE_ACCEL_REDIRECT = env('RELEASE_ACCEL_REDIRECT', default='')
+
+# 라벨 일관성 검사 (main/consistency.py): 기본 규칙을 바꾸는 JSON 파일 경로 (비워 두면 기본 규칙)
+CONSISTENCY_RULES_PATH = env('CONSISTENCY_RULES_PATH', default='')
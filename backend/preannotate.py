@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+코퍼스 단위 자동 사전 태깅 스크립트
+
+    # 사용자 admin 의 모든 문서를 8개 프로세스로 사전 태깅
+    python preannotate.py --username admin --workers 8
+
+    # 사람이 라벨링한 PERSON/LOC/ORG 태그로 사전 탐지기용 사전 파일 생성
+    python preannotate.py --build-dictionary dictionary.json --categories PERSON LOC ORG
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+# Django 설정
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pii_labeler.settings')
+import django
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Count
+
+from main.models import Document, PIITag
+from main.preannotation import DEFAULT_ANNOTATOR, preannotate_documents
+
+
+def build_dictionary(path, categories, min_count=1):
+    """사람이 라벨링한 태그(자동 태깅 제외)의 span_text 를 카테고리별 사전으로 저장"""
+    annotator = getattr(settings, 'PREANNOTATION_ANNOTATOR', DEFAULT_ANNOTATOR)
+    rows = (
+        PIITag.objects.filter(pii_category__value__in=categories)
+        .exclude(annotator=annotator)
+        .values_list('pii_category__value', 'span_text')
+        .annotate(total=Count('id'))
+        .filter(total__gte=min_count)
+    )
+    dictionary = {category: [] for category in categories}
+    for category, span_text, _ in rows.iterator():
+        dictionary[category].append(span_text)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({key: sorted(set(values)) for key, values in dictionary.items()}, f, ensure_ascii=False, indent=2)
+    for category, values in dictionary.items():
+        print(f'{category}: {len(set(values))}개 용어')
+    print(f'사전을 {path}에 저장했습니다.')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='정규식/사전 탐지기로 문서를 자동 사전 태깅합니다.')
+    parser.add_argument('--username', help='대상 사용자 (문서 소유자이자 태그 작성자)')
+    parser.add_argument('--untagged-only', action='store_true', help='태그가 하나도 없는 문서만 처리')
+    parser.add_argument('--workers', type=int, default=getattr(settings, 'PREANNOTATION_WORKERS', os.cpu_count() or 1),
+                        help='탐지 프로세스 수 (기본: PREANNOTATION_WORKERS 또는 CPU 수)')
+    parser.add_argument('--batch-size', type=int, default=200, help='작업 단위 문서 수 (기본: 200)')
+    parser.add_argument('--build-dictionary', metavar='PATH', help='태그 데이터로 사전 파일을 생성하고 종료')
+    parser.add_argument('--categories', nargs='+', default=['PERSON', 'LOC', 'ORG'], help='사전 생성 대상 카테고리')
+    parser.add_argument('--min-count', type=int, default=1, help='사전에 포함할 최소 등장 횟수')
+    args = parser.parse_args()
+
+    if args.build_dictionary:
+        build_dictionary(args.build_dictionary, args.categories, args.min_count)
+        return 0
+
+    if not args.username:
+        parser.error('--username 이 필요합니다.')
+    user = User.objects.get(username=args.username)
+    documents = Document.objects.filter(created_by=user).order_by('id')
+    if args.untagged_only:
+        documents = documents.filter(pii_tags__isnull=True)
+
+    total = documents.count()
+    print(f'{total}개 문서를 {args.workers}개 프로세스로 자동 태깅합니다...')
+    started = time.perf_counter()
+    summary = preannotate_documents(documents, user, workers=args.workers, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(
+        f"완료: 문서 {summary['documents']}개, 제안 {summary['suggested']}개, 생성 {summary['created']}개, "
+        f"겹침 제외 {summary['skipped_overlap']}개, 카테고리 없음 {summary['skipped_category']}개 "
+        f"({elapsed:.1f}초)"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
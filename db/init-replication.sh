@@ -0,0 +1,5 @@
+#!/bin/bash
+# primary 최초 초기화 시 실행: 복제본(db-replica)이 복제 연결을 맺을 수 있도록 pg_hba.conf 에 허용 규칙 추가
+set -e
+
+echo "host replication ${POSTGRES_USER} all scram-sha-256" >> "$PGDATA/pg_hba.conf"